@@ -0,0 +1,352 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from pydantic import BaseModel
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from app.api.fields import TAGS_EXPRESSION
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.security import get_current_moderator, get_current_admin
+from app.db.session import get_db, get_connection_factory
+from app.services.bm25 import refresh_index
+from app.services.comment_cache import comment_page_cache
+from app.services.export import EXPORT_DATASETS, EXPORT_FORMATS, stream_export
+from app.services.suggestions import suggestion_index
+
+router = APIRouter()
+
+# Moderation actions and the article status they lead to
+MODERATION_ACTIONS = {
+    "approve": "approved",
+    "reject": "rejected",
+}
+
+class ClaimRequest(BaseModel):
+    limit: int = 10
+
+class ClaimResponse(BaseModel):
+    claimed: List[dict]
+    claim_expires_in_minutes: int
+
+class ModerationDecision(BaseModel):
+    article_id: int
+    action: str  # 'approve' or 'reject'
+    reason: Optional[str] = None
+
+class ModerationDecisionBatch(BaseModel):
+    decisions: List[ModerationDecision]
+
+class ModerationDecisionResponse(BaseModel):
+    processed: List[dict]
+    skipped: List[int]
+
+class ReleaseRequest(BaseModel):
+    article_ids: List[int]
+
+class ReleaseResponse(BaseModel):
+    released: List[int]
+
+@router.post("/moderation/claim", response_model=ClaimResponse)
+async def claim_pending_articles(
+    claim: ClaimRequest,
+    current_user = Depends(get_current_moderator),
+    db = Depends(get_db)
+):
+    """
+    Claim a batch of pending articles for review.
+
+    Rows already claimed by another moderator are skipped instead of waited on,
+    so concurrent moderators always receive disjoint batches. Claims expire after
+    `MODERATION_CLAIM_TTL_MINUTES` and are then handed out again.
+    """
+    if claim.limit < 1 or claim.limit > settings.MODERATION_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {settings.MODERATION_MAX_BATCH}"
+        )
+
+    try:
+        cursor = db.cursor(cursor_factory=RealDictCursor)
+
+        # Claim the oldest unclaimed (or expired) pending rows in one statement.
+        # The subquery walks idx_articles_pending_queue and SKIP LOCKED makes
+        # rows locked by a concurrent claim invisible instead of blocking.
+        cursor.execute(
+            """
+            WITH claimed AS (
+                UPDATE articles a
+                SET claimed_by = %(moderator_id)s, claimed_at = CURRENT_TIMESTAMP
+                WHERE a.article_id IN (
+                    SELECT p.article_id
+                    FROM articles p
+                    WHERE p.status = 'pending'
+                      AND (
+                          p.claimed_by IS NULL OR
+                          p.claimed_at < CURRENT_TIMESTAMP - %(ttl)s * INTERVAL '1 minute'
+                      )
+                    ORDER BY p.created_at, p.article_id
+                    LIMIT %(limit)s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING
+                    a.article_id, a.title, a.description, a.source_url, a.created_at,
+                    a.category_id, a.submitted_by
+            )
+            SELECT
+                cl.article_id, cl.title, cl.description, cl.source_url, cl.created_at,
+                c.name as category,
+                u.username as submitted_by,
+                ARRAY(
+                    SELECT t.name
+                    FROM tags t
+                    JOIN article_tags at ON t.tag_id = at.tag_id
+                    WHERE at.article_id = cl.article_id
+                ) as tags
+            FROM
+                claimed cl
+            LEFT JOIN
+                categories c ON cl.category_id = c.category_id
+            LEFT JOIN
+                users u ON cl.submitted_by = u.user_id
+            ORDER BY
+                cl.created_at, cl.article_id
+            """,
+            {
+                "moderator_id": current_user["user_id"],
+                "ttl": settings.MODERATION_CLAIM_TTL_MINUTES,
+                "limit": claim.limit,
+            }
+        )
+        rows = cursor.fetchall()
+
+        db.commit()
+
+        claimed = []
+        for row in rows:
+            claimed.append({
+                "article_id": row["article_id"],
+                "title": row["title"],
+                "description": row["description"],
+                "url": row["source_url"],
+                "category": row["category"],
+                "tags": row["tags"],
+                "submitted_by": row["submitted_by"],
+                "created_at": row["created_at"].isoformat()
+            })
+
+        return {
+            "claimed": claimed,
+            "claim_expires_in_minutes": settings.MODERATION_CLAIM_TTL_MINUTES
+        }
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to claim articles: {str(e)}"
+        )
+    finally:
+        cursor.close()
+
+@router.post("/moderation/decisions", response_model=ModerationDecisionResponse)
+async def apply_moderation_decisions(
+    batch: ModerationDecisionBatch,
+    current_user = Depends(get_current_moderator),
+    db = Depends(get_db)
+):
+    """
+    Approve or reject many pending articles in one call.
+
+    Articles that are no longer pending, or are held by another moderator's
+    unexpired claim, are returned in `skipped`.
+    """
+    if not batch.decisions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No decisions provided"
+        )
+
+    if len(batch.decisions) > settings.MODERATION_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.MODERATION_MAX_BATCH} decisions per call"
+        )
+
+    # Validate actions; a later decision for the same article wins
+    decisions = {}
+    for decision in batch.decisions:
+        if decision.action not in MODERATION_ACTIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid action. Must be 'approve' or 'reject'."
+            )
+        decisions[decision.article_id] = decision
+
+    article_ids = list(decisions.keys())
+    statuses = [MODERATION_ACTIONS[d.action] for d in decisions.values()]
+    actions = [f"{d.action}_article" for d in decisions.values()]
+    reasons = [d.reason for d in decisions.values()]
+
+    try:
+        cursor = db.cursor(cursor_factory=RealDictCursor)
+
+        # Update all articles and write their moderation_log entries in a
+        # single statement
+        cursor.execute(
+            f"""
+            WITH decision AS (
+                SELECT *
+                FROM unnest(%(ids)s::int[], %(statuses)s::text[], %(actions)s::text[], %(reasons)s::text[])
+                    AS d(article_id, status, action, reason)
+            ),
+            decided AS (
+                UPDATE articles a
+                SET
+                    status = d.status,
+                    moderated_by = %(moderator_id)s,
+                    moderated_at = CURRENT_TIMESTAMP,
+                    moderation_reason = d.reason,
+                    claimed_by = NULL,
+                    claimed_at = NULL
+                FROM decision d
+                WHERE a.article_id = d.article_id
+                  AND a.status = 'pending'
+                  AND (
+                      a.claimed_by IS NULL OR
+                      a.claimed_by = %(moderator_id)s OR
+                      a.claimed_at < CURRENT_TIMESTAMP - %(ttl)s * INTERVAL '1 minute'
+                  )
+                RETURNING
+                    a.article_id, a.status, a.moderated_at, d.action, d.reason,
+                    a.title, a.category_id, a.upvotes - a.downvotes + a.comment_count AS weight
+            ),
+            logged AS (
+                INSERT INTO moderation_log (moderator_id, action, entity_id, reason)
+                SELECT %(moderator_id)s, action, article_id, reason
+                FROM decided
+            )
+            SELECT
+                a.article_id, a.status, a.moderated_at, a.title, a.weight,
+                (SELECT name FROM categories c WHERE c.category_id = a.category_id) AS category,
+                {TAGS_EXPRESSION} AS tags
+            FROM decided a
+            ORDER BY a.article_id
+            """,
+            {
+                "ids": article_ids,
+                "statuses": statuses,
+                "actions": actions,
+                "reasons": reasons,
+                "moderator_id": current_user["user_id"],
+                "ttl": settings.MODERATION_CLAIM_TTL_MINUTES,
+            }
+        )
+        rows = cursor.fetchall()
+
+        db.commit()
+        if rows:
+            response_cache.clear()  # Approved articles change the public lists
+            for row in rows:
+                comment_page_cache.invalidate(row["article_id"])  # Rejected articles no longer show comments
+                if row["status"] == "approved":
+                    suggestion_index.article_approved(row["title"], row["category"], row["tags"], row["weight"])
+            refresh_index(db, article_ids=[row["article_id"] for row in rows])
+
+        processed = []
+        for row in rows:
+            processed.append({
+                "article_id": row["article_id"],
+                "status": row["status"],
+                "moderated_by": current_user["username"],
+                "moderated_at": row["moderated_at"].isoformat()
+            })
+
+        processed_ids = {row["article_id"] for row in rows}
+        skipped = [article_id for article_id in article_ids if article_id not in processed_ids]
+
+        return {
+            "processed": processed,
+            "skipped": skipped
+        }
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to apply moderation decisions: {str(e)}"
+        )
+    finally:
+        cursor.close()
+
+@router.post("/moderation/release", response_model=ReleaseResponse)
+async def release_claimed_articles(
+    release: ReleaseRequest,
+    current_user = Depends(get_current_moderator),
+    db = Depends(get_db)
+):
+    """
+    Return claimed articles to the queue without a decision
+    """
+    try:
+        cursor = db.cursor(cursor_factory=RealDictCursor)
+
+        cursor.execute(
+            """
+            UPDATE articles
+            SET claimed_by = NULL, claimed_at = NULL
+            WHERE article_id = ANY(%s) AND claimed_by = %s AND status = 'pending'
+            RETURNING article_id
+            """,
+            (release.article_ids, current_user["user_id"])
+        )
+        released = sorted(row["article_id"] for row in cursor.fetchall())
+
+        db.commit()
+
+        return {"released": released}
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to release articles: {str(e)}"
+        )
+    finally:
+        cursor.close()
+
+@router.get("/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = "ndjson",
+    after: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    current_user = Depends(get_current_admin),
+    connect = Depends(get_connection_factory)
+):
+    """
+    Stream approved articles, votes or comments as NDJSON or CSV.
+
+    Rows are ordered by id. To resume an interrupted export, pass the last id
+    received as `after`.
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown dataset. Must be one of: {', '.join(EXPORT_DATASETS)}"
+        )
+
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}"
+        )
+
+    # The stream opens its own connection: request dependencies are torn down
+    # before a streaming body is sent
+    return StreamingResponse(
+        stream_export(connect, dataset, format, after=after, limit=limit),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'}
+    )
@@ -5,8 +5,18 @@ from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
-from app.core.security import get_current_user
+from app.api.fields import ARTICLE_LIST_FIELDS, ARTICLE_LIST_DEFAULT_FIELDS, TAGS_EXPRESSION, parse_fields, select_list
+from app.api.pagination import encode_cursor
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.responses import trusted_response
+from app.core.security import get_current_user, get_optional_current_user
 from app.db.session import get_db
+from app.services.bm25 import refresh_index
+from app.services.comment_cache import comment_page_cache
+from app.services.counters import ARTICLE_DOWNVOTES, ARTICLE_SCORE, ARTICLE_UPVOTES
+from app.services.suggestions import suggestion_index
+from app.services.votes import get_user_votes
 
 router = APIRouter()
 
@@ -48,15 +58,47 @@ class ArticleDetailResponse(BaseModel):
     category: str
     tags: List[str]
     submitted_by: str
-    created_at: str
+    created_at: datetime
     upvotes: int
     downvotes: int
     score: int
     comments: List[dict] = []
+    comments_cursor: Optional[str] = None
 
 class DeleteResponse(BaseModel):
     message: str
 
+def get_comment_preview(cursor, article_id: int):
+    """
+    Get the first page of an article's top-level comments, newest first, and
+    the cursor of the next page on /comments/article/{article_id}
+    """
+    cursor.execute(
+        """
+        SELECT 
+            c.comment_id, c.text,
+            json_build_object('user_id', u.user_id, 'username', u.username) as user,
+            c.created_at
+        FROM 
+            comments c
+        JOIN 
+            users u ON c.user_id = u.user_id
+        WHERE 
+            c.article_id = %s AND c.parent_comment_id IS NULL AND c.is_deleted = FALSE
+        ORDER BY 
+            c.created_at DESC, c.comment_id DESC
+        LIMIT %s
+        """,
+        (article_id, settings.COMMENT_PAGE_SIZE + 1)
+    )
+    comments = cursor.fetchall()
+    
+    next_cursor = None
+    if len(comments) > settings.COMMENT_PAGE_SIZE:
+        comments = comments[:settings.COMMENT_PAGE_SIZE]
+        next_cursor = encode_cursor(comments[-1]["created_at"], comments[-1]["comment_id"])
+    return comments, next_cursor
+
 @router.post("", response_model=ArticleResponse, status_code=status.HTTP_201_CREATED)
 async def create_article(
     article: ArticleCreate,
@@ -176,6 +218,9 @@ async def create_article(
             )
         
         db.commit()
+        # Titles are suggested once approved; new tags and categories right away
+        suggestion_index.add_missing("tags", article.tags)
+        suggestion_index.add_missing("categories", [article.category])
         
         # Get username for response
         cursor.execute(
@@ -227,21 +272,27 @@ async def get_articles(
     status: str = "approved",
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    fields: Optional[str] = None,
+    current_user = Depends(get_optional_current_user),
     db = Depends(get_db)
 ):
     """
-    Get a list of articles with optional filtering and sorting
+    Get a list of articles with optional filtering and sorting.
+
+    `fields` is a comma-separated list of response fields (e.g. `title,score,tags`);
+    only those columns are read and tags are only loaded when requested.
+
+    When called with a token, each article also carries the caller's `user_vote`.
     """
+    selected = parse_fields(fields, ARTICLE_LIST_FIELDS, ARTICLE_LIST_DEFAULT_FIELDS, required=["article_id"])
+    
     try:
         cursor = db.cursor(cursor_factory=RealDictCursor)
         
         # Base query
-        query = """
+        query = f"""
         SELECT 
-            a.article_id, a.title, a.description, a.source_url, a.created_at, 
-            a.upvotes, a.downvotes, a.views, a.is_featured,
-            c.name as category,
-            u.username as submitted_by
+            {select_list(selected, ARTICLE_LIST_FIELDS)}
         FROM 
             articles a
         JOIN 
@@ -299,16 +350,20 @@ async def get_articles(
         
         # Add sorting
         if sort == "trending":
-            query += """
+            query += f"""
                 ORDER BY 
-                    (a.upvotes - a.downvotes) DESC,
+                    {ARTICLE_SCORE} DESC,
                     a.views DESC,
                     a.created_at DESC
             """
         elif sort == "new":
             query += " ORDER BY a.created_at DESC"
         elif sort == "top":
-            query += " ORDER BY (a.upvotes - a.downvotes) DESC"
+            query += f" ORDER BY {ARTICLE_SCORE} DESC"
+        elif sort == "discussed":
+            # Folded counts only, so the order comes from idx_articles_discussed;
+            # comments since the last fold move an article up on the next one
+            query += " ORDER BY a.comment_count DESC, a.created_at DESC"
         
         # Add pagination
         query += " LIMIT %s OFFSET %s"
@@ -318,43 +373,23 @@ async def get_articles(
         cursor.execute(count_query, count_params)
         total = cursor.fetchone()["total"]
         
-        # Get articles
+        # Get articles; rows are already shaped like the response
         cursor.execute(query, params)
-        articles = []
-        for row in cursor.fetchall():
-            # Get tags for each article
-            cursor.execute(
-                """
-                SELECT t.name
-                FROM tags t
-                JOIN article_tags at ON t.tag_id = at.tag_id
-                WHERE at.article_id = %s
-                """,
-                (row["article_id"],)
+        articles = cursor.fetchall()
+        
+        if current_user:
+            user_votes = get_user_votes(
+                cursor, current_user["user_id"], [article["article_id"] for article in articles]
             )
-            tags = [tag["name"] for tag in cursor.fetchall()]
-            
-            articles.append({
-                "article_id": row["article_id"],
-                "title": row["title"],
-                "description": row["description"],
-                "url": row["source_url"],
-                "category": row["category"],
-                "submitted_by": row["submitted_by"],
-                "created_at": row["created_at"].isoformat(),
-                "upvotes": row["upvotes"],
-                "downvotes": row["downvotes"],
-                "views": row["views"],
-                "is_featured": row["is_featured"],
-                "tags": tags
-            })
+            for article in articles:
+                article["user_vote"] = user_votes[article["article_id"]]
         
-        return {
+        return trusted_response({
             "total": total,
             "page": page,
             "limit": limit,
             "articles": articles
-        }
+        }, ArticleListResponse)
     
     except Exception as e:
         raise HTTPException(
@@ -375,14 +410,18 @@ async def get_article(
     try:
         cursor = db.cursor(cursor_factory=RealDictCursor)
         
-        # Get article
+        # Get article, selected in response shape
         cursor.execute(
-            """
+            f"""
             SELECT 
-                a.article_id, a.title, a.description, a.source_url, a.created_at, 
-                a.upvotes, a.downvotes, a.views, a.status,
+                a.article_id, a.title, a.description, a.source_url as url,
                 c.name as category,
-                u.username as submitted_by
+                {TAGS_EXPRESSION} as tags,
+                u.username as submitted_by,
+                a.created_at,
+                {ARTICLE_UPVOTES} as upvotes,
+                {ARTICLE_DOWNVOTES} as downvotes,
+                {ARTICLE_SCORE} as score
             FROM 
                 articles a
             JOIN 
@@ -402,72 +441,23 @@ async def get_article(
                 detail="Article not found"
             )
         
-        # Increment view count
-        cursor.execute(
-            "UPDATE articles SET views = views + 1 WHERE article_id = %s",
-            (article_id,)
-        )
-        
-        # Get tags
-        cursor.execute(
-            """
-            SELECT t.name
-            FROM tags t
-            JOIN article_tags at ON t.tag_id = at.tag_id
-            WHERE at.article_id = %s
-            """,
-            (article_id,)
-        )
-        tags = [row["name"] for row in cursor.fetchall()]
-        
-        # Get comments
+        # Record the view and increment the view count
         cursor.execute(
             """
-            SELECT 
-                c.comment_id, c.text, c.created_at,
-                u.user_id, u.username
-            FROM 
-                comments c
-            JOIN 
-                users u ON c.user_id = u.user_id
-            WHERE 
-                c.article_id = %s AND c.parent_comment_id IS NULL AND c.is_deleted = FALSE
-            ORDER BY 
-                c.created_at DESC
+            WITH viewed AS (
+                INSERT INTO article_views (article_id) VALUES (%(article_id)s)
+            )
+            UPDATE articles SET views = views + 1 WHERE article_id = %(article_id)s
             """,
-            (article_id,)
+            {"article_id": article_id}
         )
-        comments = []
-        for comment in cursor.fetchall():
-            comments.append({
-                "comment_id": comment["comment_id"],
-                "text": comment["text"],
-                "user": {
-                    "user_id": comment["user_id"],
-                    "username": comment["username"]
-                },
-                "created_at": comment["created_at"].isoformat()
-            })
         
-        # Calculate score
-        score = article["upvotes"] - article["downvotes"]
+        # Get the first page of comments
+        article["comments"], article["comments_cursor"] = get_comment_preview(cursor, article_id)
         
         db.commit()
         
-        return {
-            "article_id": article["article_id"],
-            "title": article["title"],
-            "description": article["description"],
-            "url": article["source_url"],
-            "category": article["category"],
-            "tags": tags,
-            "submitted_by": article["submitted_by"],
-            "created_at": article["created_at"].isoformat(),
-            "upvotes": article["upvotes"],
-            "downvotes": article["downvotes"],
-            "score": score,
-            "comments": comments
-        }
+        return trusted_response(article, ArticleDetailResponse)
     
     except HTTPException:
         db.rollback()
@@ -497,7 +487,7 @@ async def update_article(
         # Check if article exists and user is the owner
         cursor.execute(
             """
-            SELECT a.article_id, a.submitted_by, a.status
+            SELECT a.article_id, a.title, a.submitted_by, a.status
             FROM articles a
             WHERE a.article_id = %s
             """,
@@ -622,13 +612,22 @@ async def update_article(
         )
         
         db.commit()
+        response_cache.clear()  # Cached article lists and searches may include this article
+        if update_fields and article["status"] == "approved":
+            # Back in the moderation queue until approved again
+            suggestion_index.remove("titles", article["title"])
+            refresh_index(db, article_ids=[article_id])
+        if article_update.category:
+            suggestion_index.add_missing("categories", [article_update.category])
+        if article_update.tags:
+            suggestion_index.add_missing("tags", article_update.tags)
         
         # Get updated article for response
         cursor.execute(
-            """
+            f"""
             SELECT 
                 a.article_id, a.title, a.description, a.source_url, a.created_at, 
-                a.upvotes, a.downvotes, a.views,
+                {ARTICLE_UPVOTES} as upvotes, {ARTICLE_DOWNVOTES} as downvotes, a.views,
                 c.name as category,
                 u.username as submitted_by
             FROM 
@@ -656,34 +655,8 @@ async def update_article(
         )
         tags = [row["name"] for row in cursor.fetchall()]
         
-        # Get comments
-        cursor.execute(
-            """
-            SELECT 
-                c.comment_id, c.text, c.created_at,
-                u.user_id, u.username
-            FROM 
-                comments c
-            JOIN 
-                users u ON c.user_id = u.user_id
-            WHERE 
-                c.article_id = %s AND c.parent_comment_id IS NULL AND c.is_deleted = FALSE
-            ORDER BY 
-                c.created_at DESC
-            """,
-            (article_id,)
-        )
-        comments = []
-        for comment in cursor.fetchall():
-            comments.append({
-                "comment_id": comment["comment_id"],
-                "text": comment["text"],
-                "user": {
-                    "user_id": comment["user_id"],
-                    "username": comment["username"]
-                },
-                "created_at": comment["created_at"].isoformat()
-            })
+        # Get the first page of comments
+        comments, comments_cursor = get_comment_preview(cursor, article_id)
         
         # Calculate score
         score = updated_article["upvotes"] - updated_article["downvotes"]
@@ -700,7 +673,8 @@ async def update_article(
             "upvotes": updated_article["upvotes"],
             "downvotes": updated_article["downvotes"],
             "score": score,
-            "comments": comments
+            "comments": comments,
+            "comments_cursor": comments_cursor
         }
     
     except HTTPException:
@@ -730,7 +704,7 @@ async def delete_article(
         # Check if article exists and user is the owner
         cursor.execute(
             """
-            SELECT submitted_by
+            SELECT title, submitted_by
             FROM articles
             WHERE article_id = %s
             """,
@@ -767,6 +741,10 @@ async def delete_article(
         )
         
         db.commit()
+        response_cache.clear()  # Cached article lists and searches may include this article
+        comment_page_cache.invalidate(article_id)
+        suggestion_index.remove("titles", article["title"])
+        refresh_index(db, article_ids=[article_id])
         
         return {"message": "Article deleted successfully"}
     
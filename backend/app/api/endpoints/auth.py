@@ -9,6 +9,7 @@ from psycopg2.extras import RealDictCursor
 from app.core.security import verify_password, get_password_hash, create_access_token, get_current_user
 from app.core.config import settings
 from app.db.session import get_db
+from app.services.suggestions import suggestion_index
 
 router = APIRouter()
 
@@ -98,6 +99,7 @@ async def register_user(user: UserCreate, db = Depends(get_db)):
         )
         
         db.commit()
+        suggestion_index.add("usernames", new_user["username"])
         
         return {
             "user_id": new_user["user_id"],
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from app.api.endpoints.votes import VoteCreate
+from app.core.config import settings
+from app.core.responses import trusted_response
 from app.core.security import get_current_user
-from app.db.session import get_db
+from app.db.session import autocommit, get_connection_pool, get_db
+from app.services.bm25 import refresh_index
+from app.services.comment_cache import comment_page_cache
+from app.services.comments import COMMENT_SORTS, fetch_comment_tree, fetch_replies, fetch_threads
+from app.services.counters import counter_shard
 
 router = APIRouter()
 
@@ -24,13 +31,101 @@ class CommentResponse(BaseModel):
     text: str
     user_id: int
     username: str
-    created_at: str
+    created_at: datetime
     parent_comment_id: Optional[int] = None
-    replies: Optional[List[dict]] = None
+    upvotes: int = 0
+    downvotes: int = 0
+    depth: int = 0
+    reply_count: int = 0
+    replies: Optional[List["CommentResponse"]] = None
+    replies_cursor: Optional[str] = None
+
+class CommentPageResponse(BaseModel):
+    comments: List[CommentResponse]
+    next_cursor: Optional[str] = None
 
 class DeleteResponse(BaseModel):
     message: str
 
+class CommentVoteResponse(BaseModel):
+    comment_id: int
+    upvotes: int
+    downvotes: int
+    score: int
+    user_vote: Optional[str] = None
+    previous_vote: Optional[str] = None
+
+# Record a comment vote and its counter deltas in one statement, like the
+# article VOTE_STATEMENT in votes.py, serialized per user and comment by the
+# same kind of advisory lock. Comment ids are negated in the lock key so they
+# never share a lock with article votes. Deltas go to comment_vote_shards so
+# votes on a popular comment never wait on its row lock.
+# Returns no row if the comment does not exist or is deleted.
+COMMENT_VOTE_STATEMENT = """
+SELECT pg_advisory_xact_lock(%(user_id)s, -(%(comment_id)s));
+WITH target AS (
+    SELECT comment_id, upvotes, downvotes
+    FROM comments
+    WHERE comment_id = %(comment_id)s AND is_deleted = FALSE
+),
+prev AS (
+    SELECT comment_vote_id, vote_type
+    FROM comment_votes
+    WHERE comment_id = %(comment_id)s AND user_id = %(user_id)s
+    FOR UPDATE
+),
+delta AS (
+    SELECT
+        (CASE WHEN %(vote_type)s = 'upvote' THEN 1 ELSE 0 END)
+            - (CASE WHEN prev.vote_type = 'upvote' THEN 1 ELSE 0 END) AS up,
+        (CASE WHEN %(vote_type)s = 'downvote' THEN 1 ELSE 0 END)
+            - (CASE WHEN prev.vote_type = 'downvote' THEN 1 ELSE 0 END) AS down
+    FROM target
+    LEFT JOIN prev ON TRUE
+),
+ins AS (
+    INSERT INTO comment_votes (comment_id, user_id, vote_type)
+    SELECT %(comment_id)s, %(user_id)s, %(vote_type)s
+    FROM delta
+    WHERE %(vote_type)s <> 'none'
+    ON CONFLICT (comment_id, user_id) DO UPDATE
+        SET vote_type = EXCLUDED.vote_type, updated_at = CURRENT_TIMESTAMP
+        WHERE comment_votes.vote_type <> EXCLUDED.vote_type
+),
+del AS (
+    DELETE FROM comment_votes
+    WHERE comment_vote_id = (SELECT comment_vote_id FROM prev)
+      AND %(vote_type)s = 'none'
+      AND EXISTS (SELECT 1 FROM delta)
+),
+shard AS (
+    INSERT INTO comment_vote_shards (comment_id, shard, upvotes, downvotes)
+    SELECT %(comment_id)s, %(shard)s, delta.up, delta.down
+    FROM delta
+    WHERE delta.up <> 0 OR delta.down <> 0
+    ON CONFLICT (comment_id, shard) DO UPDATE
+        SET upvotes = comment_vote_shards.upvotes + EXCLUDED.upvotes,
+            downvotes = comment_vote_shards.downvotes + EXCLUDED.downvotes
+),
+activity AS (
+    INSERT INTO user_activity (user_id, activity_type, entity_id)
+    SELECT %(user_id)s, 'comment_' || %(vote_type)s, %(comment_id)s
+    FROM delta
+),
+pending AS (
+    SELECT COALESCE(SUM(upvotes), 0) AS up, COALESCE(SUM(downvotes), 0) AS down
+    FROM comment_vote_shards
+    WHERE comment_id = %(comment_id)s
+)
+SELECT
+    (SELECT vote_type FROM prev) AS previous_vote,
+    target.upvotes + pending.up + COALESCE(delta.up, 0) AS upvotes,
+    target.downvotes + pending.down + COALESCE(delta.down, 0) AS downvotes
+FROM target
+CROSS JOIN pending
+LEFT JOIN delta ON TRUE
+"""
+
 @router.post("", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
 async def create_comment(
     comment: CommentCreate,
@@ -81,18 +176,33 @@ async def create_comment(
                     detail="Parent comment does not belong to the specified article"
                 )
         
-        # Insert comment
+        # Insert comment, count it on one of the article's comment count shards
+        # and publish it to live subscribers on commit
         cursor.execute(
             """
-            INSERT INTO comments (article_id, user_id, text, parent_comment_id)
-            VALUES (%s, %s, %s, %s)
-            RETURNING comment_id, article_id, user_id, text, created_at, parent_comment_id
+            WITH new_comment AS (
+                INSERT INTO comments (article_id, user_id, text, parent_comment_id)
+                VALUES (%s, %s, %s, %s)
+                RETURNING comment_id, article_id, user_id, text, created_at, parent_comment_id
+            ),
+            counted AS (
+                INSERT INTO article_comment_shards (article_id, shard, comments)
+                SELECT article_id, %s, 1 FROM new_comment
+                ON CONFLICT (article_id, shard) DO UPDATE
+                    SET comments = article_comment_shards.comments + 1
+            )
+            SELECT new_comment.*, pg_notify('article_events', json_build_object(
+                'type', 'comments', 'article_id', article_id, 'count', 1,
+                'comment_ids', json_build_array(comment_id)
+            )::text) AS published
+            FROM new_comment
             """,
             (
                 comment.article_id,
                 current_user["user_id"],
                 comment.text,
-                comment.parent_comment_id
+                comment.parent_comment_id,
+                counter_shard(current_user["user_id"])
             )
         )
         new_comment = cursor.fetchone()
@@ -129,6 +239,8 @@ async def create_comment(
             )
         
         db.commit()
+        comment_page_cache.invalidate(comment.article_id)
+        refresh_index(db, comment_ids=[new_comment["comment_id"]])
         
         # Get username for response
         cursor.execute(
@@ -160,108 +272,202 @@ async def create_comment(
     finally:
         cursor.close()
 
-@router.get("/article/{article_id}", response_model=List[CommentResponse])
+def check_sort(sort: str) -> None:
+    if sort not in COMMENT_SORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sort. Must be one of: {', '.join(COMMENT_SORTS)}"
+        )
+
+def thread_limits(max_depth: int, max_replies: int) -> dict:
+    return {"max_depth": max_depth, "max_replies": max_replies, "max_comments": settings.COMMENT_PAGE_MAX_COMMENTS}
+
+@router.get("/article/{article_id}", response_model=CommentPageResponse)
 async def get_article_comments(
     article_id: int,
+    sort: str = Query("newest", description="newest, oldest or best"),
+    limit: int = Query(settings.COMMENT_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page"),
+    max_depth: int = Query(settings.COMMENT_THREAD_DEPTH, ge=0, le=settings.COMMENT_TREE_MAX_DEPTH),
+    max_replies: int = Query(settings.COMMENT_THREAD_REPLIES, ge=0, le=settings.COMMENT_TREE_MAX_REPLIES),
+    pool = Depends(get_connection_pool)
+):
+    """
+    Get a page of an article's comment threads.
+
+    Top-level comments are keyset-paged in `sort` order: pass the returned
+    `next_cursor` to get the next page. Each comes with its first
+    `max_replies` replies, nested to `max_depth` levels. `reply_count` gives a
+    comment's number of direct replies; when there are more than shown, load
+    them from `/comments/{comment_id}/replies`, starting at `replies_cursor`.
+
+    `best` ranks comments by the lower bound of the Wilson score interval of
+    their upvote ratio. Replies are sorted the same way, except that `newest`
+    keeps them in posting order.
+
+    Pages are served from a per-worker cache until the article's comments
+    change, for up to `COMMENT_CACHE_TTL_SECONDS`.
+    """
+    check_sort(sort)
+
+    # The build is shared with concurrent requests for the same page and
+    # outlives a requester that disconnects, so it borrows its own connection
+    # rather than using the request's
+    def build_page() -> bytes:
+        with pool.connection() as conn:
+            db_cursor = conn.cursor(cursor_factory=RealDictCursor)
+            try:
+                # Check if article exists
+                db_cursor.execute(
+                    "SELECT article_id FROM articles WHERE article_id = %s AND status = 'approved'",
+                    (article_id,)
+                )
+                article = db_cursor.fetchone()
+                
+                if not article:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Article not found or not approved"
+                    )
+                
+                try:
+                    comments, next_cursor = fetch_threads(
+                        db_cursor, article_id, sort, limit, cursor, **thread_limits(max_depth, max_replies)
+                    )
+                except ValueError:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid cursor"
+                    )
+                
+                return trusted_response({"comments": comments, "next_cursor": next_cursor}, CommentPageResponse).body
+            finally:
+                db_cursor.close()
+
+    try:
+        page = await comment_page_cache.get_or_build(
+            article_id, (sort, limit, cursor, max_depth, max_replies), build_page
+        )
+        return Response(page, media_type="application/json")
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get comments: {str(e)}"
+        )
+
+@router.get("/{comment_id}/replies", response_model=CommentPageResponse)
+async def get_comment_replies(
+    comment_id: int,
+    sort: str = Query("newest", description="newest, oldest or best"),
+    limit: int = Query(settings.COMMENT_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="`replies_cursor` of the comment, or `next_cursor` from the previous page"),
+    max_depth: int = Query(settings.COMMENT_THREAD_DEPTH, ge=0, le=settings.COMMENT_TREE_MAX_DEPTH),
+    max_replies: int = Query(settings.COMMENT_THREAD_REPLIES, ge=0, le=settings.COMMENT_TREE_MAX_REPLIES),
     db = Depends(get_db)
 ):
     """
-    Get all comments for an article
+    Load more replies to a comment.
+
+    Returns a page of direct replies, continuing after `cursor`, each with its
+    own first replies as in the article's threads. `depth` counts from the
+    replies returned. Use the same `sort` as for the threads.
     """
+    check_sort(sort)
+
+    db_cursor = db.cursor(cursor_factory=RealDictCursor)
     try:
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        
-        # Check if article exists
-        cursor.execute(
-            "SELECT article_id FROM articles WHERE article_id = %s AND status = 'approved'",
-            (article_id,)
+        db_cursor.execute(
+            "SELECT comment_id FROM comments WHERE comment_id = %s AND is_deleted = FALSE",
+            (comment_id,)
         )
-        article = cursor.fetchone()
-        
-        if not article:
+        if not db_cursor.fetchone():
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="Article not found or not approved"
+                detail="Comment not found"
             )
         
-        # Get top-level comments
-        cursor.execute(
-            """
-            SELECT 
-                c.comment_id, c.article_id, c.user_id, c.text, c.created_at, c.parent_comment_id,
-                u.username
-            FROM 
-                comments c
-            JOIN 
-                users u ON c.user_id = u.user_id
-            WHERE 
-                c.article_id = %s AND c.parent_comment_id IS NULL AND c.is_deleted = FALSE
-            ORDER BY 
-                c.created_at DESC
-            """,
-            (article_id,)
-        )
-        top_comments = cursor.fetchall()
+        try:
+            replies, next_cursor = fetch_replies(
+                db_cursor, comment_id, sort, limit, cursor, **thread_limits(max_depth, max_replies)
+            )
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        db.commit()
         
-        # Get all replies
-        cursor.execute(
-            """
-            SELECT 
-                c.comment_id, c.article_id, c.user_id, c.text, c.created_at, c.parent_comment_id,
-                u.username
-            FROM 
-                comments c
-            JOIN 
-                users u ON c.user_id = u.user_id
-            WHERE 
-                c.article_id = %s AND c.parent_comment_id IS NOT NULL AND c.is_deleted = FALSE
-            ORDER BY 
-                c.created_at ASC
-            """,
-            (article_id,)
+        return trusted_response({"comments": replies, "next_cursor": next_cursor}, CommentPageResponse)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get replies: {str(e)}"
         )
-        all_replies = cursor.fetchall()
-        
-        # Organize replies by parent_comment_id
-        replies_by_parent = {}
-        for reply in all_replies:
-            parent_id = reply["parent_comment_id"]
-            if parent_id not in replies_by_parent:
-                replies_by_parent[parent_id] = []
-            
-            replies_by_parent[parent_id].append({
-                "comment_id": reply["comment_id"],
-                "article_id": reply["article_id"],
-                "text": reply["text"],
-                "user_id": reply["user_id"],
-                "username": reply["username"],
-                "created_at": reply["created_at"].isoformat(),
-                "parent_comment_id": reply["parent_comment_id"]
-            })
+    finally:
+        db_cursor.close()
+
+@router.post("/{comment_id}/vote", response_model=CommentVoteResponse)
+async def vote_on_comment(
+    comment_id: int,
+    vote: VoteCreate,
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Vote on a comment.
+    
+    - `upvote`: Add an upvote
+    - `downvote`: Add a downvote
+    - `none`: Remove existing vote
+    """
+    # Validate vote type
+    if vote.vote_type not in ["upvote", "downvote", "none"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid vote type. Must be 'upvote', 'downvote', or 'none'."
+        )
+    
+    cursor = db.cursor(cursor_factory=RealDictCursor)
+    try:
+        with autocommit(db):
+            cursor.execute(
+                COMMENT_VOTE_STATEMENT,
+                {
+                    "comment_id": comment_id,
+                    "user_id": current_user["user_id"],
+                    "vote_type": vote.vote_type,
+                    "shard": counter_shard(current_user["user_id"]),
+                }
+            )
+            result = cursor.fetchone()
         
-        # Build response with nested replies
-        result = []
-        for comment in top_comments:
-            comment_data = {
-                "comment_id": comment["comment_id"],
-                "article_id": comment["article_id"],
-                "text": comment["text"],
-                "user_id": comment["user_id"],
-                "username": comment["username"],
-                "created_at": comment["created_at"].isoformat(),
-                "parent_comment_id": comment["parent_comment_id"],
-                "replies": replies_by_parent.get(comment["comment_id"], [])
-            }
-            result.append(comment_data)
+        if not result:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Comment not found"
+            )
         
-        return result
+        return {
+            "comment_id": comment_id,
+            "upvotes": result["upvotes"],
+            "downvotes": result["downvotes"],
+            "score": result["upvotes"] - result["downvotes"],
+            "user_vote": vote.vote_type if vote.vote_type != "none" else None,
+            "previous_vote": result["previous_vote"]
+        }
     
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to get comments: {str(e)}"
+            detail=f"Failed to process vote: {str(e)}"
         )
     finally:
         cursor.close()
@@ -325,6 +531,8 @@ async def update_comment(
         )
         
         db.commit()
+        comment_page_cache.invalidate(comment["article_id"])
+        refresh_index(db, comment_ids=[comment_id])
         
         # Get username for response
         cursor.execute(
@@ -333,35 +541,13 @@ async def update_comment(
         )
         username = cursor.fetchone()["username"]
         
-        # Get replies if this is a top-level comment
-        replies = []
-        if updated_comment["parent_comment_id"] is None:
-            cursor.execute(
-                """
-                SELECT 
-                    c.comment_id, c.article_id, c.user_id, c.text, c.created_at, c.parent_comment_id,
-                    u.username
-                FROM 
-                    comments c
-                JOIN 
-                    users u ON c.user_id = u.user_id
-                WHERE 
-                    c.parent_comment_id = %s AND c.is_deleted = FALSE
-                ORDER BY 
-                    c.created_at ASC
-                """,
-                (comment_id,)
-            )
-            for reply in cursor.fetchall():
-                replies.append({
-                    "comment_id": reply["comment_id"],
-                    "article_id": reply["article_id"],
-                    "text": reply["text"],
-                    "user_id": reply["user_id"],
-                    "username": reply["username"],
-                    "created_at": reply["created_at"].isoformat(),
-                    "parent_comment_id": reply["parent_comment_id"]
-                })
+        # Return the comment with its replies
+        thread = fetch_comment_tree(
+            cursor,
+            comment_id,
+            sort="oldest",
+            **thread_limits(settings.COMMENT_THREAD_DEPTH, settings.COMMENT_THREAD_REPLIES)
+        )
         
         return {
             "comment_id": updated_comment["comment_id"],
@@ -371,7 +557,9 @@ async def update_comment(
             "username": username,
             "created_at": updated_comment["created_at"].isoformat(),
             "parent_comment_id": updated_comment["parent_comment_id"],
-            "replies": replies
+            "reply_count": thread["reply_count"] if thread else 0,
+            "replies": thread["replies"] if thread else [],
+            "replies_cursor": thread["replies_cursor"] if thread else None
         }
     
     except HTTPException:
@@ -401,7 +589,7 @@ async def delete_comment(
         # Check if comment exists and user is the owner
         cursor.execute(
             """
-            SELECT user_id
+            SELECT user_id, article_id
             FROM comments
             WHERE comment_id = %s AND is_deleted = FALSE
             """,
@@ -422,14 +610,22 @@ async def delete_comment(
                 detail="Not authorized to delete this comment"
             )
         
-        # Soft delete comment
+        # Soft delete comment and take it off the article's comment count.
+        # A concurrent delete of the same comment updates no row and counts nothing.
         cursor.execute(
             """
-            UPDATE comments
-            SET is_deleted = TRUE, text = '[deleted]', updated_at = CURRENT_TIMESTAMP
-            WHERE comment_id = %s
+            WITH deleted AS (
+                UPDATE comments
+                SET is_deleted = TRUE, text = '[deleted]', updated_at = CURRENT_TIMESTAMP
+                WHERE comment_id = %s AND is_deleted = FALSE
+                RETURNING article_id
+            )
+            INSERT INTO article_comment_shards (article_id, shard, comments)
+            SELECT article_id, %s, -1 FROM deleted
+            ON CONFLICT (article_id, shard) DO UPDATE
+                SET comments = article_comment_shards.comments - 1
             """,
-            (comment_id,)
+            (comment_id, counter_shard(current_user["user_id"]))
         )
         
         # Log user activity
@@ -442,6 +638,8 @@ async def delete_comment(
         )
         
         db.commit()
+        comment_page_cache.invalidate(comment["article_id"])
+        refresh_index(db, comment_ids=[comment_id])
         
         return {"message": "Comment deleted successfully"}
     
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
+import orjson
+
+from app.core.config import settings
+from app.services.live import article_events
+
+router = APIRouter()
+
+def format_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {orjson.dumps(event).decode()}\n\n"
+
+@router.get("/articles")
+async def stream_article_events(
+    request: Request,
+    article_ids: str = Query(..., description="Comma-separated article ids, e.g. `1,2,3`"),
+):
+    """
+    Stream live updates for articles as Server-Sent Events.
+
+    - `votes`: new `upvotes`/`downvotes` for an article
+    - `comments`: `count` new comments on an article, with their `comment_ids`
+    - `reset`: updates may have been missed; refetch the article
+
+    Updates are coalesced: a stream receives at most one batch of events per
+    `LIVE_COALESCE_SECONDS`, with the latest vote counts per article.
+    """
+    try:
+        ids = list(dict.fromkeys(int(i) for i in article_ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="article_ids must be a comma-separated list of integers"
+        )
+
+    if not ids or len(ids) > settings.LIVE_MAX_ARTICLES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {settings.LIVE_MAX_ARTICLES} article ids can be streamed at once"
+        )
+
+    try:
+        subscription = await article_events.subscribe(ids)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Live updates are unavailable. Try again later."
+        )
+
+    async def stream():
+        try:
+            # Clients reconnect after 3 seconds if the stream drops
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                events = await subscription.next_batch(timeout=settings.LIVE_HEARTBEAT_SECONDS)
+                if not events:
+                    yield ": keep-alive\n\n"
+                for event in events:
+                    yield format_event(event)
+        finally:
+            article_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,200 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+from psycopg2.extras import RealDictCursor
+
+from app.api.pagination import decode_cursor, encode_cursor
+from app.core.responses import trusted_response
+from app.core.security import get_current_user
+from app.db.session import get_db
+from app.services.notifications import get_unread_count, unread_count_cache
+
+router = APIRouter()
+
+class NotificationResponse(BaseModel):
+    notification_id: int
+    type: str
+    entity_id: Optional[int] = None
+    message: str
+    actor_id: Optional[int] = None
+    actor_count: int
+    is_read: bool
+    created_at: datetime
+
+class NotificationListResponse(BaseModel):
+    notifications: List[NotificationResponse]
+    next_cursor: Optional[str] = None
+    unread_count: int
+
+class UnreadCountResponse(BaseModel):
+    unread_count: int
+
+class MarkAllReadResponse(BaseModel):
+    updated: int
+    unread_count: int
+
+NOTIFICATION_COLUMNS = "notification_id, type, entity_id, message, actor_id, actor_count, is_read, created_at"
+
+@router.get("", response_model=NotificationListResponse)
+async def get_notifications(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page"),
+    unread_only: bool = False,
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Get the current user's notifications, newest first.
+
+    Pages are keyset-paged on (created_at, notification_id): pass the
+    returned `next_cursor` to get the next page. A coalesced notification
+    that receives new events moves back to the top of the list.
+    """
+    conditions = ["user_id = %(user_id)s"]
+    params = {"user_id": current_user["user_id"], "limit": limit + 1}
+
+    if unread_only:
+        conditions.append("is_read = FALSE")
+
+    if cursor:
+        try:
+            params["created_at"], params["notification_id"] = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        conditions.append("(created_at, notification_id) < (%(created_at)s, %(notification_id)s)")
+
+    db_cursor = db.cursor(cursor_factory=RealDictCursor)
+    try:
+        db_cursor.execute(
+            f"""
+            SELECT {NOTIFICATION_COLUMNS}
+            FROM notifications
+            WHERE {" AND ".join(conditions)}
+            ORDER BY created_at DESC, notification_id DESC
+            LIMIT %(limit)s
+            """,
+            params
+        )
+        notifications = db_cursor.fetchall()
+
+        next_cursor = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            last = notifications[-1]
+            next_cursor = encode_cursor(last["created_at"], last["notification_id"])
+
+        unread_count = get_unread_count(db_cursor, current_user["user_id"])
+        db.commit()
+
+        return trusted_response(
+            {"notifications": notifications, "next_cursor": next_cursor, "unread_count": unread_count},
+            NotificationListResponse
+        )
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get notifications: {str(e)}"
+        )
+    finally:
+        db_cursor.close()
+
+@router.get("/unread-count", response_model=UnreadCountResponse)
+async def get_notification_unread_count(
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Get the number of unread notifications.
+
+    Served from a per-user cache backed by a counter table, so frequent
+    polling does not count notification rows.
+    """
+    cursor = db.cursor(cursor_factory=RealDictCursor)
+    try:
+        unread_count = get_unread_count(cursor, current_user["user_id"])
+        db.commit()
+        return {"unread_count": unread_count}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get unread count: {str(e)}"
+        )
+    finally:
+        cursor.close()
+
+@router.post("/read-all", response_model=MarkAllReadResponse)
+async def mark_all_notifications_read(
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Mark all of the current user's notifications as read
+    """
+    cursor = db.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(
+            "UPDATE notifications SET is_read = TRUE WHERE user_id = %s AND is_read = FALSE",
+            (current_user["user_id"],)
+        )
+        updated = cursor.rowcount
+        db.commit()
+        unread_count_cache.delete(current_user["user_id"])
+        return {"updated": updated, "unread_count": 0}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to mark notifications as read: {str(e)}"
+        )
+    finally:
+        cursor.close()
+
+@router.post("/{notification_id}/read", response_model=NotificationResponse)
+async def mark_notification_read(
+    notification_id: int,
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Mark one of the current user's notifications as read
+    """
+    cursor = db.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(
+            f"""
+            UPDATE notifications SET is_read = TRUE
+            WHERE notification_id = %s AND user_id = %s
+            RETURNING {NOTIFICATION_COLUMNS}
+            """,
+            (notification_id, current_user["user_id"])
+        )
+        notification = cursor.fetchone()
+
+        if not notification:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Notification not found"
+            )
+
+        db.commit()
+        unread_count_cache.delete(current_user["user_id"])
+        return trusted_response(notification, NotificationResponse)
+
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to mark notification as read: {str(e)}"
+        )
+    finally:
+        cursor.close()
@@ -1,18 +1,64 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Optional
-from pydantic import BaseModel
-import psycopg2
+import asyncio
+import heapq
+import itertools
 from psycopg2.extras import RealDictCursor
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
-from app.db.session import get_db
+from app.api.fields import (
+    SEARCH_ARTICLE_FIELDS, SEARCH_USER_FIELDS, SEARCH_COMMENT_FIELDS, select_list
+)
+from app.core.config import settings
+from app.core.responses import trusted_response
+from app.db.session import get_connection_pool
+from app.services.bm25 import search_engine
+from app.services.counters import USER_REPUTATION
+from app.services.search import (
+    MERGED_ORDER, build_tsquery, decode_search_cursor, encode_search_cursor, match_condition, merge_rank,
+    merged_key, merged_order, rank_expression, run_legs, with_highlight
+)
+from app.services.suggestions import suggestion_index
 
 router = APIRouter()
 
+# Ids among `ids` that are still searchable, per indexed result type
+SEARCHABLE_IDS = {
+    "articles": """
+        SELECT article_id AS id
+        FROM articles
+        WHERE article_id = ANY(%(ids)s) AND status = 'approved'
+    """,
+    "comments": """
+        SELECT cm.comment_id AS id
+        FROM comments cm
+        JOIN articles a ON cm.article_id = a.article_id
+        WHERE cm.comment_id = ANY(%(ids)s) AND cm.is_deleted = FALSE AND a.status = 'approved'
+    """,
+}
+
+def searchable_hits(pool, hits):
+    """
+    Drop hits of the embedded index whose rows were deleted or are no longer
+    approved since they were indexed, so that counts and pages agree
+    """
+    with pool.connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        filtered = {}
+        for result_type, found in hits.items():
+            cursor.execute(SEARCHABLE_IDS[result_type], {"ids": [hit.row_id for hit in found]})
+            ids = {row["id"] for row in cursor.fetchall()}
+            filtered[result_type] = [hit for hit in found if hit.row_id in ids]
+        return filtered
+
 class SearchResponse(BaseModel):
     total: int
     page: int
     limit: int
     results: List[dict]
+    next_cursor: Optional[str] = None
+    timed_out: List[str] = []
 
 @router.get("", response_model=SearchResponse)
 async def search(
@@ -22,14 +68,33 @@ async def search(
     tag: Optional[str] = None,
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
-    db = Depends(get_db)
+    fields: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page, with type=all"),
+    pool = Depends(get_connection_pool)
 ):
     """
-    Search for articles, users, or comments
+    Search for articles, users, or comments.
+
+    Matches results containing every word of `q`, the last one also as a
+    prefix, ordered by relevance. Each result has a `highlight` snippet with
+    the matched words in `<mark>` tags. An empty `q` lists everything, newest
+    (or for users, highest reputation) first.
+
+    `fields` is a comma-separated list of result fields; each result type returns
+    the requested fields it has, plus `result_type` and its id.
+
+    Mixed results (type=all) are merged across types by exact title or
+    username match, then relevance, then date. Pass the returned
+    `next_cursor` to get the next page; `page` also works but reads every
+    earlier page again.
+
+    Result types whose queries miss the SEARCH_DEADLINE_SECONDS deadline are
+    left out and listed in `timed_out`.
+
+    With SEARCH_BACKEND = "bm25", articles and comments are found and ranked
+    by the embedded BM25 index, unless filtered by category or tag.
     """
     try:
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        
         # Validate search type
         valid_types = ["articles", "users", "comments", "all"]
         if type and type not in valid_types:
@@ -39,282 +104,363 @@ async def search(
             )
         
         search_type = type if type else "all"
-        search_term = f"%{q}%"
+        tsquery = build_tsquery(q)
         
-        results = []
-        total = 0
+        # Per result type, the key of the last row taken on earlier pages
+        positions = {}
+        if cursor:
+            if search_type != "all":
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="cursor is only supported with type=all"
+                )
+            try:
+                positions = decode_search_cursor(cursor)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid cursor"
+                )
         
-        # Search articles
-        if search_type in ["articles", "all"]:
-            article_query = """
-            SELECT 
-                'article' as result_type,
-                a.article_id, a.title, a.description, a.source_url, a.created_at, 
-                a.upvotes, a.downvotes, a.views,
-                c.name as category,
-                u.username as submitted_by
-            FROM 
-                articles a
-            JOIN 
-                categories c ON a.category_id = c.category_id
-            JOIN 
-                users u ON a.submitted_by = u.user_id
-            WHERE 
-                a.status = 'approved' AND
-                (
-                    a.title ILIKE %s OR
-                    a.description ILIKE %s
+        # Resolve the projection for each result type
+        type_fields = {
+            "articles": SEARCH_ARTICLE_FIELDS,
+            "users": SEARCH_USER_FIELDS,
+            "comments": SEARCH_COMMENT_FIELDS,
+        }
+        searched_types = list(type_fields) if search_type == "all" else [search_type]
+        requested = None
+        if fields:
+            requested = [name.strip() for name in fields.split(",") if name.strip()]
+            known = {"highlight"}
+            for result_type in searched_types:
+                known.update(type_fields[result_type])
+            unknown = [name for name in requested if name not in known]
+            if unknown:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown fields: {', '.join(unknown)}. Must be from: {', '.join(sorted(known))}"
                 )
+        
+        # Snippets are only computed for a text query, and when requested
+        highlight = tsquery is not None and (requested is None or "highlight" in requested)
+        
+        def projection(result_type, id_field):
+            allowed = type_fields[result_type]
+            if requested is None:
+                selected = list(allowed)
+            else:
+                selected = [name for name in requested if name in allowed]
+            if id_field not in selected:
+                selected.insert(0, id_field)
+            return selected
+        
+        def text_search(vector, default_order):
+            """Match condition, rank and ORDER BY for one result type"""
+            if tsquery is None:
+                return "TRUE", "0", default_order
+            return match_condition(vector), rank_expression(vector), "search_rank DESC"
+        
+        # Mixed pages are merged from the front of each type's list: a page
+        # skips `skip` merged rows and may take all of its rows from one
+        # type, plus one to tell whether there is a next page
+        skip = 0 if cursor else (page - 1) * limit
+        
+        def paging(result_type, id_column, exact, rank, created_at, order):
             """
-            
-            article_count_query = """
-            SELECT COUNT(*) as count
-            FROM 
-                articles a
-            JOIN 
-                categories c ON a.category_id = c.category_id
-            WHERE 
-                a.status = 'approved' AND
-                (
-                    a.title ILIKE %s OR
-                    a.description ILIKE %s
-                )
+            Extra SELECT columns, keyset condition, ORDER BY and LIMIT/OFFSET
+            parameters of one result type's page query
             """
-            
-            params = [search_term, search_term]
-            count_params = [search_term, search_term]
+            if search_type != "all":
+                return "", "", f"{order}, {id_column} DESC", {"limit": limit, "offset": (page - 1) * limit}
+            columns, after = merged_order(exact, rank, created_at, id_column)
+            params = {"limit": skip + limit + 1, "offset": 0}
+            condition = ""
+            if result_type in positions:
+                condition = f"AND {after}"
+                params.update(zip(("after_exact", "after_rank", "after_created_at", "after_id"), positions[result_type]))
+            order_by = ", ".join(f"{column} DESC" for column in [*MERGED_ORDER, id_column])
+            return f", {columns}", condition, order_by, params
+        
+        def highlight_order():
+            return MERGED_ORDER if search_type == "all" else ("search_rank",)
+        
+        # Articles and comments matched by the embedded index, by score
+        hits = {}
+        if settings.SEARCH_BACKEND == "bm25" and search_engine.enabled and tsquery is not None:
+            indexed = [
+                result_type for result_type in searched_types
+                if result_type in ("articles", "comments") and not category and not (tag and result_type == "articles")
+            ]
+            found = await asyncio.gather(*(
+                run_in_threadpool(search_engine.search, q, result_type) for result_type in indexed
+            ))
+            hits = await run_in_threadpool(searchable_hits, pool, dict(zip(indexed, found)))
+        
+        def from_hits(result_type, table, id_column):
+            """
+            FROM clause joining `table` to the page of hits of one result type,
+            as rows of h(exact, rank, created_at, id), and its parameters
+            """
+            found = hits[result_type]
+            if search_type != "all":
+                keys = [
+                    (hit.exact, hit.score, hit.created_at, hit.row_id)
+                    for hit in found[(page - 1) * limit:page * limit]
+                ]
+            else:
+                # Scores squashed into [0, 1), the range of ts_rank, to merge
+                # with Postgres-ranked types
+                keys = sorted(
+                    ((hit.exact, hit.score / (hit.score + 1), hit.created_at, hit.row_id) for hit in found),
+                    key=lambda key: merge_rank(result_type, key)
+                )
+                if result_type in positions:
+                    after = merge_rank(result_type, positions[result_type])
+                    keys = [key for key in keys if merge_rank(result_type, key) > after]
+                keys = keys[:skip + limit + 1]
+            source = f"""
+                unnest(%(hit_exact)s::int[], %(hit_rank)s::float8[], %(hit_created_at)s::timestamp[], %(hit_id)s::int[])
+                    AS h(exact, rank, created_at, id)
+            JOIN 
+                {table} ON {id_column} = h.id"""
+            names = ("hit_exact", "hit_rank", "hit_created_at", "hit_id")
+            columns = list(zip(*keys)) or [()] * len(names)
+            return source, {name: list(column) for name, column in zip(names, columns)}
+        
+        # Count query (or the count itself, from the embedded index) and page
+        # query with their parameters, per result type
+        queries = {}
+        
+        # Search articles
+        if search_type in ["articles", "all"]:
+            article_fields = projection("articles", "article_id")
+            match, rank, order = text_search("a.search_vector", "a.created_at DESC")
+            source, exact, created_at = "articles a", "lower(a.title) = lower(%(q)s)", "a.created_at"
+            params = {"tsquery": tsquery, "q": q, "category": category, "tag": tag}
+            if "articles" in hits:
+                source, hit_params = from_hits("articles", "articles a", "a.article_id")
+                params.update(hit_params)
+                match, rank, exact, created_at = "TRUE", "h.rank", "h.exact = 1", "h.created_at"
+            if search_type == "all":
+                rank = f"({rank})::float8"
+            columns, after, order, paging_params = paging(
+                "articles", "a.article_id", exact, rank, created_at, order
+            )
+            filters = ""
             
             # Add category filter
             if category:
-                article_query += " AND c.name = %s"
-                article_count_query += " AND c.name = %s"
-                params.append(category)
-                count_params.append(category)
+                filters += " AND c.name = %(category)s"
             
             # Add tag filter
             if tag:
-                article_query += """
+                filters += """
                 AND a.article_id IN (
                     SELECT at.article_id
                     FROM article_tags at
                     JOIN tags t ON at.tag_id = t.tag_id
-                    WHERE t.name = %s
+                    WHERE t.name = %(tag)s
                 )
                 """
-                article_count_query += """
-                AND a.article_id IN (
-                    SELECT at.article_id
-                    FROM article_tags at
-                    JOIN tags t ON at.tag_id = t.tag_id
-                    WHERE t.name = %s
-                )
+            
+            article_count_query = f"""
+                SELECT COUNT(*) as count
+                FROM 
+                    articles a
+                JOIN 
+                    categories c ON a.category_id = c.category_id
+                WHERE 
+                    a.status = 'approved' AND {match} {filters}
                 """
-                params.append(tag)
-                count_params.append(tag)
             
-            # Get article count
-            cursor.execute(article_count_query, count_params)
-            article_count = cursor.fetchone()["count"]
-            total += article_count
+            article_query = f"""
+            SELECT 
+                'article' as result_type,
+                {select_list(article_fields, SEARCH_ARTICLE_FIELDS)},
+                {rank} as search_rank{columns}
+            FROM 
+                {source}
+            JOIN 
+                categories c ON a.category_id = c.category_id
+            JOIN 
+                users u ON a.submitted_by = u.user_id
+            WHERE 
+                a.status = 'approved' AND {match} {filters} {after}
+            ORDER BY {order}
+            LIMIT %(limit)s OFFSET %(offset)s
+            """
+            if highlight:
+                article_query = with_highlight(
+                    article_query, "articles", "article_id", "t.title || ' ' || t.description", highlight_order()
+                )
+            
+            if "articles" in hits:
+                # The page of hits was already cut from the searchable ones
+                article_count_query = len(hits["articles"])
+                paging_params["offset"] = 0
             
-            # Only fetch articles if we're on the right page
-            if search_type == "articles" or search_type == "all":
-                # Add sorting and pagination
-                article_query += " ORDER BY a.created_at DESC"
-                
-                if search_type == "articles":
-                    article_query += " LIMIT %s OFFSET %s"
-                    params.extend([limit, (page - 1) * limit])
-                elif search_type == "all":
-                    # For "all" type, we need to limit results per type
-                    article_query += " LIMIT %s"
-                    params.append(min(limit, 5))  # Show at most 5 articles in mixed results
-                
-                cursor.execute(article_query, params)
-                
-                for article in cursor.fetchall():
-                    # Get tags for article
-                    cursor.execute(
-                        """
-                        SELECT t.name
-                        FROM tags t
-                        JOIN article_tags at ON t.tag_id = at.tag_id
-                        WHERE at.article_id = %s
-                        """,
-                        (article["article_id"],)
-                    )
-                    tags = [row["name"] for row in cursor.fetchall()]
-                    
-                    # Calculate score
-                    score = article["upvotes"] - article["downvotes"]
-                    
-                    article_data = dict(article)
-                    article_data["tags"] = tags
-                    article_data["score"] = score
-                    article_data["created_at"] = article["created_at"].isoformat()
-                    
-                    results.append(article_data)
+            queries["articles"] = (article_count_query, article_query, params, paging_params)
         
         # Search users
         if search_type in ["users", "all"]:
-            user_query = """
+            user_fields = projection("users", "user_id")
+            match, rank, order = text_search("u.search_vector", f"{USER_REPUTATION} DESC")
+            if search_type == "all":
+                rank = f"({rank})::float8"
+            columns, after, order, paging_params = paging(
+                "users", "u.user_id", "lower(u.username) = lower(%(q)s)", rank, "u.created_at", order
+            )
+            params = {"tsquery": tsquery, "q": q}
+            
+            user_count_query = f"SELECT COUNT(*) as count FROM users u WHERE {match}"
+            
+            user_query = f"""
             SELECT 
                 'user' as result_type,
-                u.user_id, u.username, u.display_name, u.bio, u.avatar_url, 
-                u.role, u.reputation, u.created_at
+                {select_list(user_fields, SEARCH_USER_FIELDS)},
+                {rank} as search_rank{columns}
             FROM 
                 users u
             WHERE 
-                u.username ILIKE %s OR
-                u.display_name ILIKE %s OR
-                u.bio ILIKE %s
+                {match} {after}
+            ORDER BY {order}
+            LIMIT %(limit)s OFFSET %(offset)s
             """
+            if highlight:
+                user_query = with_highlight(
+                    user_query, "users", "user_id",
+                    "t.username || ' ' || COALESCE(t.display_name, '') || ' ' || COALESCE(t.bio, '')", highlight_order()
+                )
             
-            user_count_query = """
-            SELECT COUNT(*) as count
-            FROM users u
-            WHERE 
-                u.username ILIKE %s OR
-                u.display_name ILIKE %s OR
-                u.bio ILIKE %s
-            """
-            
-            user_params = [search_term, search_term, search_term]
-            
-            # Get user count
-            cursor.execute(user_count_query, user_params)
-            user_count = cursor.fetchone()["count"]
-            total += user_count
-            
-            # Only fetch users if we're on the right page
-            if search_type == "users" or search_type == "all":
-                # Add sorting and pagination
-                user_query += " ORDER BY u.reputation DESC"
-                
-                if search_type == "users":
-                    user_query += " LIMIT %s OFFSET %s"
-                    user_params.extend([limit, (page - 1) * limit])
-                elif search_type == "all":
-                    # For "all" type, we need to limit results per type
-                    user_query += " LIMIT %s"
-                    user_params.append(min(limit, 3))  # Show at most 3 users in mixed results
-                
-                cursor.execute(user_query, user_params)
-                
-                for user in cursor.fetchall():
-                    # Get badge count
-                    cursor.execute(
-                        """
-                        SELECT COUNT(*) as badge_count
-                        FROM user_badges
-                        WHERE user_id = %s
-                        """,
-                        (user["user_id"],)
-                    )
-                    badge_count = cursor.fetchone()["badge_count"]
-                    
-                    user_data = dict(user)
-                    user_data["badge_count"] = badge_count
-                    user_data["created_at"] = user["created_at"].isoformat()
-                    
-                    results.append(user_data)
+            queries["users"] = (user_count_query, user_query, params, paging_params)
         
         # Search comments
         if search_type in ["comments", "all"]:
-            comment_query = """
-            SELECT 
-                'comment' as result_type,
-                c.comment_id, c.article_id, c.user_id, c.text, c.created_at, c.parent_comment_id,
-                u.username,
-                a.title as article_title
-            FROM 
-                comments c
-            JOIN 
-                users u ON c.user_id = u.user_id
-            JOIN 
-                articles a ON c.article_id = a.article_id
-            WHERE 
-                c.is_deleted = FALSE AND
-                a.status = 'approved' AND
-                c.text ILIKE %s
-            """
-            
-            comment_count_query = """
-            SELECT COUNT(*) as count
-            FROM 
-                comments c
-            JOIN 
-                articles a ON c.article_id = a.article_id
-            WHERE 
-                c.is_deleted = FALSE AND
-                a.status = 'approved' AND
-                c.text ILIKE %s
-            """
-            
-            comment_params = [search_term]
+            comment_fields = projection("comments", "comment_id")
+            match, rank, order = text_search("cm.search_vector", "cm.created_at DESC")
+            source, created_at = "comments cm", "cm.created_at"
+            params = {"tsquery": tsquery, "category": category}
+            if "comments" in hits:
+                source, hit_params = from_hits("comments", "comments cm", "cm.comment_id")
+                params.update(hit_params)
+                match, rank, created_at = "TRUE", "h.rank", "h.created_at"
+            if search_type == "all":
+                rank = f"({rank})::float8"
+            columns, after, order, paging_params = paging(
+                "comments", "cm.comment_id", "FALSE", rank, created_at, order
+            )
+            filters = ""
             
             # Add category filter
             if category:
-                comment_query += """
+                filters += """
                 AND a.category_id IN (
-                    SELECT category_id FROM categories WHERE name = %s
+                    SELECT category_id FROM categories WHERE name = %(category)s
                 )
                 """
-                comment_count_query += """
-                AND a.category_id IN (
-                    SELECT category_id FROM categories WHERE name = %s
-                )
+            
+            comment_count_query = f"""
+                SELECT COUNT(*) as count
+                FROM 
+                    comments cm
+                JOIN 
+                    articles a ON cm.article_id = a.article_id
+                WHERE 
+                    cm.is_deleted = FALSE AND
+                    a.status = 'approved' AND {match} {filters}
                 """
-                comment_params.append(category)
             
-            # Get comment count
-            cursor.execute(comment_count_query, comment_params)
-            comment_count = cursor.fetchone()["count"]
-            total += comment_count
+            comment_query = f"""
+            SELECT 
+                'comment' as result_type,
+                {select_list(comment_fields, SEARCH_COMMENT_FIELDS)},
+                {rank} as search_rank{columns}
+            FROM 
+                {source}
+            JOIN 
+                users u ON cm.user_id = u.user_id
+            JOIN 
+                articles a ON cm.article_id = a.article_id
+            WHERE 
+                cm.is_deleted = FALSE AND
+                a.status = 'approved' AND {match} {filters} {after}
+            ORDER BY {order}
+            LIMIT %(limit)s OFFSET %(offset)s
+            """
+            if highlight:
+                comment_query = with_highlight(comment_query, "comments", "comment_id", "t.text", highlight_order())
+            
+            if "comments" in hits:
+                comment_count_query = len(hits["comments"])
+                paging_params["offset"] = 0
             
-            # Only fetch comments if we're on the right page
-            if search_type == "comments" or search_type == "all":
-                # Add sorting and pagination
-                comment_query += " ORDER BY c.created_at DESC"
-                
-                if search_type == "comments":
-                    comment_query += " LIMIT %s OFFSET %s"
-                    comment_params.extend([limit, (page - 1) * limit])
-                elif search_type == "all":
-                    # For "all" type, we need to limit results per type
-                    comment_query += " LIMIT %s"
-                    comment_params.append(min(limit, 3))  # Show at most 3 comments in mixed results
-                
-                cursor.execute(comment_query, comment_params)
-                
-                for comment in cursor.fetchall():
-                    comment_data = dict(comment)
-                    comment_data["created_at"] = comment["created_at"].isoformat()
-                    
-                    results.append(comment_data)
+            queries["comments"] = (comment_count_query, comment_query, params, paging_params)
+        
+        def count(query, params):
+            def leg(cursor):
+                cursor.execute(query, params)
+                return cursor.fetchone()["count"]
+            return leg
+        
+        def rows(query, params):
+            def leg(cursor):
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            return leg
+        
+        # Run every count and page query at once, each on its own connection
+        legs = {}
+        counts = {}
+        for result_type, (count_query, page_query, params, paging) in queries.items():
+            if isinstance(count_query, int):
+                counts[(result_type, "count")] = count_query
+            else:
+                legs[(result_type, "count")] = count(count_query, params)
+            legs[(result_type, "page")] = rows(page_query, dict(params, **paging))
+        done, missed = await run_legs(pool, legs, settings.SEARCH_DEADLINE_SECONDS)
+        done.update(counts)
         
-        # For "all" type, sort results by relevance (simple implementation)
+        # A result type is returned only if both its queries finished
+        timed_out = [result_type for result_type in queries if any(key[0] == result_type for key in missed)]
+        total = sum(done[(result_type, "count")] for result_type in queries if result_type not in timed_out)
+        
+        next_cursor = None
         if search_type == "all":
-            # Sort by exact match in title/username first, then by date
-            results.sort(key=lambda x: (
-                # Exact title/username match gets highest priority
-                -1 if (x.get("title") and x.get("title").lower() == q.lower()) or 
-                      (x.get("username") and x.get("username").lower() == q.lower()) else 0,
-                # Then sort by date (most recent first)
-                x.get("created_at", ""), 
-            ))
-            
-            # Apply pagination after combining and sorting
-            start_idx = (page - 1) * limit
-            end_idx = start_idx + limit
-            results = results[start_idx:end_idx]
+            # k-way merge of the sorted pages of each type. A type that timed
+            # out keeps its position, so its rows come on later pages.
+            id_fields = {"articles": "article_id", "users": "user_id", "comments": "comment_id"}
+            lists = [
+                [(merge_rank(result_type, merged_key(row, id_fields[result_type])), result_type, row)
+                 for row in done[(result_type, "page")]]
+                for result_type in queries if result_type not in timed_out
+            ]
+            merged = list(itertools.islice(heapq.merge(*lists, key=lambda item: item[0]), skip + limit + 1))
+            for _, result_type, row in merged[:skip + limit]:
+                positions[result_type] = merged_key(row, id_fields[result_type])
+            if len(merged) > skip + limit:
+                next_cursor = encode_search_cursor(positions)
+            results = [row for _, _, row in merged[skip:skip + limit]]
+        else:
+            results = done[(search_type, "page")] if search_type not in timed_out else []
+        
+        # Drop sort keys that were only fetched for ordering
+        for result in results:
+            for key in ("search_rank", "search_exact", "search_created_at"):
+                result.pop(key, None)
         
-        return {
+        response = trusted_response({
             "total": total,
             "page": page,
             "limit": limit,
-            "results": results
-        }
+            "results": results,
+            "next_cursor": next_cursor,
+            "timed_out": timed_out
+        }, SearchResponse)
+        if timed_out:
+            # Incomplete results must not be served from the response cache
+            response.headers["Cache-Control"] = "no-store"
+        return response
     
     except HTTPException:
         raise
@@ -323,93 +469,11 @@ async def search(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to search: {str(e)}"
         )
-    finally:
-        cursor.close()
 
 @router.get("/suggestions", response_model=List[str])
-async def get_search_suggestions(
-    q: str,
-    db = Depends(get_db)
-):
+async def get_search_suggestions(q: str):
     """
-    Get search suggestions based on partial input
+    Get search suggestions based on partial input: article titles, tags,
+    categories and usernames, from the in-memory suggestion index
     """
-    try:
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        
-        search_term = f"%{q}%"
-        suggestions = set()
-        
-        # Get article title suggestions
-        cursor.execute(
-            """
-            SELECT title
-            FROM articles
-            WHERE status = 'approved' AND title ILIKE %s
-            LIMIT 5
-            """,
-            (search_term,)
-        )
-        for row in cursor.fetchall():
-            suggestions.add(row["title"])
-        
-        # Get tag suggestions
-        cursor.execute(
-            """
-            SELECT name
-            FROM tags
-            WHERE name ILIKE %s
-            LIMIT 5
-            """,
-            (search_term,)
-        )
-        for row in cursor.fetchall():
-            suggestions.add(row["name"])
-        
-        # Get category suggestions
-        cursor.execute(
-            """
-            SELECT name
-            FROM categories
-            WHERE name ILIKE %s
-            LIMIT 5
-            """,
-            (search_term,)
-        )
-        for row in cursor.fetchall():
-            suggestions.add(row["name"])
-        
-        # Get username suggestions
-        cursor.execute(
-            """
-            SELECT username
-            FROM users
-            WHERE username ILIKE %s
-            LIMIT 5
-            """,
-            (search_term,)
-        )
-        for row in cursor.fetchall():
-            suggestions.add(row["username"])
-        
-        # Convert to list and sort
-        suggestion_list = list(suggestions)
-        suggestion_list.sort(key=lambda x: (
-            # Exact match gets highest priority
-            0 if x.lower() == q.lower() else 1,
-            # Starts with query gets second priority
-            0 if x.lower().startswith(q.lower()) else 1,
-            # Then sort alphabetically
-            x.lower()
-        ))
-        
-        # Limit to 10 suggestions
-        return suggestion_list[:10]
-    
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to get search suggestions: {str(e)}"
-        )
-    finally:
-        cursor.close() 
\ No newline at end of file
+    return suggestion_index.suggest(q)
@@ -7,6 +7,7 @@ from psycopg2.extras import RealDictCursor
 
 from app.core.security import get_current_user, get_password_hash
 from app.db.session import get_db
+from app.services.counters import ARTICLE_DOWNVOTES, ARTICLE_UPVOTES, USER_REPUTATION
 
 router = APIRouter()
 
@@ -71,10 +72,10 @@ async def get_current_user_profile(
         
         # Get user profile
         cursor.execute(
-            """
+            f"""
             SELECT 
                 u.user_id, u.username, u.display_name, u.bio, u.avatar_url, 
-                u.email, u.role, u.reputation, u.created_at, u.last_login
+                u.email, u.role, {USER_REPUTATION} as reputation, u.created_at, u.last_login
             FROM 
                 users u
             WHERE 
@@ -153,10 +154,10 @@ async def get_user_profile(
         
         # Get user profile
         cursor.execute(
-            """
+            f"""
             SELECT 
                 u.user_id, u.username, u.display_name, u.bio, u.avatar_url, 
-                u.email, u.role, u.reputation, u.created_at, u.last_login
+                u.email, u.role, {USER_REPUTATION} as reputation, u.created_at, u.last_login
             FROM 
                 users u
             WHERE 
@@ -279,10 +280,11 @@ async def update_current_user_profile(
             update_fields.append("updated_at = CURRENT_TIMESTAMP")
             
             query = f"""
-            UPDATE users
+            UPDATE users u
             SET {", ".join(update_fields)}
-            WHERE user_id = %s
-            RETURNING user_id, username, display_name, bio, avatar_url, email, role, reputation, created_at, last_login
+            WHERE u.user_id = %s
+            RETURNING u.user_id, u.username, u.display_name, u.bio, u.avatar_url, u.email, u.role,
+                {USER_REPUTATION} as reputation, u.created_at, u.last_login
             """
             update_values.append(current_user["user_id"])
             
@@ -648,10 +650,10 @@ async def get_current_user_articles(
         
         # Get paginated articles
         cursor.execute(
-            """
+            f"""
             SELECT 
                 a.article_id, a.title, a.description, a.source_url, a.created_at, 
-                a.upvotes, a.downvotes, a.views, a.status,
+                {ARTICLE_UPVOTES} as upvotes, {ARTICLE_DOWNVOTES} as downvotes, a.views, a.status,
                 c.name as category
             FROM 
                 articles a
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Dict, Optional
 from pydantic import BaseModel
-from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from app.core.config import settings
 from app.core.security import get_current_user
-from app.db.session import get_db
+from app.db.session import autocommit, get_db
+from app.services.counters import ARTICLE_DOWNVOTES, ARTICLE_UPVOTES, counter_shard
+from app.services.notifications import notification_buffer
+from app.services.votes import get_user_votes
 
 router = APIRouter()
 
@@ -18,12 +21,135 @@ class VoteResponse(BaseModel):
     upvotes: int
     downvotes: int
     score: int
-    user_vote: str
+    user_vote: Optional[str] = None
+    previous_vote: Optional[str] = None
 
 class UserVoteResponse(BaseModel):
     article_id: int
     user_vote: Optional[str] = None
 
+class UserVotesResponse(BaseModel):
+    votes: Dict[int, Optional[str]]
+
+# Record a vote and apply all of its side effects in one statement: the vote
+# upsert/delete, the article counters, the author's reputation and the
+# activity log. Counter and reputation deltas are derived
+# from the previous vote and are added to counter shards (see
+# app/services/counters.py) rather than to the hot articles/users rows.
+# Concurrent requests from the same user on the same article are serialized
+# by an advisory lock on the pair, taken in a statement of its own: the vote
+# statement then reads `prev` in a snapshot taken after the lock is granted,
+# so it sees a first vote committed by the other request (FOR UPDATE alone
+# locks nothing while there is no vote row yet). Both statements are sent in
+# one round trip and run in one implicit transaction, which releases the lock.
+# Reputation points come from reputation_weights, and every reputation change
+# is appended to reputation_ledger.
+# Returns the counters including pending deltas and whether the vote added an
+# upvote (for the author's notification), or no row if the article does not
+# exist. Changed counters are also published to live subscribers.
+VOTE_STATEMENT = """
+SELECT pg_advisory_xact_lock(%(user_id)s, %(article_id)s);
+WITH art AS (
+    SELECT article_id, status, submitted_by, upvotes, downvotes
+    FROM articles
+    WHERE article_id = %(article_id)s
+),
+prev AS (
+    SELECT vote_id, vote_type
+    FROM votes
+    WHERE article_id = %(article_id)s AND user_id = %(user_id)s
+    FOR UPDATE
+),
+counts AS (
+    SELECT
+        (CASE WHEN %(vote_type)s = 'upvote' THEN 1 ELSE 0 END)
+            - (CASE WHEN prev.vote_type = 'upvote' THEN 1 ELSE 0 END) AS up,
+        (CASE WHEN %(vote_type)s = 'downvote' THEN 1 ELSE 0 END)
+            - (CASE WHEN prev.vote_type = 'downvote' THEN 1 ELSE 0 END) AS down,
+        art.submitted_by
+    FROM art
+    LEFT JOIN prev ON TRUE
+    WHERE art.status = 'approved'
+),
+delta AS (
+    SELECT
+        counts.up, counts.down, counts.submitted_by,
+        counts.up * COALESCE(MAX(w.points) FILTER (WHERE w.event = 'article_upvote'), 0)
+            + counts.down * COALESCE(MAX(w.points) FILTER (WHERE w.event = 'article_downvote'), 0) AS reputation
+    FROM counts
+    LEFT JOIN reputation_weights w ON w.event IN ('article_upvote', 'article_downvote')
+    GROUP BY counts.up, counts.down, counts.submitted_by
+),
+ins AS (
+    INSERT INTO votes (article_id, user_id, vote_type)
+    SELECT %(article_id)s, %(user_id)s, %(vote_type)s
+    FROM delta
+    WHERE %(vote_type)s <> 'none'
+    ON CONFLICT (article_id, user_id) DO UPDATE
+        SET vote_type = EXCLUDED.vote_type, updated_at = CURRENT_TIMESTAMP
+        WHERE votes.vote_type <> EXCLUDED.vote_type
+),
+del AS (
+    DELETE FROM votes
+    WHERE vote_id = (SELECT vote_id FROM prev)
+      AND %(vote_type)s = 'none'
+      AND EXISTS (SELECT 1 FROM delta)
+),
+article_shard AS (
+    INSERT INTO article_vote_shards (article_id, shard, upvotes, downvotes)
+    SELECT %(article_id)s, %(shard)s, delta.up, delta.down
+    FROM delta
+    WHERE delta.up <> 0 OR delta.down <> 0
+    ON CONFLICT (article_id, shard) DO UPDATE
+        SET upvotes = article_vote_shards.upvotes + EXCLUDED.upvotes,
+            downvotes = article_vote_shards.downvotes + EXCLUDED.downvotes
+),
+reputation_shard AS (
+    INSERT INTO user_reputation_shards (user_id, shard, reputation)
+    SELECT delta.submitted_by, %(shard)s, delta.reputation
+    FROM delta
+    WHERE delta.reputation <> 0
+    ON CONFLICT (user_id, shard) DO UPDATE
+        SET reputation = user_reputation_shards.reputation + EXCLUDED.reputation
+),
+ledger AS (
+    INSERT INTO reputation_ledger (user_id, points, reason, entity_id, actor_id)
+    SELECT delta.submitted_by, delta.reputation, 'article_vote', %(article_id)s, %(user_id)s
+    FROM delta
+    WHERE delta.reputation <> 0
+),
+activity AS (
+    INSERT INTO user_activity (user_id, activity_type, entity_id)
+    SELECT %(user_id)s, 'article_' || %(vote_type)s, %(article_id)s
+    FROM delta
+),
+pending AS (
+    SELECT COALESCE(SUM(upvotes), 0) AS up, COALESCE(SUM(downvotes), 0) AS down
+    FROM article_vote_shards
+    WHERE article_id = %(article_id)s
+),
+counters AS (
+    SELECT
+        art.status,
+        (SELECT vote_type FROM prev) AS previous_vote,
+        art.submitted_by,
+        COALESCE(delta.up, 0) > 0 AS upvoted,
+        COALESCE(delta.up, 0) <> 0 OR COALESCE(delta.down, 0) <> 0 AS changed,
+        art.upvotes + pending.up + COALESCE(delta.up, 0) AS upvotes,
+        art.downvotes + pending.down + COALESCE(delta.down, 0) AS downvotes
+    FROM art
+    CROSS JOIN pending
+    LEFT JOIN delta ON TRUE
+)
+SELECT
+    status, previous_vote, submitted_by, upvoted, upvotes, downvotes,
+    -- Live update for stream subscribers (app/services/live.py), delivered on commit
+    CASE WHEN changed THEN pg_notify('article_events', json_build_object(
+        'type', 'votes', 'article_id', %(article_id)s, 'upvotes', upvotes, 'downvotes', downvotes
+    )::text) END AS published
+FROM counters
+"""
+
 @router.post("/{article_id}/vote", response_model=VoteResponse)
 async def vote_on_article(
     article_id: int,
@@ -45,109 +171,52 @@ async def vote_on_article(
             detail="Invalid vote type. Must be 'upvote', 'downvote', or 'none'."
         )
     
+    cursor = db.cursor(cursor_factory=RealDictCursor)
     try:
-        # Check if article exists
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        cursor.execute(
-            "SELECT article_id, status, upvotes, downvotes FROM articles WHERE article_id = %s",
-            (article_id,)
-        )
-        article = cursor.fetchone()
+        # The statements run as one implicit transaction, so skip the
+        # BEGIN/COMMIT round trips; the vote lock is held only while they run.
+        with autocommit(db):
+            cursor.execute(
+                VOTE_STATEMENT,
+                {
+                    "article_id": article_id,
+                    "user_id": current_user["user_id"],
+                    "vote_type": vote.vote_type,
+                    "shard": counter_shard(current_user["user_id"]),
+                }
+            )
+            result = cursor.fetchone()
         
-        if not article:
+        if not result:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Article not found"
             )
         
-        if article["status"] != "approved":
+        if result["status"] != "approved":
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cannot vote on an article that is not approved"
             )
         
-        # Check if user has already voted
-        cursor.execute(
-            "SELECT vote_id, vote_type FROM votes WHERE article_id = %s AND user_id = %s",
-            (article_id, current_user["user_id"])
-        )
-        existing_vote = cursor.fetchone()
-        
-        # Handle vote based on existing vote and new vote type
-        if existing_vote:
-            if vote.vote_type == "none":
-                # Remove vote
-                cursor.execute(
-                    "DELETE FROM votes WHERE vote_id = %s",
-                    (existing_vote["vote_id"],)
-                )
-            elif vote.vote_type != existing_vote["vote_type"]:
-                # Update vote
-                cursor.execute(
-                    "UPDATE votes SET vote_type = %s, updated_at = %s WHERE vote_id = %s",
-                    (vote.vote_type, datetime.now(), existing_vote["vote_id"])
-                )
-            # If vote type is the same, do nothing
-        elif vote.vote_type != "none":
-            # Create new vote
-            cursor.execute(
-                "INSERT INTO votes (article_id, user_id, vote_type) VALUES (%s, %s, %s)",
-                (article_id, current_user["user_id"], vote.vote_type)
-            )
-        
-        # Get updated vote counts
-        cursor.execute(
-            "SELECT upvotes, downvotes FROM articles WHERE article_id = %s",
-            (article_id,)
-        )
-        updated_article = cursor.fetchone()
-        
-        # Log user activity
-        cursor.execute(
-            """
-            INSERT INTO user_activity (user_id, activity_type, entity_id)
-            VALUES (%s, %s, %s)
-            """,
-            (current_user["user_id"], f"article_{vote.vote_type}", article_id)
-        )
-        
-        # Create notification for article author if it's an upvote
-        if vote.vote_type == "upvote" and (not existing_vote or existing_vote["vote_type"] != "upvote"):
-            cursor.execute(
-                "SELECT submitted_by FROM articles WHERE article_id = %s",
-                (article_id,)
+        # Written in coalesced batches off the request path
+        if result["upvoted"] and result["submitted_by"] != current_user["user_id"]:
+            notification_buffer.add(
+                result["submitted_by"], "vote", article_id, current_user["user_id"], current_user["username"]
             )
-            article_author = cursor.fetchone()
-            
-            if article_author and article_author["submitted_by"] != current_user["user_id"]:
-                cursor.execute(
-                    """
-                    INSERT INTO notifications (user_id, type, entity_id, message)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (
-                        article_author["submitted_by"],
-                        "vote",
-                        article_id,
-                        f"Your article received an upvote from {current_user['username']}"
-                    )
-                )
-        
-        db.commit()
-        
-        # Calculate score
-        score = updated_article["upvotes"] - updated_article["downvotes"]
         
         return {
             "article_id": article_id,
-            "upvotes": updated_article["upvotes"],
-            "downvotes": updated_article["downvotes"],
-            "score": score,
-            "user_vote": vote.vote_type if vote.vote_type != "none" else None
+            "upvotes": result["upvotes"],
+            "downvotes": result["downvotes"],
+            "score": result["upvotes"] - result["downvotes"],
+            "user_vote": vote.vote_type if vote.vote_type != "none" else None,
+            "previous_vote": result["previous_vote"]
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process vote: {str(e)}"
@@ -155,6 +224,43 @@ async def vote_on_article(
     finally:
         cursor.close()
 
+@router.get("/me", response_model=UserVotesResponse)
+async def get_my_votes(
+    article_ids: str = Query(..., description="Comma-separated article ids, e.g. `1,2,3`"),
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Get the current user's votes on several articles at once.
+
+    Returns a map of article id to `upvote`, `downvote` or null for every
+    requested id, so a feed page needs one request instead of one per article.
+    """
+    try:
+        ids = list(dict.fromkeys(int(i) for i in article_ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="article_ids must be a comma-separated list of integers"
+        )
+    
+    if len(ids) > settings.VOTE_LOOKUP_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.VOTE_LOOKUP_MAX_IDS} article ids can be requested at once"
+        )
+    
+    cursor = db.cursor(cursor_factory=RealDictCursor)
+    try:
+        return {"votes": get_user_votes(cursor, current_user["user_id"], ids)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get user votes: {str(e)}"
+        )
+    finally:
+        cursor.close()
+
 @router.get("/{article_id}/vote", response_model=UserVoteResponse)
 async def get_user_vote(
     article_id: int,
@@ -214,7 +320,11 @@ async def get_article_votes(
         
         # Get article and vote counts
         cursor.execute(
-            "SELECT article_id, upvotes, downvotes FROM articles WHERE article_id = %s",
+            f"""
+            SELECT a.article_id, {ARTICLE_UPVOTES} as upvotes, {ARTICLE_DOWNVOTES} as downvotes
+            FROM articles a
+            WHERE a.article_id = %s
+            """,
             (article_id,)
         )
         article = cursor.fetchone()
@@ -0,0 +1,123 @@
+from fastapi import HTTPException, status
+from typing import Dict, List, Optional
+
+from app.services.counters import (
+    ARTICLE_COMMENT_COUNT, ARTICLE_DOWNVOTES, ARTICLE_SCORE, ARTICLE_UPVOTES, USER_REPUTATION
+)
+
+# Sparse fieldsets for list endpoints.
+#
+# Each map goes from a response field name to the SQL expression that produces
+# it, so a `fields=` request only reads (and de-TOASTs) the columns it asks for.
+# Expressions assume the aliases used by the list queries: `a` for articles,
+# `c` for categories, `u` for users and `cm` for comments.
+
+TAGS_EXPRESSION = """ARRAY(
+    SELECT t.name
+    FROM tags t
+    JOIN article_tags at ON t.tag_id = at.tag_id
+    WHERE at.article_id = a.article_id
+)"""
+
+# GET /articles
+ARTICLE_LIST_FIELDS = {
+    "article_id": "a.article_id",
+    "title": "a.title",
+    "description": "a.description",
+    "url": "a.source_url",
+    "category": "c.name",
+    "submitted_by": "u.username",
+    "created_at": "a.created_at",
+    "upvotes": ARTICLE_UPVOTES,
+    "downvotes": ARTICLE_DOWNVOTES,
+    "score": ARTICLE_SCORE,
+    "views": "a.views",
+    "comment_count": ARTICLE_COMMENT_COUNT,
+    "is_featured": "a.is_featured",
+    "tags": TAGS_EXPRESSION,
+}
+
+# Returned when no `fields` parameter is given
+ARTICLE_LIST_DEFAULT_FIELDS = [
+    "article_id", "title", "description", "url", "category", "submitted_by",
+    "created_at", "upvotes", "downvotes", "views", "comment_count", "is_featured", "tags",
+]
+
+# GET /search, per result type
+SEARCH_ARTICLE_FIELDS = {
+    "article_id": "a.article_id",
+    "title": "a.title",
+    "description": "a.description",
+    "source_url": "a.source_url",
+    "created_at": "a.created_at",
+    "upvotes": ARTICLE_UPVOTES,
+    "downvotes": ARTICLE_DOWNVOTES,
+    "views": "a.views",
+    "comment_count": ARTICLE_COMMENT_COUNT,
+    "category": "c.name",
+    "submitted_by": "u.username",
+    "score": ARTICLE_SCORE,
+    "tags": TAGS_EXPRESSION,
+}
+
+SEARCH_USER_FIELDS = {
+    "user_id": "u.user_id",
+    "username": "u.username",
+    "display_name": "u.display_name",
+    "bio": "u.bio",
+    "avatar_url": "u.avatar_url",
+    "role": "u.role",
+    "reputation": USER_REPUTATION,
+    "created_at": "u.created_at",
+    "badge_count": "(SELECT COUNT(*) FROM user_badges ub WHERE ub.user_id = u.user_id)",
+}
+
+SEARCH_COMMENT_FIELDS = {
+    "comment_id": "cm.comment_id",
+    "article_id": "cm.article_id",
+    "user_id": "cm.user_id",
+    "text": "cm.text",
+    "created_at": "cm.created_at",
+    "parent_comment_id": "cm.parent_comment_id",
+    "username": "u.username",
+    "article_title": "a.title",
+}
+
+def parse_fields(
+    fields: Optional[str],
+    allowed: Dict[str, str],
+    default: List[str],
+    required: List[str] = [],
+) -> List[str]:
+    """
+    Parse a comma-separated `fields` parameter into an ordered list of field names.
+
+    Required fields are always included. Raises a 400 for unknown fields.
+    """
+    if not fields:
+        requested = list(default)
+    else:
+        requested = []
+        for name in fields.split(","):
+            name = name.strip()
+            if name and name not in requested:
+                requested.append(name)
+
+        unknown = [name for name in requested if name not in allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. Must be from: {', '.join(allowed)}"
+            )
+
+    for name in reversed(required):
+        if name not in requested:
+            requested.insert(0, name)
+
+    return requested
+
+def select_list(selected: List[str], allowed: Dict[str, str]) -> str:
+    """
+    Build the SELECT list for the selected fields, aliased to their response names
+    """
+    return ",\n    ".join(f"{allowed[name]} as {name}" for name in selected)
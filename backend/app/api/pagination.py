@@ -0,0 +1,30 @@
+import base64
+from datetime import datetime
+from typing import Tuple, Type, Union
+
+# Opaque keyset cursors.
+#
+# A cursor encodes the sort key of the last row on a page, (created_at, id),
+# so the next page is fetched with `WHERE (created_at, id) < (%s, %s)` from an
+# index on the same columns instead of an OFFSET that rescans earlier pages.
+# Lists sorted by a score use (score, id) cursors the same way.
+
+SortKey = Union[datetime, float]
+
+def encode_cursor(key: SortKey, row_id: int) -> str:
+    value = key.isoformat() if isinstance(key, datetime) else repr(float(key))
+    raw = f"{value}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, key_type: Type = datetime) -> Tuple[SortKey, int]:
+    """
+    Decode a cursor from encode_cursor() whose sort key is a `key_type`
+    (datetime or float); raises ValueError if it is malformed
+    """
+    parse = datetime.fromisoformat if key_type is datetime else float
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        key, _, row_id = raw.partition("|")
+        return parse(key), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.core.config import settings
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after `ttl` seconds.
+
+    Endpoints run both on the event loop and in the threadpool, so every
+    operation takes the lock. Values are stored as-is; callers must not mutate
+    cached values.
+
+    With `max_bytes`, values must support len() (e.g. bytes) and least
+    recently used entries are also evicted to keep their total length under
+    `max_bytes`. A value longer than `max_bytes` is not stored.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = item
+            if expires_at <= now:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None:
+                if len(value) > self.max_bytes:
+                    return
+                self._bytes += len(value)
+            self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def delete_prefix(self, prefix: str) -> None:
+        """
+        Remove every string key starting with `prefix`
+        """
+        with self._lock:
+            for key in [k for k in self._entries if isinstance(k, str) and k.startswith(prefix)]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        # Callers hold the lock
+        item = self._entries.pop(key, None)
+        if item is not None and self.max_bytes is not None:
+            self._bytes -= len(item[1])
+
+    @property
+    def size_bytes(self) -> int:
+        """Total length of the cached values, when bounded by `max_bytes`"""
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Cache of full GET responses for anonymous list endpoints (see ResponseCacheMiddleware)
+response_cache = TTLCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,294 @@
+import gzip
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Encodings we can produce, in order of preference when the client weights them equally
+SUPPORTED_ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+# Responses that must reach the client unbuffered
+UNCOMPRESSED_MEDIA_TYPES = ("text/event-stream",)
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the best supported content coding from an Accept-Encoding header.
+
+    Honours q-values (including `q=0` exclusions and `*`); returns None when the
+    response should be sent uncompressed.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best = None
+    best_q = 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compress a complete body. `level` is the gzip level or brotli quality.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+class _StreamCompressor:
+    """
+    Incremental compressor that flushes after every chunk, so streamed
+    responses (NDJSON exports) reach the client as they are produced.
+    """
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+def _add_vary(headers: MutableHeaders) -> None:
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip according to Accept-Encoding.
+
+    Bodies smaller than `minimum_size` are sent as-is. Responses that already
+    carry a Content-Encoding (such as precompressed cache hits) pass through
+    untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.levels[encoding], self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: str, level: int, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start_message: Optional[Message] = None
+        self.mode = None  # "passthrough", "stream" or None until the first body message
+        self.compressor: Optional[_StreamCompressor] = None
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+
+        if message_type != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            media_type = headers.get("content-type", "")
+            if "content-encoding" in headers or media_type.startswith(UNCOMPRESSED_MEDIA_TYPES):
+                self.mode = "passthrough"
+            elif not more_body:
+                # Whole body in one message
+                if len(body) >= self.minimum_size:
+                    body = compress(body, self.encoding, self.level)
+                    headers["Content-Encoding"] = self.encoding
+                    headers["Content-Length"] = str(len(body))
+                _add_vary(headers)
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            else:
+                self.mode = "stream"
+                self.compressor = _StreamCompressor(self.encoding, self.level)
+                headers["Content-Encoding"] = self.encoding
+                _add_vary(headers)
+                del headers["content-length"]
+
+            await self._send(self.start_message)
+
+        if self.mode == "passthrough":
+            await self._send(message)
+            return
+
+        data = self.compressor.chunk(body) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+class CachedResponse:
+    """
+    A complete response stored with every encoding precomputed, so cache hits
+    are served without compressing again
+    """
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, minimum_size: int, levels: Dict[str, int]):
+        self.status = status
+        self.headers = [
+            (name, value) for name, value in headers
+            if name.lower() not in (b"content-length", b"content-encoding")
+        ]
+        self.bodies = {None: body}
+        if len(body) >= minimum_size:
+            for encoding in SUPPORTED_ENCODINGS:
+                self.bodies[encoding] = compress(body, encoding, levels[encoding])
+
+    async def send(self, send: Send, encoding: Optional[str]) -> None:
+        if encoding not in self.bodies:
+            encoding = None
+        body = self.bodies[encoding]
+
+        headers = MutableHeaders(raw=list(self.headers))
+        headers["Content-Length"] = str(len(body))
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        _add_vary(headers)
+
+        await send({"type": "http.response.start", "status": self.status, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
+
+class ResponseCacheMiddleware:
+    """
+    Cache complete anonymous GET responses for selected paths.
+
+    Entries are keyed by path and normalized query string and stored already
+    compressed in every supported encoding. Requests carrying an Authorization
+    header bypass the cache, since their responses may be personalized.
+    Responses marked `Cache-Control: no-store` are not cached.
+    Must be installed inside CompressionMiddleware, which passes the
+    precompressed bodies through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        cache: TTLCache,
+        paths: Iterable[str],
+        minimum_size: int = 1024,
+        gzip_level: int = 9,
+        brotli_quality: int = 9,
+    ):
+        self.app = app
+        self.cache = cache
+        self.paths = set(paths)
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        if "authorization" in request_headers:
+            await self.app(scope, receive, send)
+            return
+
+        key = cache_key(scope["path"], scope.get("query_string", b"").decode("latin-1"))
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            await cached.send(send, encoding)
+            return
+
+        start_message = None
+        streaming = False
+
+        async def capture(message: Message) -> None:
+            nonlocal start_message, streaming
+            if streaming:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            if (
+                start_message["status"] != 200
+                or message.get("more_body", False)
+                or "no-store" in Headers(raw=start_message["headers"]).get("cache-control", "")
+            ):
+                # Errors, streamed bodies and no-store responses are passed through, not cached
+                streaming = True
+                await send(start_message)
+                await send(message)
+                return
+
+            entry = CachedResponse(
+                start_message["status"], start_message["headers"], message.get("body", b""),
+                self.minimum_size, self.levels,
+            )
+            self.cache.set(key, entry)
+            await entry.send(send, encoding)
+
+        await self.app(scope, receive, capture)
+
+def cache_key(path: str, query_string: str) -> str:
+    """
+    Cache key for a request, insensitive to query parameter order
+    """
+    params = sorted(p for p in query_string.split("&") if p)
+    return f"{path}?{'&'.join(params)}"
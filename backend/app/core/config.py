@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Dict, Optional, List
 import os
 
 class Settings(BaseSettings):
@@ -26,6 +26,81 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = os.getenv("POSTGRES_USER", "postgres")
     POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "St.Clair95#")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "echo")
+    DB_POOL_MIN_CONNECTIONS: int = 1  # Pooled connections kept open per worker
+    DB_POOL_MAX_CONNECTIONS: int = 20  # Upper bound per worker; requests wait for a free one
+    
+    # Response settings
+    VALIDATE_RESPONSES: bool = False  # Validate trusted fast-path responses against their models
+    
+    # Compression settings
+    COMPRESSION_MIN_SIZE: int = 1024  # Bytes; smaller bodies are sent uncompressed
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Response cache settings (anonymous GET list endpoints, stored precompressed)
+    RESPONSE_CACHE_PATHS: List[str] = ["/articles", "/search"]  # Relative to API_V1_STR
+    RESPONSE_CACHE_TTL_SECONDS: int = 30
+    RESPONSE_CACHE_MAX_ENTRIES: int = 256
+    RESPONSE_CACHE_GZIP_LEVEL: int = 9  # Cached entries are compressed once, so use higher levels
+    RESPONSE_CACHE_BROTLI_QUALITY: int = 9
+    
+    # Vote counter settings
+    VOTE_COUNTER_SHARDS: int = 16  # Shard rows per article/author for pending vote deltas
+    COUNTER_FOLD_INTERVAL_SECONDS: int = 5  # How often shards are folded into the counters; 0 disables
+    COUNTER_FOLD_BATCH_SIZE: int = 1000
+    VOTE_LOOKUP_MAX_IDS: int = 100  # Article ids per GET /votes/me request
+    
+    # Notification settings
+    NOTIFICATION_FLUSH_INTERVAL_SECONDS: int = 2  # How often buffered notifications are written; 0 disables them
+    NOTIFICATION_BUFFER_MAX_KEYS: int = 100_000  # Pending (recipient, entity) pairs before events are dropped
+    NOTIFICATION_COUNT_CACHE_TTL_SECONDS: int = 15  # How long a worker serves a cached unread count
+    NOTIFICATION_COUNT_CACHE_MAX_ENTRIES: int = 100_000
+    
+    # Comment thread settings
+    COMMENT_PAGE_SIZE: int = 20  # Threads per page
+    COMMENT_THREAD_DEPTH: int = 3  # Reply levels returned below each thread
+    COMMENT_THREAD_REPLIES: int = 3  # Replies returned per comment before "load more"
+    COMMENT_TREE_MAX_DEPTH: int = 10  # Upper bound for the depth a client can ask for
+    COMMENT_TREE_MAX_REPLIES: int = 100  # Upper bound for the replies per comment a client can ask for
+    COMMENT_PAGE_MAX_COMMENTS: int = 1000  # Comments per response; the deepest replies are cut first
+    COMMENT_CACHE_TTL_SECONDS: int = 10  # How long a worker serves a cached page; bounds staleness of votes and other workers' writes
+    COMMENT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Serialized pages cached per worker
+    COMMENT_CACHE_MAX_ARTICLES: int = 100_000  # Articles whose cache version is tracked per worker
+    
+    # Search settings
+    SEARCH_DEADLINE_SECONDS: float = 2.0  # Result types still running after this are left out of the response
+    SEARCH_BACKEND: str = "postgres"  # "bm25" searches articles and comments in the embedded index (app/services/bm25.py)
+    SEARCH_INDEX_DIR: str = "search_index"  # Segment files of the embedded index; one process per directory
+    SEARCH_INDEX_FLUSH_DOCS: int = 10_000  # Buffered documents written out as a new segment
+    SEARCH_INDEX_MAX_SEGMENTS: int = 8  # Segments are merged into one above this many
+    SEARCH_INDEX_MAINTENANCE_SECONDS: int = 30  # Sync with the database, flush and merge
+    
+    # Search suggestion settings
+    SUGGESTION_MAX_TITLES: int = 100_000  # Most popular approved titles held in memory per worker
+    SUGGESTION_RELOAD_SECONDS: int = 300  # Rebuild the index from the database; 0 loads it once at startup
+    
+    # Live update stream settings
+    LIVE_COALESCE_SECONDS: float = 1.0  # At most one batch of events per stream per interval
+    LIVE_HEARTBEAT_SECONDS: int = 15  # Keep-alive comment on idle streams
+    LIVE_MAX_SUBSCRIBERS: int = 10_000  # Open streams per worker process
+    LIVE_MAX_ARTICLES: int = 100  # Articles per stream
+    
+    # Rate limit settings. Limits are "<count>/<second|minute|hour|day>" per
+    # route group (see app/core/ratelimit.py) and per user or client IP.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (shared)
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # Use X-Forwarded-For when behind a trusted proxy
+    RATE_LIMITS: Dict[str, Dict[str, str]] = {
+        "auth": {"ip": "20/minute"},
+        "votes": {"user": "60/minute", "ip": "300/minute"},
+        "comments": {"user": "10/minute", "ip": "60/minute"},
+        "writes": {"user": "120/minute", "ip": "600/minute"},
+    }
+    
+    # Moderation settings
+    MODERATION_CLAIM_TTL_MINUTES: int = 15  # Claims older than this can be taken by other moderators
+    MODERATION_MAX_BATCH: int = 50
     
     class Config:
         env_file = ".env"
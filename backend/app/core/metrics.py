@@ -0,0 +1,60 @@
+import threading
+from typing import Dict, List, Tuple
+
+# Minimal in-process metrics in the Prometheus text exposition format.
+#
+# Each worker process keeps its own values; scrape every worker (or sum them
+# in the query) for totals.
+
+class Counter:
+    """
+    Monotonically increasing counter with optional labels
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+REGISTRY: List[Counter] = []
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def render_metrics() -> str:
+    """
+    Render every registered metric in the Prometheus text format
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} counter")
+        for labels, value in metric.samples():
+            lines.append(f"{metric.name}{_format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,267 @@
+import math
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import Counter
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # redis is only needed for the shared backend
+    redis_asyncio = None
+
+# Per-user and per-IP token buckets for write endpoints.
+#
+# Requests are matched to a route group (first match wins) and checked against
+# that group's limits before they reach the router, so a rejected request never
+# checks out a database connection. Limits come from settings.RATE_LIMITS.
+
+# (group, methods, path pattern relative to API_V1_STR)
+RATE_LIMIT_GROUPS = [
+    ("auth", {"POST"}, r"/auth/(login|register)"),
+    ("votes", {"POST"}, r"/(votes|comments)/\d+/vote"),
+    ("comments", {"POST"}, r"/comments"),
+    ("writes", {"POST", "PUT", "PATCH", "DELETE"}, r"/.*"),
+]
+
+rate_limit_requests = Counter(
+    "echo_rate_limit_requests_total",
+    "Requests checked by the rate limiter, by route group and outcome",
+    ("group", "outcome"),
+)
+rate_limit_rejections = Counter(
+    "echo_rate_limit_rejections_total",
+    "Requests rejected by the rate limiter, by route group and limit scope",
+    ("group", "scope"),
+)
+rate_limit_backend_errors = Counter(
+    "echo_rate_limit_backend_errors_total",
+    "Rate limiter backend failures (requests are allowed through)",
+)
+
+class Limit:
+    """
+    A token bucket of `capacity` requests refilled evenly over `period` seconds
+    """
+
+    PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        """
+        Parse a limit such as `30/minute`
+        """
+        count, _, period = value.partition("/")
+        if period not in cls.PERIODS:
+            raise ValueError(f"Invalid rate limit {value!r}; expected e.g. '30/minute'")
+        return cls(int(count), cls.PERIODS[period])
+
+class InMemoryBackend:
+    """
+    Token buckets held in this process. Each worker enforces its own limits.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        """
+        Take one token; returns (allowed, seconds until a token is available)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / limit.rate
+
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return allowed, retry_after
+
+    def _prune(self, now: float) -> None:
+        # Drop the least recently touched half; their buckets have mostly refilled
+        by_age = sorted(self._buckets.items(), key=lambda item: item[1][1])
+        for key, _ in by_age[:len(by_age) // 2]:
+            del self._buckets[key]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+# Refill, take and store atomically; Redis time keeps workers on one clock
+REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+class RedisBackend:
+    """
+    Token buckets shared by all workers through Redis
+    """
+
+    def __init__(self, url: str, prefix: str = "echo:ratelimit:"):
+        if redis_asyncio is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package")
+        self.client = redis_asyncio.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(REDIS_TOKEN_BUCKET)
+
+    async def take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        allowed, retry_after = await self._script(
+            keys=[self.prefix + key], args=[limit.capacity, limit.rate]
+        )
+        return bool(allowed), float(retry_after)
+
+    def reset(self) -> None:
+        pass
+
+class RateLimiter:
+    """
+    Route-group limits applied per user (from the bearer token) and per IP
+    """
+
+    def __init__(self, backend, limits: Dict[str, Dict[str, str]], prefix: str = ""):
+        self.backend = backend
+        self.groups: List[Tuple[str, set, Pattern]] = [
+            (group, methods, re.compile(re.escape(prefix) + pattern + "$"))
+            for group, methods, pattern in RATE_LIMIT_GROUPS
+            if group in limits
+        ]
+        self.limits = {
+            group: {scope: Limit.parse(value) for scope, value in scopes.items()}
+            for group, scopes in limits.items()
+        }
+
+    def match(self, method: str, path: str) -> Optional[str]:
+        for group, methods, pattern in self.groups:
+            if method in methods and pattern.match(path):
+                return group
+        return None
+
+    async def check(self, group: str, identities: Dict[str, Optional[str]]) -> Tuple[bool, Optional[str], float]:
+        """
+        Take a token from each applicable bucket.
+
+        Returns (allowed, scope that rejected the request, retry-after seconds).
+        """
+        for scope, limit in self.limits[group].items():
+            identity = identities.get(scope)
+            if identity is None:
+                continue
+            try:
+                allowed, retry_after = await self.backend.take(f"{group}:{scope}:{identity}", limit)
+            except Exception:
+                # Fail open: a limiter outage must not take writes down with it
+                rate_limit_backend_errors.inc()
+                continue
+            if not allowed:
+                return False, scope, retry_after
+        return True, None, 0.0
+
+    def reset(self) -> None:
+        self.backend.reset()
+
+def _user_identity(headers: Headers) -> Optional[str]:
+    """
+    User id from a bearer token, without touching the database. Invalid
+    tokens count as anonymous; the endpoint rejects them later.
+    """
+    authorization = headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    user_id = payload.get("user_id")
+    return str(user_id) if user_id is not None else None
+
+def _client_ip(scope: Scope, headers: Headers) -> Optional[str]:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else None
+
+class RateLimitMiddleware:
+    """
+    Reject over-limit requests with 429 before they reach the router
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        group = self.limiter.match(scope["method"], scope["path"])
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        identities = {"user": _user_identity(headers), "ip": _client_ip(scope, headers)}
+        allowed, rejected_by, retry_after = await self.limiter.check(group, identities)
+
+        if not allowed:
+            rate_limit_requests.inc(group=group, outcome="rejected")
+            rate_limit_rejections.inc(group=group, scope=rejected_by)
+            response = JSONResponse(
+                {"detail": "Rate limit exceeded. Try again later."},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        rate_limit_requests.inc(group=group, outcome="allowed")
+        await self.app(scope, receive, send)
+
+def create_rate_limiter() -> RateLimiter:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        backend = RedisBackend(settings.RATE_LIMIT_REDIS_URL)
+    else:
+        backend = InMemoryBackend()
+    return RateLimiter(backend, settings.RATE_LIMITS, prefix=settings.API_V1_STR)
+
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,37 @@
+from typing import Any, Optional, Type
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    orjson serializes dict subclasses (such as psycopg2's RealDictRow), datetimes,
+    dates and UUIDs natively, so database rows can be returned as-is without
+    copying them into new dicts or calling `.isoformat()` per row.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def trusted_response(
+    content: Any,
+    model: Optional[Type[BaseModel]] = None,
+    status_code: int = 200,
+) -> FastJSONResponse:
+    """
+    Return a response built by the API itself, skipping response_model validation.
+
+    Returning a Response object bypasses FastAPI's response_model pass, which
+    re-validates and re-encodes every item. `model` is still checked when
+    `VALIDATE_RESPONSES` is enabled, so tests and development catch shape drift.
+    """
+    if model is not None and settings.VALIDATE_RESPONSES:
+        model.model_validate(content)
+
+    return FastJSONResponse(content, status_code=status_code)
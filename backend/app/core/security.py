@@ -10,6 +10,7 @@ from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 
 def create_access_token(subject: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -56,4 +57,42 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any
         
         return user_data
     except JWTError:
-        raise credentials_exception 
\ No newline at end of file
+        raise credentials_exception 
+
+async def get_optional_current_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[Dict[str, Any]]:
+    """
+    Get the current user from the token if one was sent, or None for anonymous
+    requests. An invalid or expired token is treated as anonymous.
+    """
+    if token is None:
+        return None
+    
+    try:
+        return await get_current_user(token)
+    except HTTPException:
+        return None
+
+async def get_current_moderator(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    """
+    Get the current user from the token, requiring a moderator or admin role
+    """
+    if current_user.get("role") not in ("moderator", "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Moderator privileges required",
+        )
+    
+    return current_user
+
+
+async def get_current_admin(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    """
+    Get the current user from the token, requiring the admin role
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    
+    return current_user
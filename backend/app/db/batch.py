@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Tuple
+
+# Helpers for batch jobs that sweep a whole table in key-range chunks.
+#
+# Each chunk runs as its own short transaction on one of a few worker
+# connections, so no chunk holds locks for long and chunks proceed in parallel.
+
+def key_ranges(conn, table: str, key: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Split the key space of `table` into half-open [start, end) ranges of
+    `chunk_size` keys. `table` and `key` must be trusted identifiers.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}")
+        low, high = cursor.fetchone()
+        conn.commit()
+    finally:
+        cursor.close()
+
+    if low is None:
+        return []
+    return [(start, min(start + chunk_size, high + 1)) for start in range(low, high + 1, chunk_size)]
+
+def run_chunks(
+    connect: Callable,
+    ranges: List[Tuple[int, int]],
+    work: Callable[[Any, int, int], Any],
+    workers: int = 4,
+) -> List[Any]:
+    """
+    Run `work(conn, start, end)` for every range on `workers` threads.
+
+    Each thread opens one connection and reuses it for its chunks; `work` is
+    expected to commit. Results are returned in range order. The first failure
+    is raised once all running chunks have finished.
+    """
+    local = threading.local()
+    connections = []
+    lock = threading.Lock()
+
+    def run(chunk):
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = connect()
+            with lock:
+                connections.append(conn)
+        try:
+            return work(conn, *chunk)
+        except Exception:
+            conn.rollback()
+            raise
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run, ranges))
+    finally:
+        for conn in connections:
+            conn.close()
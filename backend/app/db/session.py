@@ -1,7 +1,122 @@
+import threading
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from fastapi import Depends
 from app.core.config import settings
 
+def get_connection_params():
+    """
+    Connection parameters for the application database
+    """
+    return {
+        'dbname': settings.POSTGRES_DB,
+        'user': settings.POSTGRES_USER,
+        'password': settings.POSTGRES_PASSWORD,
+        'host': settings.POSTGRES_HOST,
+        'port': settings.POSTGRES_PORT,
+    }
+
+def get_connection():
+    """
+    Open a new database connection. The caller is responsible for closing it.
+
+    Used by code that outlives a request's dependencies, such as streaming
+    responses and command-line tools.
+    """
+    return psycopg2.connect(**get_connection_params())
+
+def get_connection_factory():
+    """
+    Dependency providing a connection factory, for endpoints that manage their
+    own connections (e.g. streaming responses). Overridable in tests.
+    """
+    return get_connection
+
+class ConnectionPool:
+    """
+    Database connections shared by threads, at most `maxconn` at a time.
+
+    Used by endpoints that run several queries at once (see
+    app/services/search.py). Unlike psycopg2's ThreadedConnectionPool,
+    which raises as soon as every connection is in use, connection() waits
+    up to `timeout` seconds for one to be returned.
+    """
+
+    def __init__(self, maxconn: int, minconn: int = 0, **params):
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Borrow a connection. Whatever transaction is left open on it is
+        rolled back when it is returned.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolError("No database connection became free in time")
+        try:
+            conn = self._pool.getconn()
+            try:
+                yield conn
+            finally:
+                if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        conn.close()
+                self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._pool.closeall()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """
+    Dependency providing the process-wide connection pool, created on first
+    use. Overridable in tests.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                settings.DB_POOL_MAX_CONNECTIONS,
+                settings.DB_POOL_MIN_CONNECTIONS,
+                **get_connection_params()
+            )
+        return _pool
+
+def close_connection_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+@contextmanager
+def autocommit(conn):
+    """
+    Run statements on `conn` in autocommit mode.
+
+    A single statement then runs as its own transaction, skipping the BEGIN and
+    COMMIT round trips and releasing its row locks as soon as it finishes. Any
+    transaction already open on the connection is committed first.
+    """
+    if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        conn.commit()
+    previous = conn.autocommit
+    conn.autocommit = True
+    try:
+        yield conn
+    finally:
+        conn.autocommit = previous
+
 def get_db():
     """
     Create and yield a database connection.
@@ -10,20 +125,14 @@ def get_db():
     conn = None
     try:
         # Define the connection parameters
-        params = {
-            'dbname': settings.POSTGRES_DB,
-            'user': settings.POSTGRES_USER,
-            'password': settings.POSTGRES_PASSWORD,
-            'host': settings.POSTGRES_HOST,
-            'port': settings.POSTGRES_PORT,
-        }
+        params = get_connection_params()
 
         print(f"Attempting to connect to database with params: {params}")
-        
+
         # Establish a connection to the database
         conn = psycopg2.connect(**params)
         print("Successfully connected to the database")
-        
+
         yield conn
     except Exception as e:
         print(f"Database connection error: {e}")
@@ -31,4 +140,4 @@ def get_db():
         raise
     finally:
         if conn is not None:
-            conn.close() 
\ No newline at end of file
+            conn.close()
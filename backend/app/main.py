@@ -1,17 +1,80 @@
 from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+import asyncio
 import time
 
+from app.core.cache import response_cache
+from app.core.compression import CompressionMiddleware, ResponseCacheMiddleware
 from app.core.config import settings
-from app.api.endpoints import votes, auth, articles, comments, users, search
+from app.core.metrics import render_metrics
+from app.core.ratelimit import RateLimitMiddleware, rate_limiter
+from app.core.responses import FastJSONResponse
+from app.api.endpoints import votes, auth, articles, comments, users, search, admin, notifications, live
+from app.db.session import close_connection_pool, get_connection
+from app.services.bm25 import run_search_index
+from app.services.counters import run_counter_folder
+from app.services.live import article_events
+from app.services.notifications import notification_buffer, run_notification_writer
+from app.services.suggestions import run_suggestion_loader
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run background tasks for the lifetime of the application
+    """
+    tasks = [asyncio.create_task(run_suggestion_loader(get_connection, settings.SUGGESTION_RELOAD_SECONDS))]
+    if settings.COUNTER_FOLD_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(
+            run_counter_folder(get_connection, settings.COUNTER_FOLD_INTERVAL_SECONDS)
+        ))
+    if settings.NOTIFICATION_FLUSH_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(
+            run_notification_writer(get_connection, settings.NOTIFICATION_FLUSH_INTERVAL_SECONDS, notification_buffer)
+        ))
+    if settings.SEARCH_BACKEND == "bm25":
+        tasks.append(asyncio.create_task(
+            run_search_index(get_connection, settings.SEARCH_INDEX_DIR, settings.SEARCH_INDEX_MAINTENANCE_SECONDS)
+        ))
+    yield
+    for task in tasks:
+        task.cancel()
+    # Let tasks finish their shutdown work, such as the last notification flush
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await article_events.stop()
+    close_connection_pool()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.API_VERSION,
     description=settings.PROJECT_DESCRIPTION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
+)
+
+# Set up response caching and compression. Middleware added later wraps
+# earlier middleware, so requests pass CORS -> rate limit -> compression ->
+# cache -> routes.
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache=response_cache,
+    paths=[f"{settings.API_V1_STR}{path}" for path in settings.RESPONSE_CACHE_PATHS],
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.RESPONSE_CACHE_GZIP_LEVEL,
+    brotli_quality=settings.RESPONSE_CACHE_BROTLI_QUALITY,
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+# Reject over-limit writes before they reach a route (and a DB connection)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
 
 # Set up CORS middleware
 app.add_middleware(
@@ -29,6 +92,9 @@ app.include_router(articles.router, prefix=f"{settings.API_V1_STR}/articles", ta
 app.include_router(comments.router, prefix=f"{settings.API_V1_STR}/comments", tags=["comments"])
 app.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["users"])
 app.include_router(search.router, prefix=f"{settings.API_V1_STR}/search", tags=["search"])
+app.include_router(admin.router, prefix=f"{settings.API_V1_STR}/admin", tags=["admin"])
+app.include_router(notifications.router, prefix=f"{settings.API_V1_STR}/notifications", tags=["notifications"])
+app.include_router(live.router, prefix=f"{settings.API_V1_STR}/live", tags=["live"])
 
 @app.get("/health")
 async def health_check():
@@ -37,6 +103,13 @@ async def health_check():
     """
     return {"status": "ok", "timestamp": time.time()}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Process metrics in the Prometheus text format
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     """
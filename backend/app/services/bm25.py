@@ -0,0 +1,804 @@
+import array
+import asyncio
+import fcntl
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from app.core.config import settings
+
+# Embedded BM25 search engine.
+#
+# With SEARCH_BACKEND = "bm25", GET /search finds approved articles and
+# their comments in this in-process inverted index instead of through
+# Postgres full-text search, and only reads the matched rows by id
+# (users are always searched in Postgres).
+#
+# The index is a set of immutable segment files in SEARCH_INDEX_DIR, read
+# through mmap, plus an in-memory buffer of recent documents. A segment holds
+# its documents sorted by key, a sorted term dictionary and, per term, the
+# documents containing it with their term frequencies. Replacing or removing
+# a document marks its old copy deleted in a per-segment bitmap. The buffer
+# is written out as a new segment every SEARCH_INDEX_FLUSH_DOCS documents or
+# SEARCH_INDEX_MAINTENANCE_SECONDS, and once there are more than
+# SEARCH_INDEX_MAX_SEGMENTS segments they are merged into one in the
+# background, dropping deleted documents.
+#
+# Endpoints that approve, edit or delete articles and comments refresh them
+# in the index once they commit. In the same maintenance loop the index also
+# reads articles and comments changed since its last sync (by created_at,
+# updated_at and moderated_at), which picks up writes made by other
+# processes. Only one process can open an index directory; in the others
+# search stays on Postgres. Refreshes save their removals right away. Hits
+# are checked against the status of their rows before they are counted, so
+# a hit that is no longer searchable is dropped. Deleted articles seen by
+# other processes only leave the index when it is rebuilt.
+#
+# Words are lowercased and English stopwords dropped, but not stemmed: as
+# in Postgres search, every word of a query is required and the last one
+# also matches as a prefix.
+
+MAGIC = b"ECHOBM25"
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Title words count this many times towards an article's term frequencies
+TITLE_BOOST = 2
+
+# The last query word matches at most this many terms starting with it
+PREFIX_TERMS = 64
+
+# Re-read changes this far before the last sync, for transactions that
+# committed late
+SYNC_OVERLAP = timedelta(minutes=1)
+
+MAX_TERM_LENGTH = 64
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our
+she so than that the their them then there these they this to was we were what when which who will with you
+""".split())
+
+ARTICLE, COMMENT = 0, 1
+KINDS = {"articles": ARTICLE, "comments": COMMENT}
+
+def tokenize(text: str) -> List[str]:
+    return [word[:MAX_TERM_LENGTH] for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS]
+
+def title_hash(title: str) -> int:
+    """Hash of a title for exact title matches, which compare lowercased text"""
+    return int.from_bytes(hashlib.blake2b(title.lower().encode(), digest_size=8).digest(), "little")
+
+def doc_key(kind: int, row_id: int) -> int:
+    return kind << 32 | row_id
+
+class Document(NamedTuple):
+    key: int
+    length: int
+    created: float
+    title: int  # title_hash() for articles, 0 for comments
+    article_id: int  # the article itself, or the commented one
+    terms: Dict[str, int]
+
+class Hit(NamedTuple):
+    score: float
+    exact: int
+    created_at: datetime
+    row_id: int
+
+# Segment file layout: the header, then these sections as arrays of native
+# byte order, each starting at a multiple of 8 bytes
+SECTIONS = (
+    ("keys", "Q"),  # per document, ascending
+    ("lengths", "I"),
+    ("created", "d"),
+    ("titles", "Q"),
+    ("by_article", "Q"),  # article_id << 32 | document, ascending, for comments
+    ("term_offsets", "Q"),  # n_terms + 1 offsets into terms
+    ("terms", "B"),  # UTF-8 terms, ascending
+    ("posting_offsets", "Q"),  # n_terms + 1 offsets into posting_docs/posting_freqs
+    ("posting_docs", "I"),  # ascending per term
+    ("posting_freqs", "I"),
+)
+HEADER = struct.Struct("<8sQQQ" + "QQ" * len(SECTIONS))
+
+def write_segment(path: str, docs: List[Document]) -> None:
+    """
+    Write `docs`, sorted by key, as a segment file at `path`. The file is
+    written under a temporary name and renamed, so it is never seen partly
+    written.
+    """
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    by_article = []
+    for ordinal, doc in enumerate(docs):
+        for term, freq in doc.terms.items():
+            postings.setdefault(term, []).append((ordinal, freq))
+        if doc.key >> 32 == COMMENT:
+            by_article.append(doc.article_id << 32 | ordinal)
+
+    terms = sorted(postings)
+    encoded = [term.encode() for term in terms]
+    term_offsets = array.array("Q", [0])
+    posting_offsets = array.array("Q", [0])
+    posting_docs = array.array("I")
+    posting_freqs = array.array("I")
+    for term, data in zip(terms, encoded):
+        term_offsets.append(term_offsets[-1] + len(data))
+        for ordinal, freq in postings[term]:
+            posting_docs.append(ordinal)
+            posting_freqs.append(freq)
+        posting_offsets.append(len(posting_docs))
+
+    sections = {
+        "keys": array.array("Q", (doc.key for doc in docs)),
+        "lengths": array.array("I", (doc.length for doc in docs)),
+        "created": array.array("d", (doc.created for doc in docs)),
+        "titles": array.array("Q", (doc.title for doc in docs)),
+        "by_article": array.array("Q", sorted(by_article)),
+        "term_offsets": term_offsets,
+        "terms": array.array("B", b"".join(encoded)),
+        "posting_offsets": posting_offsets,
+        "posting_docs": posting_docs,
+        "posting_freqs": posting_freqs,
+    }
+
+    layout = []
+    offset = HEADER.size
+    for name, _ in SECTIONS:
+        offset += -offset % 8
+        size = len(sections[name]) * sections[name].itemsize
+        layout += [offset, size]
+        offset += size
+
+    total_length = sum(doc.length for doc in docs)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(docs), len(terms), total_length, *layout))
+        for (name, _), start in zip(SECTIONS, layout[::2]):
+            f.write(b"\0" * (start - f.tell()))
+            sections[name].tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class Segment:
+    """
+    A segment file read through mmap, and its deleted documents
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, self.n_docs, self.n_terms, self.total_length, *layout = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a segment file")
+        for (section, code), start, size in zip(SECTIONS, layout[::2], layout[1::2]):
+            setattr(self, section, view[start:start + size].cast(code))
+
+        self.deleted_path = f"{self.path}.del"
+        try:
+            with open(self.deleted_path, "rb") as f:
+                self.deleted = bytearray(f.read())
+        except FileNotFoundError:
+            self.deleted = bytearray(self.n_docs)
+        self.live = self.n_docs - sum(self.deleted)
+        self.dirty = False
+
+    def term(self, index: int) -> str:
+        return bytes(self.terms[self.term_offsets[index]:self.term_offsets[index + 1]]).decode()
+
+    def _bisect_term(self, word: str) -> int:
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term(mid) < word:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, word: str) -> int:
+        index = self._bisect_term(word)
+        return index if index < self.n_terms and self.term(index) == word else -1
+
+    def prefixed(self, prefix: str) -> Iterable[Tuple[str, int]]:
+        """(term, index) for the terms starting with `prefix`"""
+        index = self._bisect_term(prefix)
+        while index < self.n_terms:
+            term = self.term(index)
+            if not term.startswith(prefix):
+                return
+            yield term, index
+            index += 1
+
+    def postings(self, index: int) -> Tuple[memoryview, memoryview]:
+        start, end = self.posting_offsets[index], self.posting_offsets[index + 1]
+        return self.posting_docs[start:end], self.posting_freqs[start:end]
+
+    def ordinal(self, key: int) -> int:
+        index = bisect_left(self.keys, key)
+        return index if index < self.n_docs and self.keys[index] == key else -1
+
+    def comments_of(self, article_id: int) -> List[int]:
+        start = bisect_left(self.by_article, article_id << 32)
+        end = bisect_left(self.by_article, (article_id + 1) << 32)
+        return [entry & 0xFFFFFFFF for entry in self.by_article[start:end]]
+
+    def delete(self, ordinal: int) -> None:
+        if not self.deleted[ordinal]:
+            self.deleted[ordinal] = 1
+            self.live -= 1
+            self.dirty = True
+
+    def save_deleted(self) -> None:
+        if self.dirty:
+            tmp = f"{self.deleted_path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(self.deleted)
+            os.replace(tmp, self.deleted_path)
+            self.dirty = False
+
+    def documents(self) -> List[Document]:
+        """Live documents with their terms, for merging"""
+        terms: List[Dict[str, int]] = [{} for _ in range(self.n_docs)]
+        for index in range(self.n_terms):
+            term = self.term(index)
+            docs, freqs = self.postings(index)
+            for ordinal, freq in zip(docs, freqs):
+                if not self.deleted[ordinal]:
+                    terms[ordinal][term] = freq
+        # Articles are their own article
+        article_ids = [key & 0xFFFFFFFF for key in self.keys]
+        for entry in self.by_article:
+            article_ids[entry & 0xFFFFFFFF] = entry >> 32
+        return [
+            Document(self.keys[i], self.lengths[i], self.created[i], self.titles[i], article_ids[i], terms[i])
+            for i in range(self.n_docs) if not self.deleted[i]
+        ]
+
+class Buffer:
+    """
+    Documents not yet written to a segment, searchable like one
+    """
+
+    def __init__(self):
+        self.docs: Dict[int, Document] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.by_article: Dict[int, set] = {}
+
+    def add(self, doc: Document) -> None:
+        self.remove(doc.key)
+        self.docs[doc.key] = doc
+        for term, freq in doc.terms.items():
+            self.postings.setdefault(term, {})[doc.key] = freq
+        if doc.key >> 32 == COMMENT:
+            self.by_article.setdefault(doc.article_id, set()).add(doc.key)
+
+    def remove(self, key: int) -> None:
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        for term in doc.terms:
+            postings = self.postings[term]
+            del postings[key]
+            if not postings:
+                del self.postings[term]
+        if doc.key >> 32 == COMMENT:
+            self.by_article[doc.article_id].discard(key)
+
+    def prefixed(self, prefix: str) -> List[str]:
+        return [term for term in self.postings if term.startswith(prefix)]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+ARTICLE_QUERY = """
+SELECT article_id, title, description, created_at, status
+FROM articles
+WHERE {condition}
+ORDER BY article_id
+"""
+
+COMMENT_QUERY = """
+SELECT cm.comment_id, cm.article_id, cm.text, cm.created_at,
+       cm.is_deleted = FALSE AND a.status = 'approved' AS searchable
+FROM comments cm
+JOIN articles a ON a.article_id = cm.article_id
+WHERE {condition}
+ORDER BY cm.comment_id
+"""
+
+# Uses idx_articles_changed_at and idx_comments_changed_at
+ARTICLES_CHANGED = "GREATEST(created_at, updated_at, moderated_at) > %(since)s"
+COMMENTS_CHANGED = "GREATEST(cm.created_at, cm.updated_at) > %(since)s"
+
+class SearchEngine:
+    """
+    BM25 search over approved articles and their comments, kept in a
+    directory of segment files
+    """
+
+    def __init__(self):
+        self.directory: Optional[str] = None
+        self.synced_at: Optional[datetime] = None
+        self._segments: List[Segment] = []
+        self._buffer = Buffer()
+        self._next_segment = 1
+        self._lock = threading.RLock()
+        self._merge_lock = threading.Lock()
+        self._lock_file = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def open(self, directory: str) -> None:
+        """
+        Open the index in `directory`, creating it if needed. Raises
+        RuntimeError if another process has it open.
+        """
+        os.makedirs(directory, exist_ok=True)
+        lock_file = open(os.path.join(directory, "LOCK"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(f"Search index {directory} is open in another process")
+
+        manifest = {"segments": [], "next_segment": 1, "synced_at": None}
+        try:
+            with open(os.path.join(directory, "manifest.json")) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            self._lock_file = lock_file
+            self.directory = directory
+            self._segments = [Segment(directory, name) for name in manifest["segments"]]
+            self._next_segment = manifest["next_segment"]
+            self.synced_at = manifest["synced_at"] and datetime.fromisoformat(manifest["synced_at"])
+            self._buffer = Buffer()
+        self._remove_unlisted()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._lock_file is not None:
+                self._lock_file.close()
+            self.directory = None
+            self._lock_file = None
+            self._segments = []
+            self._buffer = Buffer()
+
+    def clear(self) -> None:
+        """Remove every document, so that the next sync indexes everything"""
+        with self._merge_lock, self._lock:
+            self._segments = []
+            self._buffer = Buffer()
+            self.synced_at = None
+            self._write_manifest()
+            self._remove_unlisted()
+
+    def _remove_unlisted(self) -> None:
+        """Remove files left by a flush or merge that did not finish"""
+        listed = {segment.name for segment in self._segments}
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.split(".")[0] not in listed:
+                os.remove(os.path.join(self.directory, name))
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            "segments": [segment.name for segment in self._segments],
+            "next_segment": self._next_segment,
+            "synced_at": self.synced_at and self.synced_at.isoformat(),
+        }
+        path = os.path.join(self.directory, "manifest.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _new_segment_name(self) -> str:
+        name = f"segment-{self._next_segment:08d}"
+        self._next_segment += 1
+        return name
+
+    # Writes
+
+    def _delete(self, key: int) -> None:
+        self._buffer.remove(key)
+        for segment in self._segments:
+            ordinal = segment.ordinal(key)
+            if ordinal >= 0:
+                segment.delete(ordinal)
+
+    def add_article(self, article_id: int, title: str, description: str, created_at: datetime) -> None:
+        terms = Counter(tokenize(description))
+        for word in tokenize(title):
+            terms[word] += TITLE_BOOST
+        doc = Document(
+            doc_key(ARTICLE, article_id), sum(terms.values()), created_at.timestamp(),
+            title_hash(title), article_id, dict(terms),
+        )
+        with self._lock:
+            self._delete(doc.key)
+            self._buffer.add(doc)
+
+    def add_comment(self, comment_id: int, article_id: int, text: str, created_at: datetime) -> None:
+        terms = Counter(tokenize(text))
+        doc = Document(
+            doc_key(COMMENT, comment_id), sum(terms.values()), created_at.timestamp(), 0, article_id, dict(terms)
+        )
+        with self._lock:
+            self._delete(doc.key)
+            self._buffer.add(doc)
+
+    def remove_comment(self, comment_id: int) -> None:
+        with self._lock:
+            self._delete(doc_key(COMMENT, comment_id))
+
+    def remove_article(self, article_id: int) -> None:
+        """Remove an article and its comments"""
+        with self._lock:
+            self._delete(doc_key(ARTICLE, article_id))
+            for key in list(self._buffer.by_article.get(article_id, ())):
+                self._buffer.remove(key)
+            for segment in self._segments:
+                for ordinal in segment.comments_of(article_id):
+                    segment.delete(ordinal)
+
+    def refresh_articles(self, conn, article_ids: List[int]) -> None:
+        """
+        Index the given articles and their comments if they are approved, or
+        remove them. Call after the change commits.
+        """
+        if not self.enabled or not article_ids:
+            return
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute(
+                ARTICLE_QUERY.format(condition="article_id = ANY(%(ids)s)"), {"ids": list(article_ids)}
+            )
+            self._apply_articles(cursor.fetchall(), article_ids)
+            cursor.execute(
+                COMMENT_QUERY.format(condition="cm.article_id = ANY(%(ids)s)"), {"ids": list(article_ids)}
+            )
+            self._apply_comments(cursor.fetchall())
+        finally:
+            cursor.close()
+        self._save_deleted()
+
+    def refresh_comments(self, conn, comment_ids: List[int]) -> None:
+        """
+        Index the given comments if searchable, or remove them. Call after the
+        change commits.
+        """
+        if not self.enabled or not comment_ids:
+            return
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute(
+                COMMENT_QUERY.format(condition="cm.comment_id = ANY(%(ids)s)"), {"ids": list(comment_ids)}
+            )
+            self._apply_comments(cursor.fetchall())
+        finally:
+            cursor.close()
+        self._save_deleted()
+
+    def _apply_articles(self, rows: List[dict], article_ids: Iterable[int] = ()) -> List[int]:
+        """Apply article rows; returns the ids of approved ones"""
+        found = set()
+        approved = []
+        for row in rows:
+            found.add(row["article_id"])
+            if row["status"] == "approved":
+                self.add_article(row["article_id"], row["title"], row["description"], row["created_at"])
+                approved.append(row["article_id"])
+            else:
+                self.remove_article(row["article_id"])
+        # Deleted articles
+        for article_id in set(article_ids) - found:
+            self.remove_article(article_id)
+        return approved
+
+    def _apply_comments(self, rows: List[dict]) -> None:
+        for row in rows:
+            if row["searchable"]:
+                self.add_comment(row["comment_id"], row["article_id"], row["text"], row["created_at"])
+            else:
+                self.remove_comment(row["comment_id"])
+
+    def _stream(self, conn, query: str, params: dict, apply: Callable[[List[dict]], Any]) -> int:
+        """
+        Apply the rows of `query` in batches through a named cursor, flushing
+        the buffer as it fills. Returns the number of rows.
+        """
+        batch = settings.SEARCH_INDEX_FLUSH_DOCS
+        cursor = conn.cursor(name="search_index_sync", cursor_factory=RealDictCursor)
+        cursor.itersize = batch
+        read = 0
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    return read
+                apply(rows)
+                read += len(rows)
+                if len(self._buffer) >= batch:
+                    self.flush()
+        finally:
+            cursor.close()
+
+    def sync(self, conn) -> int:
+        """
+        Apply articles and comments changed since the last sync, or index
+        everything if the index has never been synced. Returns the number of
+        rows read.
+        """
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute("SELECT LOCALTIMESTAMP AS now")
+            now = cursor.fetchone()["now"]
+        finally:
+            cursor.close()
+        since = self.synced_at - SYNC_OVERLAP if self.synced_at else datetime.min
+
+        approved = []
+        read = self._stream(
+            conn, ARTICLE_QUERY.format(condition=ARTICLES_CHANGED), {"since": since},
+            lambda rows: approved.extend(self._apply_articles(rows)),
+        )
+        # Comments of newly approved articles are older than the approval.
+        # A first sync reads every comment anyway.
+        read += self._stream(
+            conn, COMMENT_QUERY.format(condition=f"({COMMENTS_CHANGED} OR cm.article_id = ANY(%(articles)s))"),
+            {"since": since, "articles": approved if self.synced_at else []},
+            self._apply_comments,
+        )
+        conn.commit()
+        with self._lock:
+            self.synced_at = now
+        return read
+
+    def _save_deleted(self) -> None:
+        """
+        Save the deletion bitmaps, so that removals survive a restart even
+        though the rows they removed are gone from the database by then
+        """
+        with self._lock:
+            if self.enabled:
+                for segment in self._segments:
+                    segment.save_deleted()
+
+    def flush(self) -> None:
+        """
+        Write buffered documents to a new segment and save deletions
+        """
+        with self._lock:
+            if not self.enabled:
+                return
+            if len(self._buffer):
+                name = self._new_segment_name()
+                write_segment(
+                    os.path.join(self.directory, name),
+                    sorted(self._buffer.docs.values(), key=lambda doc: doc.key),
+                )
+                self._segments.append(Segment(self.directory, name))
+                self._buffer = Buffer()
+            for segment in self._segments:
+                segment.save_deleted()
+            self._write_manifest()
+
+    def merge(self, max_segments: int = None) -> bool:
+        """
+        Merge all segments into one if there are more than `max_segments`.
+        Searches and writes continue meanwhile. Returns whether it merged.
+        """
+        max_segments = settings.SEARCH_INDEX_MAX_SEGMENTS if max_segments is None else max_segments
+        with self._merge_lock:
+            with self._lock:
+                merging = list(self._segments)
+                if len(merging) <= max_segments or not self.enabled:
+                    return False
+                deleted = [bytes(segment.deleted) for segment in merging]
+                name = self._new_segment_name()
+
+            docs = sorted((doc for segment in merging for doc in segment.documents()), key=lambda doc: doc.key)
+            write_segment(os.path.join(self.directory, name), docs)
+            merged = Segment(self.directory, name)
+
+            with self._lock:
+                # Carry over deletions made while merging
+                for segment, before in zip(merging, deleted):
+                    for ordinal, (was, now) in enumerate(zip(before, segment.deleted)):
+                        if now and not was:
+                            merged_ordinal = merged.ordinal(segment.keys[ordinal])
+                            if merged_ordinal >= 0:
+                                merged.delete(merged_ordinal)
+                merged.save_deleted()
+                self._segments = [merged] + [s for s in self._segments if s not in merging]
+                self._write_manifest()
+            for segment in merging:
+                for path in (segment.path, segment.deleted_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            return True
+
+    # Reads
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "documents": sum(segment.live for segment in self._segments) + len(self._buffer),
+                "buffered": len(self._buffer),
+            }
+
+    def search(self, q: str, result_type: str) -> List[Hit]:
+        """
+        Every `result_type` ("articles" or "comments") document matching all
+        words of `q`, the last one also as a prefix, by BM25 score
+        """
+        words = tokenize(q)
+        if not words:
+            return []
+        kind = KINDS[result_type]
+        exact_title = title_hash(q) if kind == ARTICLE else None
+
+        with self._lock:
+            segments = list(self._segments)
+            n_docs = sum(segment.live for segment in segments) + len(self._buffer)
+            total_length = sum(segment.total_length for segment in segments) + sum(
+                doc.length for doc in self._buffer.docs.values()
+            )
+            # The buffer is searched under the lock, segments after it.
+            # Per query word, {key: {term: freq}} of the documents matching it
+            buffer_df = Counter()
+            buffer_matches = []
+            for i, word in enumerate(words):
+                terms = [word] if i < len(words) - 1 else self._buffer.prefixed(word)[:PREFIX_TERMS]
+                matches: Dict[int, Dict[str, int]] = {}
+                for term in terms:
+                    postings = self._buffer.postings.get(term, {})
+                    buffer_df[term] += len(postings)
+                    for key, freq in postings.items():
+                        if key >> 32 == kind:
+                            matches.setdefault(key, {})[term] = freq
+                buffer_matches.append(matches)
+            keys = set.intersection(*(set(matches) for matches in buffer_matches))
+            buffered = [
+                (self._buffer.docs[key], [matches[key] for matches in buffer_matches]) for key in keys
+            ]
+        if not n_docs:
+            return []
+        average_length = total_length / n_docs
+
+        # Terms each query word matches, in each segment: (term, index)
+        matched = [
+            [
+                [(word, index)] if (index := segment.find(word)) >= 0 else []
+                for segment in segments
+            ] if i < len(words) - 1 else [
+                list(segment.prefixed(word))[:PREFIX_TERMS] for segment in segments
+            ]
+            for i, word in enumerate(words)
+        ]
+        # Deleted documents still count towards document frequencies and the
+        # average length until their segment is merged
+        df = Counter(buffer_df)
+        for per_segment in matched:
+            for segment, terms in zip(segments, per_segment):
+                for term, index in terms:
+                    df[term] += segment.posting_offsets[index + 1] - segment.posting_offsets[index]
+
+        def idf(term):
+            return math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+
+        def bm25(term, freq, length):
+            return idf(term) * freq * (K1 + 1) / (freq + K1 * (1 - B + B * length / average_length))
+
+        hits = []
+        for s, segment in enumerate(segments):
+            word_terms = [per_segment[s] for per_segment in matched]
+            if not all(word_terms):
+                continue
+            # Start from the rarest word and look the others up in postings
+            order = sorted(range(len(words)), key=lambda w: sum(
+                segment.posting_offsets[i + 1] - segment.posting_offsets[i] for _, i in word_terms[w]
+            ))
+            scores: Dict[int, float] = {}
+            for term, index in word_terms[order[0]]:
+                docs, freqs = segment.postings(index)
+                for ordinal, freq in zip(docs, freqs):
+                    if not segment.deleted[ordinal] and segment.keys[ordinal] >> 32 == kind:
+                        scores[ordinal] = scores.get(ordinal, 0) + bm25(term, freq, segment.lengths[ordinal])
+            for w in order[1:]:
+                postings = [(term, segment.postings(index)) for term, index in word_terms[w]]
+                for ordinal in list(scores):
+                    found = False
+                    for term, (docs, freqs) in postings:
+                        i = bisect_left(docs, ordinal)
+                        if i < len(docs) and docs[i] == ordinal:
+                            scores[ordinal] += bm25(term, freqs[i], segment.lengths[ordinal])
+                            found = True
+                    if not found:
+                        del scores[ordinal]
+            for ordinal, score in scores.items():
+                hits.append(Hit(
+                    score, int(segment.titles[ordinal] == exact_title),
+                    datetime.fromtimestamp(segment.created[ordinal]), segment.keys[ordinal] & 0xFFFFFFFF,
+                ))
+
+        for doc, word_freqs in buffered:
+            score = sum(bm25(term, freq, doc.length) for freqs in word_freqs for term, freq in freqs.items())
+            hits.append(Hit(
+                score, int(doc.title == exact_title), datetime.fromtimestamp(doc.created), doc.key & 0xFFFFFFFF
+            ))
+
+        hits.sort(key=lambda hit: (-hit.score, -hit.row_id))
+        return hits
+
+search_engine = SearchEngine()
+
+def refresh_index(conn, article_ids: List[int] = (), comment_ids: List[int] = ()) -> None:
+    """
+    Refresh articles and comments in search_engine after their change has
+    committed. A failure is only logged: the write stands, and the next sync
+    catches the index up.
+    """
+    try:
+        search_engine.refresh_articles(conn, list(article_ids))
+        search_engine.refresh_comments(conn, list(comment_ids))
+    except Exception as e:
+        print(f"Search index refresh failed: {e}")
+        conn.rollback()
+
+async def run_search_index(connect: Callable, directory: str, interval: float) -> None:
+    """
+    Open the search index in `directory`, bring it up to date and keep
+    syncing, flushing and merging it every `interval` seconds until
+    cancelled. The index is flushed and closed on the way out.
+    """
+    loop = asyncio.get_running_loop()
+
+    def maintain():
+        conn = connect()
+        try:
+            search_engine.sync(conn)
+        finally:
+            conn.close()
+        search_engine.flush()
+        search_engine.merge()
+
+    try:
+        search_engine.open(directory)
+    except RuntimeError as e:
+        print(f"Searching in Postgres: {e}")
+        return
+
+    try:
+        while True:
+            try:
+                await loop.run_in_executor(None, maintain)
+            except Exception as e:
+                print(f"Search index maintenance failed: {e}")
+            await asyncio.sleep(interval)
+    finally:
+        search_engine.flush()
+        search_engine.close()
@@ -0,0 +1,103 @@
+import asyncio
+import itertools
+import math
+from typing import Callable, Dict, Hashable
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import Counter
+
+# Cached comment pages.
+#
+# GET /comments/article/{article_id} serves the serialized response from this
+# cache while the article's comments are unchanged. Keys include the
+# article's current version. create_comment, update_comment and
+# delete_comment move the article to a new version once they commit, so later
+# reads miss and the old pages age out of the LRU. A page is stored under the
+# version read before it was built, so a page built from a snapshot taken
+# before a write can never be served after it.
+#
+# Versions are per process: writes handled by other workers, and comment
+# votes, show up once entries expire after COMMENT_CACHE_TTL_SECONDS.
+# Entries are bounded by their total size, COMMENT_CACHE_MAX_BYTES.
+#
+# Misses are single-flight per key: the first request builds the page in the
+# threadpool and concurrent requests for the same page await that build, so
+# a hot thread dropping out of the cache costs one query, not one per request.
+
+comment_cache_requests = Counter(
+    "echo_comment_cache_requests_total",
+    "Comment page requests by cache result: hit, miss (built) or shared (awaited another build)",
+    ("result",),
+)
+
+class CommentPageCache:
+    """
+    Serialized comment pages per article, invalidated by version
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, max_articles: int):
+        self.pages = TTLCache(max_entries=max_articles, ttl=ttl, max_bytes=max_bytes)
+        # Articles evicted from here get a fresh version on their next read,
+        # which only costs a rebuild
+        self._versions = TTLCache(max_entries=max_articles, ttl=math.inf)
+        self._counter = itertools.count(1)
+        # In-flight builds per key, only touched from the event loop
+        self._building: Dict[Hashable, asyncio.Task] = {}
+
+    def version(self, article_id: int) -> int:
+        version = self._versions.get(article_id)
+        if version is None:
+            version = next(self._counter)
+            self._versions.set(article_id, version)
+        return version
+
+    def invalidate(self, article_id: int) -> None:
+        """
+        Stop serving cached pages of `article_id`. Call after the change commits.
+        """
+        self._versions.set(article_id, next(self._counter))
+
+    async def get_or_build(self, article_id: int, params: Hashable, build: Callable[[], bytes]) -> bytes:
+        """
+        Return the cached page of `article_id` for `params`, or build it.
+
+        `build` runs in the threadpool and returns the serialized page. If it
+        raises, the error goes to every request awaiting it and nothing is
+        cached.
+        """
+        key = (article_id, self.version(article_id), params)
+        page = self.pages.get(key)
+        if page is not None:
+            comment_cache_requests.inc(result="hit")
+            return page
+
+        task = self._building.get(key)
+        if task is None:
+            comment_cache_requests.inc(result="miss")
+            task = asyncio.ensure_future(self._build(key, build))
+            self._building[key] = task
+        else:
+            comment_cache_requests.inc(result="shared")
+        # A disconnecting client must not cancel the build other requests await
+        return await asyncio.shield(task)
+
+    async def _build(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        try:
+            page = await run_in_threadpool(build)
+            self.pages.set(key, page)
+            return page
+        finally:
+            del self._building[key]
+
+    def clear(self) -> None:
+        self.pages.clear()
+        self._versions.clear()
+
+comment_page_cache = CommentPageCache(
+    max_bytes=settings.COMMENT_CACHE_MAX_BYTES,
+    ttl=settings.COMMENT_CACHE_TTL_SECONDS,
+    max_articles=settings.COMMENT_CACHE_MAX_ARTICLES,
+)
@@ -0,0 +1,90 @@
+import time
+from typing import Callable, Dict
+
+from psycopg2.extras import RealDictCursor
+
+from app.db.batch import key_ranges, run_chunks
+
+# Backfill for comments.path.
+#
+# The set_comment_path() trigger fills the path of new comments from their
+# parent's. Comments from before the column existed, and replies to them,
+# have no path until this backfill runs. Each chunk walks every pathless
+# comment up its ancestors until it reaches one with a path (or a top-level
+# comment), so chunks do not depend on each other and run in parallel.
+#
+# A reply inserted while its parent's chunk is still uncommitted keeps a NULL
+# path; the backfill reports these and running it again fills them.
+
+BACKFILL_CHUNK = """
+WITH RECURSIVE up AS (
+    SELECT c.comment_id, c.parent_comment_id AS next_id, ARRAY[c.comment_id] AS path
+    FROM comments c
+    WHERE c.comment_id >= %(start)s AND c.comment_id < %(end)s AND c.path IS NULL
+    UNION ALL
+    SELECT
+        up.comment_id,
+        CASE WHEN p.path IS NULL THEN p.parent_comment_id END,
+        COALESCE(p.path, ARRAY[p.comment_id]) || up.path
+    FROM up
+    JOIN comments p ON p.comment_id = up.next_id
+),
+filled AS (
+    UPDATE comments c
+    SET path = up.path
+    FROM up
+    WHERE up.next_id IS NULL AND c.comment_id = up.comment_id AND c.path IS NULL
+    RETURNING c.comment_id
+)
+SELECT COUNT(*) AS filled FROM filled
+"""
+
+def backfill_chunk(conn, start: int, end: int) -> int:
+    """
+    Fill in the paths of comments with ids in [start, end); returns how many
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(BACKFILL_CHUNK, {"start": start, "end": end})
+        filled = cursor.fetchone()["filled"]
+        conn.commit()
+        return filled
+    finally:
+        cursor.close()
+
+def backfill_comment_paths(
+    connect: Callable,
+    workers: int = 4,
+    chunk_size: int = 5000,
+    throttle: float = 0.0,
+) -> Dict[str, int]:
+    """
+    Fill in missing comment paths in parallel chunks.
+
+    Each worker sleeps `throttle` seconds after every chunk to bound the load
+    on a live database. Returns the number of paths filled and of comments
+    still without a path afterwards.
+    """
+    conn = connect()
+    try:
+        ranges = key_ranges(conn, "comments", "comment_id", chunk_size)
+    finally:
+        conn.close()
+
+    def work(conn, start, end):
+        filled = backfill_chunk(conn, start, end)
+        if throttle:
+            time.sleep(throttle)
+        return filled
+
+    filled = sum(run_chunks(connect, ranges, work, workers=workers))
+
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM comments WHERE path IS NULL")
+        remaining = cursor.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    return {"filled": filled, "remaining": remaining}
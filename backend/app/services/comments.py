@@ -0,0 +1,206 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from app.api.pagination import decode_cursor, encode_cursor
+
+# Threaded comment retrieval.
+#
+# Comments are read a page of threads at a time. One recursive query takes
+# a page of roots (an article's top-level comments or one comment's replies,
+# keyset-paged on (sort key, comment_id)), then walks down to a maximum depth
+# taking the first few replies of each comment. Rows come back ordered by
+# depth and then by position among their siblings, so every parent comes
+# before its children and build_comment_tree() nests them in one pass.
+#
+# Each comment carries `reply_count`, its number of direct replies. When only
+# some are shown, `replies_cursor` continues after the last one shown; the
+# rest are read with fetch_replies().
+#
+# Deleted comments are left out together with their replies.
+
+# Sort orders: (sort key, order of top-level comments, order of replies,
+# type of the sort key in cursors). `newest` lists top-level comments newest
+# first and replies in posting order.
+COMMENT_SORTS = {
+    "newest": ("c.created_at", "DESC", "ASC", datetime),
+    "oldest": ("c.created_at", "ASC", "ASC", datetime),
+    "best": ("wilson_lower_bound(c.upvotes, c.downvotes)", "DESC", "DESC", float),
+}
+
+# The walk carries the comment columns along, so rows are read once through
+# the index it walks. Vote counts include unfolded counter shards, summed
+# once for the page rather than per comment as COMMENT_UPVOTES does. `page`
+# stops the walk after max_comments rows; since the walk goes level by
+# level, only the deepest replies are cut.
+COMMENT_COLUMNS = (
+    "c.comment_id, c.article_id, c.user_id, c.text, c.created_at, c.parent_comment_id, "
+    "c.upvotes, c.downvotes, {key} AS sort_key"
+)
+
+COMMENT_PAGE = """
+WITH RECURSIVE roots AS (
+    SELECT {columns}, row_number() OVER (ORDER BY {order}) AS pos
+    FROM comments c
+    WHERE {roots} AND c.is_deleted = FALSE {after}
+    ORDER BY {order}
+    LIMIT %(limit)s + 1
+),
+t AS (
+    SELECT roots.*, 0 AS depth
+    FROM roots
+    WHERE pos <= %(limit)s
+    UNION ALL
+    SELECT r.*, t.depth + 1
+    FROM t
+    CROSS JOIN LATERAL (
+        SELECT {columns}, row_number() OVER (ORDER BY {reply_order}) AS pos
+        FROM comments c
+        WHERE c.parent_comment_id = t.comment_id AND c.is_deleted = FALSE
+        ORDER BY {reply_order}
+        LIMIT %(max_replies)s
+    ) r
+    WHERE t.depth < %(max_depth)s
+),
+page AS (
+    SELECT * FROM t LIMIT %(max_comments)s
+),
+pending AS (
+    SELECT cs.comment_id, SUM(cs.upvotes) AS up, SUM(cs.downvotes) AS down
+    FROM comment_vote_shards cs
+    JOIN page ON page.comment_id = cs.comment_id
+    GROUP BY cs.comment_id
+)
+SELECT
+    page.comment_id, page.article_id, page.user_id, page.text, page.created_at, page.parent_comment_id,
+    u.username,
+    page.upvotes + COALESCE(pending.up, 0) AS upvotes,
+    page.downvotes + COALESCE(pending.down, 0) AS downvotes,
+    page.depth,
+    (
+        SELECT COUNT(*) FROM comments r
+        WHERE r.parent_comment_id = page.comment_id AND r.is_deleted = FALSE
+    ) AS reply_count,
+    page.sort_key,
+    (SELECT COUNT(*) FROM roots) > %(limit)s AS has_more
+FROM page
+JOIN users u ON page.user_id = u.user_id
+LEFT JOIN pending ON pending.comment_id = page.comment_id
+ORDER BY page.depth, page.pos
+"""
+
+def sort_order(sort: str, replies: bool) -> Tuple[str, str]:
+    """
+    Return the ORDER BY clause and the keyset condition for a page of
+    top-level comments or of replies
+    """
+    key, top_order, reply_order, _ = COMMENT_SORTS[sort]
+    direction = reply_order if replies else top_order
+    comparison = "<" if direction == "DESC" else ">"
+    return (
+        f"{key} {direction}, c.comment_id {direction}",
+        f"({key}, c.comment_id) {comparison} (%(after_key)s, %(after_id)s)",
+    )
+
+def fetch_comment_page(
+    cursor,
+    roots: str,
+    params: dict,
+    replies: bool,
+    sort: str,
+    limit: int,
+    after: Optional[str],
+    max_depth: int,
+    max_replies: int,
+    max_comments: int,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch a page of comment threads whose roots match the `roots` condition.
+
+    Returns the threads and the cursor of the next page, or None on the last
+    page. `after` is the cursor of the previous page; raises ValueError if it
+    is not a cursor for this sort.
+    """
+    key, _, _, key_type = COMMENT_SORTS[sort]
+    order, keyset = sort_order(sort, replies)
+    params = dict(
+        params, limit=limit, max_depth=max_depth, max_replies=max_replies, max_comments=max_comments
+    )
+    if after:
+        params["after_key"], params["after_id"] = decode_cursor(after, key_type)
+
+    cursor.execute(
+        COMMENT_PAGE.format(
+            columns=COMMENT_COLUMNS.format(key=key),
+            roots=roots,
+            after=f"AND {keyset}" if after else "",
+            order=order,
+            reply_order=sort_order(sort, True)[0],
+        ),
+        params
+    )
+    rows = cursor.fetchall()
+
+    threads = build_comment_tree(rows)
+    next_cursor = None
+    if threads and rows[0]["has_more"]:
+        next_cursor = encode_cursor(threads[-1]["sort_key"], threads[-1]["comment_id"])
+    for row in rows:
+        del row["sort_key"], row["has_more"]
+    return threads, next_cursor
+
+def fetch_threads(cursor, article_id: int, sort: str, limit: int, after: Optional[str] = None, **limits):
+    """
+    Fetch a page of an article's top-level comments with their first replies
+    """
+    return fetch_comment_page(
+        cursor, "c.article_id = %(article_id)s AND c.parent_comment_id IS NULL",
+        {"article_id": article_id}, False, sort, limit, after, **limits
+    )
+
+def fetch_replies(cursor, comment_id: int, sort: str, limit: int, after: Optional[str] = None, **limits):
+    """
+    Fetch a page of a comment's replies with their first replies
+    """
+    return fetch_comment_page(
+        cursor, "c.parent_comment_id = %(comment_id)s",
+        {"comment_id": comment_id}, True, sort, limit, after, **limits
+    )
+
+def fetch_comment_tree(cursor, comment_id: int, sort: str, **limits) -> Optional[dict]:
+    """
+    Fetch one comment with its first replies, or None if it does not exist
+    """
+    threads, _ = fetch_comment_page(
+        cursor, "c.comment_id = %(comment_id)s",
+        {"comment_id": comment_id}, True, sort, 1, None, **limits
+    )
+    return threads[0] if threads else None
+
+def build_comment_tree(rows) -> List[dict]:
+    """
+    Nest comment rows under their parents in a single pass.
+
+    `rows` must list every parent before its children, siblings in display
+    order, with depth 0 for roots, and carry `reply_count` and `sort_key`.
+    Each row gets `replies` and `replies_cursor`, which is set when more
+    replies follow the ones shown. Rows whose parent is missing are skipped.
+    """
+    roots = []
+    nodes = {}
+    for row in rows:
+        if row["depth"] == 0:
+            roots.append(row)
+        else:
+            parent = nodes.get(row["parent_comment_id"])
+            if parent is None:
+                continue
+            parent["replies"].append(row)
+        row["replies"] = []
+        row["replies_cursor"] = None
+        nodes[row["comment_id"]] = row
+
+    for node in nodes.values():
+        shown = node["replies"]
+        if shown and len(shown) < node["reply_count"]:
+            node["replies_cursor"] = encode_cursor(shown[-1]["sort_key"], shown[-1]["comment_id"])
+    return roots
@@ -0,0 +1,236 @@
+import asyncio
+from typing import Callable, Dict
+
+from psycopg2.extras import RealDictCursor
+
+from app.core.config import settings
+
+# Sharded vote counters.
+#
+# Votes do not update articles/comments upvotes/downvotes or users.reputation
+# directly: a viral article (or its author) would serialize every vote on one
+# row lock. Instead each vote adds its delta to one of VOTE_COUNTER_SHARDS rows
+# in article_vote_shards / comment_vote_shards / user_reputation_shards, and
+# fold_counter_shards()
+# periodically drains those rows into the counter columns in one transaction.
+#
+# Reads add the pending shard deltas to the folded value, so counts are exact
+# between folds. A fold moves a delta from a shard into the counter column
+# atomically, so any snapshot sees it exactly once.
+#
+# articles.comment_count is kept the same way: creating a comment adds 1 to
+# one of the article's article_comment_shards rows and deleting it adds -1.
+
+# Counter expressions for queries that alias articles as `a`, comments as `c`
+# and users as `u`
+ARTICLE_UPVOTES = """(a.upvotes + COALESCE((
+    SELECT SUM(vs.upvotes) FROM article_vote_shards vs WHERE vs.article_id = a.article_id
+), 0))"""
+
+ARTICLE_DOWNVOTES = """(a.downvotes + COALESCE((
+    SELECT SUM(vs.downvotes) FROM article_vote_shards vs WHERE vs.article_id = a.article_id
+), 0))"""
+
+ARTICLE_SCORE = """(a.upvotes - a.downvotes + COALESCE((
+    SELECT SUM(vs.upvotes - vs.downvotes) FROM article_vote_shards vs WHERE vs.article_id = a.article_id
+), 0))"""
+
+ARTICLE_COMMENT_COUNT = """(a.comment_count + COALESCE((
+    SELECT SUM(cs.comments) FROM article_comment_shards cs WHERE cs.article_id = a.article_id
+), 0))"""
+
+COMMENT_UPVOTES = """(c.upvotes + COALESCE((
+    SELECT SUM(cs.upvotes) FROM comment_vote_shards cs WHERE cs.comment_id = c.comment_id
+), 0))"""
+
+COMMENT_DOWNVOTES = """(c.downvotes + COALESCE((
+    SELECT SUM(cs.downvotes) FROM comment_vote_shards cs WHERE cs.comment_id = c.comment_id
+), 0))"""
+
+USER_REPUTATION = """(u.reputation + COALESCE((
+    SELECT SUM(rs.reputation) FROM user_reputation_shards rs WHERE rs.user_id = u.user_id
+), 0))"""
+
+# Only one folder runs at a time, so concurrent folds never update the same
+# counter rows in different orders
+FOLD_LOCK_ID = 7_301_001
+
+FOLD_ARTICLE_SHARDS = """
+WITH batch AS (
+    SELECT article_id, shard
+    FROM article_vote_shards
+    LIMIT %(batch_size)s
+    FOR UPDATE SKIP LOCKED
+),
+drained AS (
+    DELETE FROM article_vote_shards s
+    USING batch b
+    WHERE s.article_id = b.article_id AND s.shard = b.shard
+    RETURNING s.article_id, s.upvotes, s.downvotes
+),
+totals AS (
+    SELECT article_id, SUM(upvotes) AS upvotes, SUM(downvotes) AS downvotes
+    FROM drained
+    GROUP BY article_id
+),
+folded AS (
+    UPDATE articles a
+    SET upvotes = a.upvotes + totals.upvotes, downvotes = a.downvotes + totals.downvotes
+    FROM totals
+    WHERE a.article_id = totals.article_id
+)
+SELECT COUNT(*) AS shards FROM drained
+"""
+
+FOLD_COMMENT_COUNT_SHARDS = """
+WITH batch AS (
+    SELECT article_id, shard
+    FROM article_comment_shards
+    LIMIT %(batch_size)s
+    FOR UPDATE SKIP LOCKED
+),
+drained AS (
+    DELETE FROM article_comment_shards s
+    USING batch b
+    WHERE s.article_id = b.article_id AND s.shard = b.shard
+    RETURNING s.article_id, s.comments
+),
+totals AS (
+    SELECT article_id, SUM(comments) AS comments
+    FROM drained
+    GROUP BY article_id
+),
+folded AS (
+    UPDATE articles a
+    SET comment_count = a.comment_count + totals.comments
+    FROM totals
+    WHERE a.article_id = totals.article_id
+)
+SELECT COUNT(*) AS shards FROM drained
+"""
+
+FOLD_COMMENT_SHARDS = """
+WITH batch AS (
+    SELECT comment_id, shard
+    FROM comment_vote_shards
+    LIMIT %(batch_size)s
+    FOR UPDATE SKIP LOCKED
+),
+drained AS (
+    DELETE FROM comment_vote_shards s
+    USING batch b
+    WHERE s.comment_id = b.comment_id AND s.shard = b.shard
+    RETURNING s.comment_id, s.upvotes, s.downvotes
+),
+totals AS (
+    SELECT comment_id, SUM(upvotes) AS upvotes, SUM(downvotes) AS downvotes
+    FROM drained
+    GROUP BY comment_id
+),
+folded AS (
+    UPDATE comments c
+    SET upvotes = c.upvotes + totals.upvotes, downvotes = c.downvotes + totals.downvotes
+    FROM totals
+    WHERE c.comment_id = totals.comment_id
+)
+SELECT COUNT(*) AS shards FROM drained
+"""
+
+FOLD_REPUTATION_SHARDS = """
+WITH batch AS (
+    SELECT user_id, shard
+    FROM user_reputation_shards
+    LIMIT %(batch_size)s
+    FOR UPDATE SKIP LOCKED
+),
+drained AS (
+    DELETE FROM user_reputation_shards s
+    USING batch b
+    WHERE s.user_id = b.user_id AND s.shard = b.shard
+    RETURNING s.user_id, s.reputation
+),
+totals AS (
+    SELECT user_id, SUM(reputation) AS reputation
+    FROM drained
+    GROUP BY user_id
+),
+folded AS (
+    UPDATE users u
+    SET reputation = u.reputation + totals.reputation
+    FROM totals
+    WHERE u.user_id = totals.user_id
+)
+SELECT COUNT(*) AS shards FROM drained
+"""
+
+def counter_shard(user_id: int) -> int:
+    """
+    Shard a voter's (or commenter's) deltas go to. Keyed on the user, so
+    concurrent voters on the same article or author spread over different
+    shard rows.
+    """
+    return user_id % settings.VOTE_COUNTER_SHARDS
+
+def fold_counter_shards(conn, batch_size: int = None) -> Dict[str, int]:
+    """
+    Drain pending vote, comment count and reputation shard deltas into
+    articles, comments and users, one batch per transaction.
+
+    Shard rows locked by in-flight votes are skipped and picked up by the next
+    fold. Returns the number of shard rows folded per table, or zeros if
+    another fold is already running.
+    """
+    batch_size = batch_size or settings.COUNTER_FOLD_BATCH_SIZE
+    folded = {
+        "article_vote_shards": 0,
+        "article_comment_shards": 0,
+        "comment_vote_shards": 0,
+        "user_reputation_shards": 0,
+    }
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        for table, statement in (
+            ("article_vote_shards", FOLD_ARTICLE_SHARDS),
+            ("article_comment_shards", FOLD_COMMENT_COUNT_SHARDS),
+            ("comment_vote_shards", FOLD_COMMENT_SHARDS),
+            ("user_reputation_shards", FOLD_REPUTATION_SHARDS),
+        ):
+            while True:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", (FOLD_LOCK_ID,))
+                if not cursor.fetchone()["locked"]:
+                    conn.rollback()
+                    return folded
+
+                cursor.execute(statement, {"batch_size": batch_size})
+                shards = cursor.fetchone()["shards"]
+                conn.commit()
+
+                folded[table] += shards
+                if shards < batch_size:
+                    break
+        return folded
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+async def run_counter_folder(connect: Callable, interval: float) -> None:
+    """
+    Fold counter shards every `interval` seconds until cancelled
+    """
+    loop = asyncio.get_running_loop()
+
+    def fold_once():
+        conn = connect()
+        try:
+            return fold_counter_shards(conn)
+        finally:
+            conn.close()
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await loop.run_in_executor(None, fold_once)
+        except Exception as e:
+            print(f"Counter fold failed: {e}")
@@ -0,0 +1,201 @@
+import csv
+import io
+from typing import Callable, Iterator, Optional
+
+import orjson
+from psycopg2.extras import RealDictCursor
+
+from app.services.counters import ARTICLE_DOWNVOTES, ARTICLE_UPVOTES
+
+# Bulk export of approved content for analytics.
+#
+# Rows are read through a server-side (named) cursor in keyset-ordered chunks.
+# Each chunk runs in its own short transaction, so an export of millions of
+# rows never pins a snapshot for the whole run, and memory stays bounded by the
+# cursor's fetch size. Because chunks are keyed on the dataset's id column, an
+# interrupted export resumes from the last id it wrote.
+
+EXPORT_DATASETS = {
+    "articles": {
+        "key": "article_id",
+        "columns": [
+            "article_id", "title", "description", "url", "category", "tags",
+            "submitted_by", "upvotes", "downvotes", "views", "created_at",
+        ],
+        "query": f"""
+            SELECT
+                a.article_id, a.title, a.description, a.source_url as url,
+                c.name as category,
+                ARRAY(
+                    SELECT t.name
+                    FROM tags t
+                    JOIN article_tags at ON t.tag_id = at.tag_id
+                    WHERE at.article_id = a.article_id
+                ) as tags,
+                u.username as submitted_by,
+                {ARTICLE_UPVOTES} as upvotes,
+                {ARTICLE_DOWNVOTES} as downvotes,
+                a.views, a.created_at
+            FROM
+                articles a
+            LEFT JOIN
+                categories c ON a.category_id = c.category_id
+            LEFT JOIN
+                users u ON a.submitted_by = u.user_id
+            WHERE
+                a.status = 'approved' AND a.article_id > %s
+            ORDER BY
+                a.article_id
+            LIMIT %s
+        """,
+    },
+    "votes": {
+        "key": "vote_id",
+        "columns": ["vote_id", "article_id", "user_id", "vote_type", "created_at", "updated_at"],
+        "query": """
+            SELECT
+                v.vote_id, v.article_id, v.user_id, v.vote_type, v.created_at, v.updated_at
+            FROM
+                votes v
+            JOIN
+                articles a ON v.article_id = a.article_id
+            WHERE
+                a.status = 'approved' AND v.vote_id > %s
+            ORDER BY
+                v.vote_id
+            LIMIT %s
+        """,
+    },
+    "comments": {
+        "key": "comment_id",
+        "columns": ["comment_id", "article_id", "user_id", "parent_comment_id", "text", "created_at"],
+        "query": """
+            SELECT
+                cm.comment_id, cm.article_id, cm.user_id, cm.parent_comment_id, cm.text, cm.created_at
+            FROM
+                comments cm
+            JOIN
+                articles a ON cm.article_id = a.article_id
+            WHERE
+                a.status = 'approved' AND cm.is_deleted = FALSE AND cm.comment_id > %s
+            ORDER BY
+                cm.comment_id
+            LIMIT %s
+        """,
+    },
+}
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def iter_export_rows(
+    conn,
+    dataset: str,
+    after: int = 0,
+    limit: Optional[int] = None,
+    chunk_size: int = 50000,
+    fetch_size: int = 5000,
+) -> Iterator[dict]:
+    """
+    Yield rows of an export dataset with ids greater than `after`.
+
+    `conn` must not be in autocommit mode (named cursors need a transaction).
+    Each chunk of `chunk_size` rows is read in its own transaction.
+    """
+    spec = EXPORT_DATASETS[dataset]
+    key = spec["key"]
+    last_id = after
+    remaining = limit
+
+    while remaining is None or remaining > 0:
+        batch = chunk_size if remaining is None else min(chunk_size, remaining)
+        count = 0
+
+        cursor = conn.cursor(name=f"export_{dataset}", cursor_factory=RealDictCursor)
+        cursor.itersize = fetch_size
+        try:
+            cursor.execute(spec["query"], (last_id, batch))
+            for row in cursor:
+                count += 1
+                last_id = row[key]
+                yield row
+        finally:
+            cursor.close()
+            # End the chunk's transaction so no snapshot outlives it
+            conn.commit()
+
+        if remaining is not None:
+            remaining -= count
+        if count < batch:
+            break
+
+def encode_ndjson(dataset: str, rows: Iterator[dict]) -> Iterator[bytes]:
+    """
+    Encode rows as newline-delimited JSON, one row per line
+    """
+    dumps = orjson.dumps
+    for row in rows:
+        yield dumps(row) + b"\n"
+
+def encode_csv(dataset: str, rows: Iterator[dict], header: bool = True, rows_per_write: int = 1000) -> Iterator[bytes]:
+    """
+    Encode rows as CSV, flushing every `rows_per_write` rows
+    """
+    columns = EXPORT_DATASETS[dataset]["columns"]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+
+    pending = 0
+    for row in rows:
+        values = []
+        for column in columns:
+            value = row[column]
+            if isinstance(value, list):
+                value = "|".join(value)
+            elif hasattr(value, "isoformat"):
+                value = value.isoformat()
+            values.append(value)
+        writer.writerow(values)
+        pending += 1
+
+        if pending >= rows_per_write:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+ENCODERS = {
+    "ndjson": encode_ndjson,
+    "csv": encode_csv,
+}
+
+def stream_export(
+    connect: Callable,
+    dataset: str,
+    export_format: str,
+    after: int = 0,
+    limit: Optional[int] = None,
+    header: bool = True,
+) -> Iterator[bytes]:
+    """
+    Open a dedicated connection and stream an encoded export.
+
+    The connection is owned by the generator and closed when it finishes or
+    the consumer stops iterating.
+    """
+    conn = connect()
+    try:
+        rows = iter_export_rows(conn, dataset, after=after, limit=limit)
+        if export_format == "csv":
+            yield from encode_csv(dataset, rows, header=header)
+        else:
+            yield from ENCODERS[export_format](dataset, rows)
+    finally:
+        conn.close()
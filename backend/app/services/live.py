@@ -0,0 +1,211 @@
+import asyncio
+import json
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.db.session import get_connection
+
+# Live article events.
+#
+# Writers publish events with pg_notify on ARTICLE_EVENTS_CHANNEL in the same
+# statement or transaction as the write: VOTE_STATEMENT sends the new vote
+# counts and create_comment sends the new comment's id. Each worker process
+# holds one LISTEN connection, shared by every subscriber in the process, and
+# fans events out to the subscribers of the article.
+#
+# Events are coalesced per subscriber. Vote events carry absolute counts, so
+# only the latest is kept. Comment events merge into one event with the new
+# comment ids. A subscriber gets at most one batch per coalesce interval, so
+# a hot article cannot flood its clients.
+
+ARTICLE_EVENTS_CHANNEL = "article_events"
+
+# Comment ids listed in one coalesced comments event; later ones are only counted
+MAX_COALESCED_COMMENT_IDS = 50
+
+live_events_received = Counter(
+    "echo_live_events_received_total",
+    "Article events received on the shared LISTEN connection, by type",
+    ("type",),
+)
+live_listener_reconnects = Counter(
+    "echo_live_listener_reconnects_total",
+    "Times the shared LISTEN connection was re-established",
+)
+
+class Subscription:
+    """
+    One client's view of the events for a set of articles
+    """
+
+    def __init__(self, article_ids: Iterable[int], interval: float):
+        self.article_ids: Set[int] = set(article_ids)
+        self.interval = interval
+        self._pending: Dict[tuple, dict] = {}
+        self._ready = asyncio.Event()
+        self._last_sent = 0.0
+
+    def push(self, event: dict) -> None:
+        key = (event["type"], event["article_id"])
+        if event["type"] == "comments":
+            merged = self._pending.get(key)
+            if merged is not None:
+                merged["count"] += event["count"]
+                room = MAX_COALESCED_COMMENT_IDS - len(merged["comment_ids"])
+                merged["comment_ids"].extend(event["comment_ids"][:room])
+                return
+            event = dict(event, comment_ids=list(event["comment_ids"]))
+        self._pending[key] = event
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> List[dict]:
+        """
+        Wait up to `timeout` seconds for events and return them, at most once
+        per coalesce interval. Returns an empty list on timeout.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+        # Let events for hot articles pile up until the interval has passed
+        wait = self._last_sent + self.interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        batch = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        self._last_sent = time.monotonic()
+        return batch
+
+class ArticleEventBroadcaster:
+    """
+    Shared LISTEN connection fanning article events out to subscriptions
+    """
+
+    def __init__(self, connect: Callable, interval: float, max_subscribers: int, retry_seconds: float = 1.0):
+        self.connect = connect
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.retry_seconds = retry_seconds
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._count = 0
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+        self._lost: Optional[asyncio.Event] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._count
+
+    async def subscribe(self, article_ids: Iterable[int]) -> Subscription:
+        """
+        Subscribe to events for `article_ids`; raises RuntimeError when the
+        process already serves `max_subscribers` streams
+        """
+        if self._count >= self.max_subscribers:
+            raise RuntimeError("Too many live subscribers")
+        await self.start()
+
+        subscription = Subscription(article_ids, self.interval)
+        for article_id in subscription.article_ids:
+            self._subscribers.setdefault(article_id, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for article_id in subscription.article_ids:
+            subscribers = self._subscribers.get(article_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[article_id]
+        self._count -= 1
+
+    def dispatch(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+            article_id = event["article_id"]
+        except (ValueError, KeyError, TypeError):
+            return
+        live_events_received.inc(type=event.get("type"))
+        for subscription in self._subscribers.get(article_id, ()):
+            subscription.push(event)
+
+    async def start(self) -> None:
+        """
+        Start listening, once, on the running event loop
+        """
+        if self._task is None:
+            connected = asyncio.get_running_loop().create_future()
+            self._task = asyncio.create_task(self._run(connected))
+            await connected
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _listen(self):
+        conn = self.connect()
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        cursor.execute(f"LISTEN {ARTICLE_EVENTS_CHANNEL}")
+        cursor.close()
+        return conn
+
+    def _on_readable(self) -> None:
+        try:
+            self._conn.poll()
+        except psycopg2.Error:
+            self._lost.set()
+            return
+        while self._conn.notifies:
+            self.dispatch(self._conn.notifies.pop(0).payload)
+
+    async def _run(self, connected: asyncio.Future) -> None:
+        loop = asyncio.get_running_loop()
+        first = True
+        while True:
+            try:
+                self._conn = await loop.run_in_executor(None, self._listen)
+            except psycopg2.Error as e:
+                if not connected.done():
+                    connected.set_exception(e)
+                    self._task = None
+                    return
+                await asyncio.sleep(self.retry_seconds)
+                continue
+
+            if first:
+                connected.set_result(None)
+                first = False
+            else:
+                # Events sent while disconnected are lost; tell clients to refetch
+                live_listener_reconnects.inc()
+                for article_id in list(self._subscribers):
+                    for subscription in self._subscribers[article_id]:
+                        subscription.push({"type": "reset", "article_id": article_id})
+
+            self._lost = asyncio.Event()
+            fileno = self._conn.fileno()
+            loop.add_reader(fileno, self._on_readable)
+            try:
+                await self._lost.wait()
+            finally:
+                loop.remove_reader(fileno)
+                self._conn.close()
+            await asyncio.sleep(self.retry_seconds)
+
+article_events = ArticleEventBroadcaster(
+    get_connection,
+    interval=settings.LIVE_COALESCE_SECONDS,
+    max_subscribers=settings.LIVE_MAX_SUBSCRIBERS,
+)
@@ -0,0 +1,208 @@
+import asyncio
+import threading
+from typing import Callable, Dict, Tuple
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import Counter
+
+# Coalesced notifications.
+#
+# Events such as upvotes are not written on the request path. They are
+# buffered in process, merged per (recipient, type, entity), and written in
+# batches every NOTIFICATION_FLUSH_INTERVAL_SECONDS. Each batch is upserted
+# into the recipient's unread notification for the entity (at most one, see
+# idx_notifications_unread_entity), so a popular article gives its author one
+# "X and 341 others upvoted your article" row instead of one row per vote.
+# Once that row is read, the next event starts a new one.
+#
+# Buffered events are lost if the process dies before the next flush; a
+# failed flush puts them back for the next attempt.
+#
+# Unread counts are kept in notification_counts by statement-level triggers
+# and cached per user for NOTIFICATION_COUNT_CACHE_TTL_SECONDS. Changes made by
+# this process invalidate the cache; other workers' changes show up within
+# the TTL.
+
+# type: (message for one actor, message for several)
+NOTIFICATION_MESSAGES = {
+    "vote": ("Your article received an upvote from {actor}", "{actor} and {others} upvoted your article"),
+}
+
+UPSERT_NOTIFICATIONS = """
+INSERT INTO notifications (user_id, type, entity_id, message, actor_id, actor_count)
+VALUES %s
+ON CONFLICT (user_id, type, entity_id) WHERE is_read = FALSE DO UPDATE
+    SET actor_id = EXCLUDED.actor_id,
+        actor_count = notifications.actor_count + EXCLUDED.actor_count,
+        created_at = CURRENT_TIMESTAMP
+RETURNING notification_id, user_id, type, entity_id, actor_count, message
+"""
+
+UPDATE_MESSAGES = """
+UPDATE notifications n
+SET message = v.message
+FROM (VALUES %s) AS v(notification_id, message)
+WHERE n.notification_id = v.notification_id
+"""
+
+notification_events = Counter(
+    "echo_notification_events_total",
+    "Notification events buffered for the batch writer, by type",
+    ("type",),
+)
+notification_events_dropped = Counter(
+    "echo_notification_events_dropped_total",
+    "Notification events dropped because the buffer was full",
+)
+notification_rows_written = Counter(
+    "echo_notification_rows_written_total",
+    "Notification rows inserted or coalesced by the batch writer",
+)
+
+def render_message(type: str, actor: str, actor_count: int) -> str:
+    one, several = NOTIFICATION_MESSAGES[type]
+    if actor_count == 1:
+        return one.format(actor=actor)
+    others = actor_count - 1
+    return several.format(actor=actor, others=f"{others} other" + ("s" if others > 1 else ""))
+
+# (user_id, type, entity_id) -> [actor_count, latest actor_id, latest actor name]
+Pending = Dict[Tuple[int, str, int], list]
+
+class NotificationBuffer:
+    """
+    Notification events waiting to be written, merged per recipient and entity
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._pending: Pending = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id: int, type: str, entity_id: int, actor_id: int, actor: str) -> None:
+        """
+        Buffer one event by `actor` for `user_id` about `entity_id`
+        """
+        key = (user_id, type, entity_id)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                if len(self._pending) >= self.max_keys:
+                    notification_events_dropped.inc()
+                    return
+                self._pending[key] = [1, actor_id, actor]
+            else:
+                entry[0] += 1
+                entry[1], entry[2] = actor_id, actor
+        notification_events.inc(type=type)
+
+    def _drain(self) -> Pending:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def _restore(self, pending: Pending) -> None:
+        # Merge a failed batch back under newer events for the same keys
+        with self._lock:
+            for key, (count, actor_id, actor) in pending.items():
+                entry = self._pending.get(key)
+                if entry is None:
+                    self._pending[key] = [count, actor_id, actor]
+                else:
+                    entry[0] += count
+
+    def flush(self, conn) -> int:
+        """
+        Write all buffered events in one transaction. Returns the number of
+        notification rows inserted or updated.
+        """
+        pending = self._drain()
+        if not pending:
+            return 0
+
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            rows = execute_values(
+                cursor,
+                UPSERT_NOTIFICATIONS,
+                [
+                    (user_id, type, entity_id, render_message(type, actor, count), actor_id, count)
+                    for (user_id, type, entity_id), (count, actor_id, actor) in pending.items()
+                ],
+                page_size=len(pending),
+                fetch=True,
+            )
+
+            # Rows that absorbed earlier events need the total in their message
+            messages = []
+            for row in rows:
+                actor = pending[(row["user_id"], row["type"], row["entity_id"])][2]
+                message = render_message(row["type"], actor, row["actor_count"])
+                if message != row["message"]:
+                    messages.append((row["notification_id"], message))
+            if messages:
+                execute_values(cursor, UPDATE_MESSAGES, messages, page_size=len(messages))
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            self._restore(pending)
+            raise
+        finally:
+            cursor.close()
+
+        for user_id in {user_id for user_id, _, _ in pending}:
+            unread_count_cache.delete(user_id)
+        notification_rows_written.inc(len(rows))
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+
+notification_buffer = NotificationBuffer(settings.NOTIFICATION_BUFFER_MAX_KEYS)
+
+unread_count_cache = TTLCache(
+    max_entries=settings.NOTIFICATION_COUNT_CACHE_MAX_ENTRIES,
+    ttl=settings.NOTIFICATION_COUNT_CACHE_TTL_SECONDS,
+)
+
+def get_unread_count(cursor, user_id: int) -> int:
+    """
+    Unread notifications for `user_id`, from cache or notification_counts
+    """
+    count = unread_count_cache.get(user_id)
+    if count is None:
+        cursor.execute("SELECT unread FROM notification_counts WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        count = row["unread"] if row else 0
+        unread_count_cache.set(user_id, count)
+    return count
+
+async def run_notification_writer(connect: Callable, interval: float, buffer: NotificationBuffer) -> None:
+    """
+    Flush `buffer` every `interval` seconds until cancelled, then once more
+    """
+    loop = asyncio.get_running_loop()
+
+    def flush_once():
+        conn = connect()
+        try:
+            return buffer.flush(conn)
+        finally:
+            conn.close()
+
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, flush_once)
+            except Exception as e:
+                print(f"Notification flush failed: {e}")
+    except asyncio.CancelledError:
+        # Write what is left before shutting down
+        await loop.run_in_executor(None, flush_once)
+        raise
@@ -0,0 +1,138 @@
+import time
+from typing import Callable, Dict
+
+from psycopg2.extras import RealDictCursor
+
+from app.db.batch import key_ranges, run_chunks
+from app.services.counters import ARTICLE_COMMENT_COUNT, ARTICLE_DOWNVOTES, ARTICLE_UPVOTES
+
+# Consistency check for the denormalized article counters.
+#
+# articles.upvotes/downvotes (plus pending shard deltas) should equal the
+# votes rows for the article, articles.views should equal its article_views
+# rows, and articles.comment_count (plus pending shard deltas) its comments
+# that are not deleted. Each chunk of articles is compared in one statement, so
+# both sides come from the same snapshot. A vote or view committed while the
+# statement runs is in neither side and is not reported as drift.
+#
+# Repairs use the same statement and apply the difference as a delta, as the
+# reputation recompute does. Votes never lock article rows, and a view waits
+# only while its article's row is corrected.
+
+COUNTERS = ("upvotes", "downvotes", "views", "comment_count")
+
+DRIFT_CTE = f"""
+WITH expected_votes AS (
+    SELECT
+        article_id,
+        COUNT(*) FILTER (WHERE vote_type = 'upvote') AS upvotes,
+        COUNT(*) FILTER (WHERE vote_type = 'downvote') AS downvotes
+    FROM votes
+    WHERE article_id >= %(start)s AND article_id < %(end)s
+    GROUP BY article_id
+),
+expected_views AS (
+    SELECT article_id, COUNT(*) AS views
+    FROM article_views
+    WHERE article_id >= %(start)s AND article_id < %(end)s
+    GROUP BY article_id
+),
+expected_comments AS (
+    SELECT article_id, COUNT(*) AS comment_count
+    FROM comments
+    WHERE article_id >= %(start)s AND article_id < %(end)s AND is_deleted = FALSE
+    GROUP BY article_id
+),
+scanned AS (
+    SELECT
+        a.article_id,
+        COALESCE(ev.upvotes, 0) - {ARTICLE_UPVOTES} AS upvotes,
+        COALESCE(ev.downvotes, 0) - {ARTICLE_DOWNVOTES} AS downvotes,
+        COALESCE(vw.views, 0) - a.views AS views,
+        COALESCE(ec.comment_count, 0) - {ARTICLE_COMMENT_COUNT} AS comment_count
+    FROM articles a
+    LEFT JOIN expected_votes ev ON ev.article_id = a.article_id
+    LEFT JOIN expected_views vw ON vw.article_id = a.article_id
+    LEFT JOIN expected_comments ec ON ec.article_id = a.article_id
+    WHERE a.article_id >= %(start)s AND a.article_id < %(end)s
+),
+drift AS (
+    SELECT * FROM scanned
+    WHERE upvotes <> 0 OR downvotes <> 0 OR views <> 0 OR comment_count <> 0
+)"""
+
+DRIFT_SUMMARY = """
+SELECT
+    (SELECT COUNT(*) FROM scanned) AS articles,
+    COUNT(*) AS drifted,
+    COALESCE(SUM(ABS(upvotes)), 0) AS upvotes,
+    COALESCE(SUM(ABS(downvotes)), 0) AS downvotes,
+    COALESCE(SUM(ABS(views)), 0) AS views,
+    COALESCE(SUM(ABS(comment_count)), 0) AS comment_count,
+    COALESCE(MAX(GREATEST(ABS(upvotes), ABS(downvotes), ABS(views), ABS(comment_count))), 0) AS max_drift,
+    {repaired} AS repaired
+FROM drift
+"""
+
+CHECK_CHUNK = DRIFT_CTE + DRIFT_SUMMARY.format(repaired="0")
+
+REPAIR_CHUNK = DRIFT_CTE + """,
+corrected AS (
+    UPDATE articles a
+    SET upvotes = a.upvotes + drift.upvotes,
+        downvotes = a.downvotes + drift.downvotes,
+        views = a.views + drift.views,
+        comment_count = a.comment_count + drift.comment_count
+    FROM drift
+    WHERE a.article_id = drift.article_id
+    RETURNING a.article_id
+)""" + DRIFT_SUMMARY.format(repaired="(SELECT COUNT(*) FROM corrected)")
+
+def reconcile_chunk(conn, start: int, end: int, repair: bool = False) -> Dict[str, int]:
+    """
+    Compare (and optionally repair) counters for articles with ids in [start, end)
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(REPAIR_CHUNK if repair else CHECK_CHUNK, {"start": start, "end": end})
+        result = dict(cursor.fetchone())
+        conn.commit()
+        return result
+    finally:
+        cursor.close()
+
+def reconcile_counters(
+    connect: Callable,
+    repair: bool = False,
+    workers: int = 4,
+    chunk_size: int = 5000,
+    throttle: float = 0.0,
+) -> Dict[str, int]:
+    """
+    Check article counters against votes, article_views and comments in
+    parallel chunks.
+
+    With `repair`, drifted counters are corrected chunk by chunk. Each worker
+    sleeps `throttle` seconds after every chunk to bound the load on a live
+    database. Returns the number of articles scanned, drifted and repaired,
+    the total absolute drift per counter and the largest single drift.
+    """
+    conn = connect()
+    try:
+        ranges = key_ranges(conn, "articles", "article_id", chunk_size)
+    finally:
+        conn.close()
+
+    def work(conn, start, end):
+        result = reconcile_chunk(conn, start, end, repair=repair)
+        if throttle:
+            time.sleep(throttle)
+        return result
+
+    results = run_chunks(connect, ranges, work, workers=workers)
+    report = {
+        key: sum(r[key] for r in results)
+        for key in ("articles", "drifted", "repaired") + COUNTERS
+    }
+    report["max_drift"] = max((r["max_drift"] for r in results), default=0)
+    return report
@@ -0,0 +1,106 @@
+from typing import Callable, Dict
+
+from psycopg2.extras import RealDictCursor
+
+from app.db.batch import key_ranges, run_chunks
+from app.services.counters import USER_REPUTATION
+
+# Batch recomputation of users.reputation from votes and reputation_weights.
+#
+# Each chunk of users is rebuilt by one set-based statement that computes
+# every user's target reputation (from votes on their approved articles, the
+# only ones that can be voted on) and their current reputation (folded value
+# plus pending shards) from the same snapshot. It then applies the
+# difference as a delta. A vote committed while the statement runs is in
+# neither value, and its delta still lands through the counter shards.
+# Nothing is lost, and a user's row is locked only for the moment it is
+# corrected. Every correction is appended to reputation_ledger.
+
+RECOMPUTE_CHUNK = f"""
+WITH target AS (
+    SELECT a.submitted_by AS user_id, SUM(w.points) AS reputation
+    FROM votes v
+    JOIN articles a ON a.article_id = v.article_id AND a.status = 'approved'
+    JOIN reputation_weights w ON w.event = 'article_' || v.vote_type
+    WHERE a.submitted_by >= %(start)s AND a.submitted_by < %(end)s
+    GROUP BY a.submitted_by
+),
+current AS (
+    SELECT u.user_id, {USER_REPUTATION} AS reputation
+    FROM users u
+    WHERE u.user_id >= %(start)s AND u.user_id < %(end)s
+),
+corrections AS (
+    SELECT current.user_id, COALESCE(target.reputation, 0) - current.reputation AS points
+    FROM current
+    LEFT JOIN target ON target.user_id = current.user_id
+    WHERE COALESCE(target.reputation, 0) <> current.reputation
+),
+ledger AS (
+    INSERT INTO reputation_ledger (user_id, points, reason)
+    SELECT user_id, points, 'recompute'
+    FROM corrections
+),
+corrected AS (
+    UPDATE users u
+    SET reputation = u.reputation + corrections.points
+    FROM corrections
+    WHERE u.user_id = corrections.user_id
+    RETURNING u.user_id
+)
+SELECT
+    (SELECT COUNT(*) FROM current) AS users,
+    (SELECT COUNT(*) FROM corrected) AS corrected
+"""
+
+def recompute_chunk(conn, start: int, end: int) -> Dict[str, int]:
+    """
+    Rebuild reputation for users with ids in [start, end)
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(RECOMPUTE_CHUNK, {"start": start, "end": end})
+        result = dict(cursor.fetchone())
+        conn.commit()
+        return result
+    finally:
+        cursor.close()
+
+def set_reputation_weights(conn, weights: Dict[str, int]) -> None:
+    """
+    Insert or update reputation weights, e.g. {"article_upvote": 10}
+    """
+    cursor = conn.cursor()
+    try:
+        for event, points in weights.items():
+            cursor.execute(
+                """
+                INSERT INTO reputation_weights (event, points) VALUES (%s, %s)
+                ON CONFLICT (event) DO UPDATE SET points = EXCLUDED.points
+                """,
+                (event, points)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def recompute_reputation(connect: Callable, workers: int = 4, chunk_size: int = 5000) -> Dict[str, int]:
+    """
+    Rebuild reputation for all users in parallel chunks.
+
+    Returns the number of users scanned and corrected.
+    """
+    conn = connect()
+    try:
+        ranges = key_ranges(conn, "users", "user_id", chunk_size)
+    finally:
+        conn.close()
+
+    results = run_chunks(connect, ranges, recompute_chunk, workers=workers)
+    return {
+        "users": sum(r["users"] for r in results),
+        "corrected": sum(r["corrected"] for r in results),
+    }
@@ -0,0 +1,200 @@
+import asyncio
+import base64
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+from psycopg2.extensions import QueryCanceledError
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.metrics import Counter
+from app.db.session import ConnectionPool
+
+# Full-text search.
+#
+# Articles, comments and users carry a generated `search_vector` column with
+# a GIN index (see database_schema.sql); article titles and user names are
+# weighted A, descriptions and bios B. A query matches documents containing
+# all of its words after stemming, and its last word also matches as a
+# prefix, so results show up while a word is still being typed. Results are
+# ordered by ts_rank, which counts weight A matches above weight B ones.
+#
+# Highlighted snippets come from ts_headline, which re-parses the whole
+# text, so callers compute them in an outer query over the page of rows
+# being returned (see with_highlight()).
+#
+# The expressions below take the tsquery as the %(tsquery)s parameter.
+#
+# GET /search runs its count and page queries for each result type at the
+# same time, each on its own pooled connection (see run_legs()), so a search
+# takes as long as its slowest query rather than the sum of them. Queries
+# still running at the deadline are cancelled and their result type is left
+# out of the response.
+#
+# Mixed results (type=all) are merged from the page queries of each result
+# type, which all order rows by one key: exact title or username matches
+# first, then rank, then newest, then id (see merged_order()). A page takes
+# its rows from the front of the sorted lists with heapq.merge, and its
+# cursor holds, per result type, the key of the last row taken from that
+# type, so the next page asks each type only for rows after it.
+
+SEARCH_CONFIG = "english"
+
+TSQUERY = f"to_tsquery('{SEARCH_CONFIG}', %(tsquery)s)"
+
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MinWords=15, MaxWords=35, MaxFragments=2"
+
+def build_tsquery(q: str) -> Optional[str]:
+    """
+    Turn free text into a to_tsquery() string: every word required, the last
+    one as a prefix. Returns None if `q` has no words.
+
+    Only word characters are kept, so user input cannot inject tsquery
+    operators.
+    """
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return None
+    return " & ".join(words[:-1] + [f"{words[-1]}:*"])
+
+def match_condition(vector: str) -> str:
+    return f"{vector} @@ {TSQUERY}"
+
+def rank_expression(vector: str) -> str:
+    return f"ts_rank({vector}, {TSQUERY})"
+
+def with_highlight(
+    query: str, table: str, id_column: str, text: str, order: Sequence[str] = ("search_rank",)
+) -> str:
+    """
+    Wrap a page query that selects `id_column` and the `order` columns and
+    add a `highlight` snippet of `text` (an expression over `table` aliased
+    as `t`) for each row it returns, keeping the page in descending `order`.
+    """
+    order_by = ", ".join(f"page.{column} DESC" for column in [*order, id_column])
+    return f"""
+    SELECT page.*, ts_headline('{SEARCH_CONFIG}', {text}, {TSQUERY}, '{HEADLINE_OPTIONS}') AS highlight
+    FROM ({query}) page
+    JOIN {table} t ON t.{id_column} = page.{id_column}
+    ORDER BY {order_by}
+    """
+
+# Result types in the order they are merged among rows with equal keys
+MERGED_TYPES = ("articles", "users", "comments")
+
+# Columns of the merged sort key, all descending, before the row's id
+MERGED_ORDER = ("search_exact", "search_rank", "search_created_at")
+
+SearchKey = Tuple[int, float, datetime, int]
+
+def merged_order(exact: str, rank: str, created_at: str, id_column: str) -> Tuple[str, str]:
+    """
+    Extra SELECT columns and keyset condition for the page query of one
+    result type in mixed results. The query selects `rank` as search_rank
+    itself and orders by MERGED_ORDER and its id; the condition takes the
+    last key of the previous page as the %(after_*)s parameters.
+    """
+    columns = f"({exact})::int AS search_exact, {created_at} AS search_created_at"
+    after = (
+        f"(({exact})::int, {rank}, {created_at}, {id_column}) < "
+        "(%(after_exact)s, %(after_rank)s, %(after_created_at)s, %(after_id)s)"
+    )
+    return columns, after
+
+def merged_key(row: Dict[str, Any], id_field: str) -> SearchKey:
+    return (row["search_exact"], row["search_rank"], row["search_created_at"], row[id_field])
+
+def merge_rank(result_type: str, key: SearchKey) -> Tuple:
+    """Ascending sort key for heapq.merge matching the descending SQL order"""
+    exact, rank, created_at, row_id = key
+    return (-exact, -rank, -created_at.timestamp(), MERGED_TYPES.index(result_type), -row_id)
+
+def encode_search_cursor(positions: Dict[str, SearchKey]) -> str:
+    raw = orjson.dumps({
+        result_type: [exact, rank, created_at.isoformat(), row_id]
+        for result_type, (exact, rank, created_at, row_id) in positions.items()
+    })
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_search_cursor(cursor: str) -> Dict[str, SearchKey]:
+    """
+    Decode a cursor from encode_search_cursor(); raises ValueError if it is
+    malformed
+    """
+    try:
+        raw = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return {
+            result_type: (int(exact), float(rank), datetime.fromisoformat(created_at), int(row_id))
+            for result_type, (exact, rank, created_at, row_id) in raw.items()
+            if result_type in MERGED_TYPES
+        }
+    except (ValueError, TypeError, AttributeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+search_legs = Counter(
+    "echo_search_legs_total",
+    "Search queries by outcome: done, or timed_out at the request deadline",
+    ("outcome",),
+)
+
+async def run_legs(
+    pool: ConnectionPool,
+    legs: Dict[Any, Callable[[Any], Any]],
+    timeout: float,
+) -> Tuple[Dict[Any, Any], List[Any]]:
+    """
+    Run each leg, a function of a RealDictCursor, on its own pooled
+    connection, all at once, for at most `timeout` seconds.
+
+    Returns the results of the legs that finished and the keys of those that
+    did not. Their queries are cancelled and also stopped by the server
+    once `timeout` has passed. Legs still waiting for a connection or a
+    thread then never start. Errors other than timeouts are raised.
+    """
+    deadline = time.monotonic() + timeout
+    missed = threading.Event()
+    # Connections of running legs, for cancelling them
+    running = {}
+
+    def run(key, leg):
+        with pool.connection(timeout=max(0, deadline - time.monotonic())) as conn:
+            running[key] = conn
+            try:
+                # Checked after registering, so a leg past this point is
+                # either cancelled below or stopped by its statement timeout
+                remaining = deadline - time.monotonic()
+                if missed.is_set() or remaining <= 0:
+                    raise PoolError("The deadline passed before a connection became free")
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                cursor.execute("SET LOCAL statement_timeout = %s", (max(1, int(remaining * 1000)),))
+                return leg(cursor)
+            finally:
+                running.pop(key, None)
+
+    tasks = {key: asyncio.ensure_future(run_in_threadpool(run, key, leg)) for key, leg in legs.items()}
+    await asyncio.wait(tasks.values(), timeout=timeout)
+    missed.set()
+
+    results = {}
+    timed_out = []
+    for key, task in tasks.items():
+        if not task.done():
+            timed_out.append(key)
+            conn = running.get(key)
+            if conn is not None:
+                conn.cancel()
+            # The leg's error, once cancelled, is expected and not reported
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        elif isinstance(task.exception(), (QueryCanceledError, PoolError)):
+            timed_out.append(key)
+        else:
+            results[key] = task.result()
+
+    search_legs.inc(len(results), outcome="done")
+    search_legs.inc(len(timed_out), outcome="timed_out")
+    return results, timed_out
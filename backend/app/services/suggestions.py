@@ -0,0 +1,299 @@
+import asyncio
+import heapq
+import threading
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from app.core.config import settings
+
+# Search suggestions from memory.
+#
+# GET /search/suggestions is called on every keystroke of the search box, so
+# it is answered from in-process prefix indexes without touching the
+# database: approved article titles, tag names, category names and
+# usernames, each weighted by popularity (article score plus comments,
+# tagged or categorized approved articles, user reputation).
+#
+# Indexes are loaded at startup and rebuilt every
+# SUGGESTION_RELOAD_SECONDS, which picks up changed weights and writes made
+# by other workers. In between, endpoints apply their own changes: new
+# users, tags and approved articles are added, and rejected or deleted
+# articles are removed.
+
+# Keys are cut to this many characters; longer prefixes are checked against
+# the terms themselves
+KEY_LENGTH = 32
+
+# Above this many keys, a prefix's top terms are computed once and then kept
+# up to date as terms are added, instead of being recomputed per request
+SCAN_LIMIT = 256
+
+# Sorts after any character that can follow a prefix
+MAX_CHAR = "\U0010ffff"
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+class PrefixIndex:
+    """
+    Weighted terms, looked up by prefix in a sorted array of keys.
+
+    A term is keyed by its normalized text and, with `word_starts`, also by
+    its text from each later word on, so "quant" finds "New quantum chips".
+    A prefix matches the keys in one bisected range of the array. Not
+    thread-safe; Suggestions serializes access.
+    """
+
+    def __init__(self, terms: Iterable[Tuple[str, float]] = (), k: int = 10, word_starts: bool = False):
+        self.k = k
+        self.word_starts = word_starts
+        self._weights: Dict[str, float] = {}
+        self._keys: List[Tuple[str, str]] = []
+        # Top terms of prefixes with more than SCAN_LIMIT keys
+        self._top: Dict[str, List[str]] = {}
+        for term, weight in terms:
+            if term in self._weights:
+                self._weights[term] = max(self._weights[term], weight)
+                continue
+            self._weights[term] = weight
+            self._keys.extend((key, term) for key in self.keys_of(term))
+        self._keys.sort()
+
+    def keys_of(self, term: str) -> List[str]:
+        text = normalize(term)
+        if not self.word_starts:
+            return [text[:KEY_LENGTH]]
+        keys = []
+        start = 0
+        while start >= 0:
+            keys.append(text[start:start + KEY_LENGTH])
+            start = text.find(" ", start)
+            if start >= 0:
+                start += 1
+        return list(dict.fromkeys(keys))
+
+    def _rank(self, term: str) -> Tuple[float, str]:
+        return (-self._weights[term], term)
+
+    def _range(self, key: str) -> Tuple[int, int]:
+        return bisect_left(self._keys, (key,)), bisect_left(self._keys, (key + MAX_CHAR,))
+
+    def _matches(self, term: str, prefix: str) -> bool:
+        text = normalize(term)
+        return text.startswith(prefix) or (self.word_starts and f" {prefix}" in text)
+
+    def top(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """
+        The `limit` (at most k) highest weighted terms matching `prefix`
+        """
+        limit = min(limit or self.k, self.k)
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        key = prefix[:KEY_LENGTH]
+        if len(prefix) > KEY_LENGTH:
+            lo, hi = self._range(key)
+            terms = {term for _, term in self._keys[lo:hi] if self._matches(term, prefix)}
+            return heapq.nsmallest(limit, terms, key=self._rank)
+
+        top = self._top.get(key)
+        if top is None:
+            lo, hi = self._range(key)
+            terms = {term for _, term in self._keys[lo:hi]}
+            top = heapq.nsmallest(self.k, terms, key=self._rank)
+            if hi - lo > SCAN_LIMIT:
+                self._top[key] = top
+        return top[:limit]
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._weights
+
+    def weight(self, term: str) -> float:
+        return self._weights.get(term, 0)
+
+    def add(self, term: str, weight: float = 0) -> None:
+        """
+        Add `term`, or change its weight
+        """
+        previous = self._weights.get(term)
+        if previous is None:
+            for key in self.keys_of(term):
+                insort(self._keys, (key, term))
+        self._weights[term] = weight
+
+        for key in self.keys_of(term):
+            for length in range(1, len(key) + 1):
+                top = self._top.get(key[:length])
+                if top is None:
+                    continue
+                if previous is not None and weight < previous and term in top:
+                    # A term below it in the range may now belong in the list
+                    del self._top[key[:length]]
+                    continue
+                if term not in top:
+                    top.append(term)
+                top.sort(key=self._rank)
+                del top[self.k:]
+
+    def remove(self, term: str) -> None:
+        if term not in self._weights:
+            return
+        for key in self.keys_of(term):
+            index = bisect_left(self._keys, (key, term))
+            if index < len(self._keys) and self._keys[index] == (key, term):
+                del self._keys[index]
+            for length in range(1, len(key) + 1):
+                top = self._top.get(key[:length])
+                if top is not None and term in top:
+                    del self._top[key[:length]]
+        del self._weights[term]
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+# (title, weight) for the most popular approved articles
+TITLE_QUERY = """
+SELECT title AS term, upvotes - downvotes + comment_count AS weight
+FROM articles
+WHERE status = 'approved'
+ORDER BY weight DESC
+LIMIT %(max_titles)s
+"""
+
+TAG_QUERY = """
+SELECT t.name AS term, COUNT(a.article_id) AS weight
+FROM tags t
+LEFT JOIN article_tags at ON at.tag_id = t.tag_id
+LEFT JOIN articles a ON a.article_id = at.article_id AND a.status = 'approved'
+GROUP BY t.name
+"""
+
+CATEGORY_QUERY = """
+SELECT c.name AS term, COUNT(a.article_id) AS weight
+FROM categories c
+LEFT JOIN articles a ON a.category_id = c.category_id AND a.status = 'approved'
+GROUP BY c.name
+"""
+
+USERNAME_QUERY = "SELECT username AS term, reputation AS weight FROM users"
+
+# Result kinds in the order they are listed among equally good matches
+KINDS = ("titles", "tags", "categories", "usernames")
+
+class Suggestions:
+    """
+    Prefix indexes over titles, tags, categories and usernames
+    """
+
+    def __init__(self, per_kind: int = 5):
+        self.per_kind = per_kind
+        self._lock = threading.Lock()
+        self._indexes = self._build({})
+
+    def _build(self, rows: Dict[str, Iterable[Tuple[str, float]]]) -> Dict[str, PrefixIndex]:
+        return {
+            kind: PrefixIndex(rows.get(kind, ()), k=self.per_kind, word_starts=kind == "titles")
+            for kind in KINDS
+        }
+
+    def load(self, conn, max_titles: int = None) -> Dict[str, int]:
+        """
+        Rebuild every index from the database and swap them in.
+
+        Returns the number of terms per kind.
+        """
+        max_titles = max_titles or settings.SUGGESTION_MAX_TITLES
+        rows = {}
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            for kind, query in (
+                ("titles", TITLE_QUERY),
+                ("tags", TAG_QUERY),
+                ("categories", CATEGORY_QUERY),
+                ("usernames", USERNAME_QUERY),
+            ):
+                cursor.execute(query, {"max_titles": max_titles})
+                rows[kind] = [(row["term"], row["weight"]) for row in cursor.fetchall()]
+            conn.commit()
+        finally:
+            cursor.close()
+
+        # Built outside the lock, so suggestions keep being served meanwhile
+        indexes = self._build(rows)
+        with self._lock:
+            self._indexes = indexes
+        return {kind: len(index) for kind, index in indexes.items()}
+
+    def suggest(self, q: str, limit: int = 10) -> List[str]:
+        """
+        Up to `limit` suggestions for `q`: exact matches first, then terms
+        starting with `q`, then terms with a later word starting with it,
+        each by popularity
+        """
+        prefix = normalize(q)
+        with self._lock:
+            found = [(kind, self._indexes[kind].top(prefix)) for kind in KINDS]
+
+        ranked = []
+        for kind_order, (kind, terms) in enumerate(found):
+            for position, term in enumerate(terms):
+                text = normalize(term)
+                ranked.append((text != prefix, not text.startswith(prefix), position, kind_order, term))
+        ranked.sort()
+        return list(dict.fromkeys(term for *_, term in ranked))[:limit]
+
+    def add(self, kind: str, term: str, weight: float = 0) -> None:
+        with self._lock:
+            self._indexes[kind].add(term, weight)
+
+    def add_missing(self, kind: str, terms: Iterable[str]) -> None:
+        """Add new terms with weight 0, keeping the weights of known ones"""
+        with self._lock:
+            index = self._indexes[kind]
+            for term in terms:
+                if term not in index:
+                    index.add(term)
+
+    def remove(self, kind: str, term: str) -> None:
+        with self._lock:
+            self._indexes[kind].remove(term)
+
+    def article_approved(self, title: str, category: Optional[str], tags: List[str], weight: float = 0) -> None:
+        with self._lock:
+            self._indexes["titles"].add(title, weight)
+            for kind, names in (("categories", [category] if category else []), ("tags", tags)):
+                index = self._indexes[kind]
+                for name in names:
+                    index.add(name, index.weight(name) + 1)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes = self._build({})
+
+suggestion_index = Suggestions()
+
+async def run_suggestion_loader(connect: Callable, interval: float) -> None:
+    """
+    Load the suggestion indexes, then reload them every `interval` seconds
+    until cancelled
+    """
+    loop = asyncio.get_running_loop()
+
+    def load_once():
+        conn = connect()
+        try:
+            return suggestion_index.load(conn)
+        finally:
+            conn.close()
+
+    while True:
+        try:
+            await loop.run_in_executor(None, load_once)
+        except Exception as e:
+            print(f"Loading search suggestions failed: {e}")
+        if not interval:
+            return
+        await asyncio.sleep(interval)
@@ -0,0 +1,25 @@
+from typing import Dict, List, Optional
+
+def get_user_votes(cursor, user_id: int, article_ids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    Look up a user's votes on several articles in one query.
+
+    Returns a map of every requested article id to the user's vote type, or
+    None where the user has not voted. The lookup uses the votes
+    (article_id, user_id) unique index.
+    """
+    votes = dict.fromkeys(article_ids)
+    if not article_ids:
+        return votes
+
+    cursor.execute(
+        """
+        SELECT article_id, vote_type
+        FROM votes
+        WHERE user_id = %s AND article_id = ANY(%s)
+        """,
+        (user_id, list(article_ids))
+    )
+    for row in cursor.fetchall():
+        votes[row["article_id"]] = row["vote_type"]
+    return votes
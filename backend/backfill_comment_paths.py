@@ -0,0 +1,35 @@
+import argparse
+import sys
+import time
+
+from app.db.session import get_connection
+from app.services.comment_paths import backfill_comment_paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill in comments.path for comments that have none")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel database connections")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Comments per chunk")
+    parser.add_argument(
+        "--throttle", type=float, default=0.0,
+        help="Seconds each worker sleeps between chunks"
+    )
+    args = parser.parse_args()
+
+    started = time.time()
+    report = backfill_comment_paths(
+        get_connection,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        throttle=args.throttle,
+    )
+    print(
+        f"Filled {report['filled']} comment paths in {time.time() - started:.1f}s, "
+        f"{report['remaining']} left"
+    )
+
+    # Replies posted during the run can be left without a path; run again
+    if report["remaining"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
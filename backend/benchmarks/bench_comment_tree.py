@@ -0,0 +1,241 @@
+"""
+Benchmark for reading the comment threads of an article with many comments.
+
+Compares the previous two-query read (top-level comments, then every reply,
+grouped by parent in Python, which only attaches direct replies) against
+the paged thread read: the first page from fetch_threads(), as a client
+opening the article gets it, and every page in turn. Reported are the time
+per read, the comments returned and the size of the JSON response.
+
+It also reads the whole of the largest thread twice: by walking replies
+level by level, as thread pages do, and by one range scan over comments.path
+in depth-first order, with the same per-comment lookups.
+
+Needs a database with the current schema (settings.POSTGRES_*). The article,
+its comments and the commenters are created up front and deleted afterwards.
+Each comment replies to a random earlier comment (or starts a new thread with
+probability `--top-level`), which gives the long-tailed depth distribution of
+real discussions.
+
+Usage:
+    python -m benchmarks.bench_comment_tree [--comments 50000] [--top-level 0.1] [--runs 5]
+"""
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+import orjson
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from app.core.config import settings
+from app.db.session import get_connection
+from app.services.comments import build_comment_tree, fetch_comment_page, fetch_threads
+
+COMMENTERS = 100
+
+def setup(comments, top_level, seed):
+    """Create commenters, an approved article and a random comment tree"""
+    rng = random.Random(seed)
+    prefix = f"bench_{uuid.uuid4().hex[:8]}"
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute(
+        """
+        INSERT INTO users (username, email, password_hash)
+        SELECT %(prefix)s || '_' || i, %(prefix)s || '_' || i || '@example.com', 'x'
+        FROM generate_series(1, %(n)s) AS i
+        RETURNING user_id
+        """,
+        {"prefix": prefix, "n": COMMENTERS}
+    )
+    user_ids = [row["user_id"] for row in cursor.fetchall()]
+    cursor.execute(
+        """
+        INSERT INTO articles (title, description, category_id, submitted_by, status)
+        VALUES ('Benchmark article', 'Busy discussion', (SELECT MIN(category_id) FROM categories), %s, 'approved')
+        RETURNING article_id
+        """,
+        (user_ids[0],)
+    )
+    article_id = cursor.fetchone()["article_id"]
+
+    # Ids are reserved up front so replies can reference earlier comments
+    cursor.execute("SELECT nextval('comments_comment_id_seq') AS id FROM generate_series(1, %s)", (comments,))
+    ids = [row["id"] for row in cursor.fetchall()]
+    rows = []
+    for i, comment_id in enumerate(ids):
+        parent = None if i == 0 or rng.random() < top_level else ids[rng.randrange(i)]
+        rows.append((comment_id, article_id, rng.choice(user_ids), f"Comment {i}", parent, i))
+    execute_values(
+        cursor,
+        """
+        INSERT INTO comments (comment_id, article_id, user_id, text, parent_comment_id, created_at)
+        SELECT v.comment_id, v.article_id, v.user_id, v.text, v.parent_comment_id,
+               NOW() - INTERVAL '1 day' + v.i * INTERVAL '1 second'
+        FROM (VALUES %s) AS v(comment_id, article_id, user_id, text, parent_comment_id, i)
+        """,
+        rows,
+        page_size=5000
+    )
+    cursor.execute("ANALYZE comments")
+    conn.commit()
+    conn.close()
+    return prefix, article_id
+
+def teardown(prefix, article_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles WHERE article_id = %s", (article_id,))
+    cursor.execute("DELETE FROM users WHERE username LIKE %s", (f"{prefix}\\_%",))
+    conn.commit()
+    conn.close()
+
+def count_comments(threads):
+    count = 0
+    stack = list(threads)
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node["replies"])
+    return count
+
+def legacy_read(cursor, article_id):
+    """The two queries and grouping get_article_comments used to run"""
+    cursor.execute(
+        """
+        SELECT c.comment_id, c.article_id, c.user_id, c.text, c.created_at, c.parent_comment_id, u.username
+        FROM comments c JOIN users u ON c.user_id = u.user_id
+        WHERE c.article_id = %s AND c.parent_comment_id IS NULL AND c.is_deleted = FALSE
+        ORDER BY c.created_at DESC
+        """,
+        (article_id,)
+    )
+    top_comments = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT c.comment_id, c.article_id, c.user_id, c.text, c.created_at, c.parent_comment_id, u.username
+        FROM comments c JOIN users u ON c.user_id = u.user_id
+        WHERE c.article_id = %s AND c.parent_comment_id IS NOT NULL AND c.is_deleted = FALSE
+        ORDER BY c.created_at ASC
+        """,
+        (article_id,)
+    )
+    all_replies = cursor.fetchall()
+
+    replies_by_parent = {}
+    for reply in all_replies:
+        replies_by_parent.setdefault(reply["parent_comment_id"], []).append(dict(reply, replies=[]))
+    result = [dict(comment, replies=replies_by_parent.get(comment["comment_id"], [])) for comment in top_comments]
+    return [result]
+
+def paged_read(cursor, article_id, all_pages, limits):
+    """fetch_threads() for the first page, or for every page in turn"""
+    pages = []
+    after = None
+    while True:
+        threads, after = fetch_threads(cursor, article_id, "newest", settings.COMMENT_PAGE_SIZE, after, **limits)
+        pages.append(threads)
+        if after is None or not all_pages:
+            return pages
+
+def largest_thread(article_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT path[1] FROM comments WHERE article_id = %s GROUP BY path[1] ORDER BY COUNT(*) DESC LIMIT 1",
+        (article_id,)
+    )
+    root_id = cursor.fetchone()[0]
+    conn.close()
+    return root_id
+
+def subtree_walk(cursor, root_id, limits):
+    """The whole thread under root_id from the recursive page query"""
+    threads, _ = fetch_comment_page(
+        cursor, "c.comment_id = %(comment_id)s", {"comment_id": root_id}, True, "oldest", 1, None, **limits
+    )
+    return [threads]
+
+# Paths under the root's range from its own path up to the path of a next
+# sibling with id comment_id + 1; the bounds are computed first so the range
+# is an index condition on idx_comments_path
+SUBTREE_BY_PATH = """
+WITH root AS (
+    SELECT article_id, path, cardinality(path) AS depth, path[:cardinality(path) - 1] || (comment_id + 1) AS path_end
+    FROM comments
+    WHERE comment_id = %(comment_id)s
+)
+SELECT
+    c.comment_id, c.article_id, c.user_id, c.text, c.created_at, c.parent_comment_id,
+    (SELECT username FROM users u WHERE u.user_id = c.user_id) AS username,
+    c.upvotes, c.downvotes,
+    cardinality(c.path) - (SELECT depth FROM root) AS depth,
+    (SELECT COUNT(*) FROM comments r WHERE r.parent_comment_id = c.comment_id AND r.is_deleted = FALSE) AS reply_count,
+    c.created_at AS sort_key
+FROM comments c
+WHERE c.article_id = (SELECT article_id FROM root)
+  AND c.path >= (SELECT path FROM root) AND c.path < (SELECT path_end FROM root)
+  AND c.is_deleted = FALSE
+ORDER BY c.article_id, c.path
+"""
+
+def subtree_path(cursor, root_id, limits):
+    """The whole thread under root_id from one comments.path range scan"""
+    cursor.execute(SUBTREE_BY_PATH, {"comment_id": root_id})
+    return [build_comment_tree(cursor.fetchall())]
+
+def run(read_fn, runs, *args):
+    """Return the median time per read, the comments read and the response bytes"""
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        pages = read_fn(cursor, *args)
+        times.append(time.perf_counter() - start)
+    conn.close()
+    returned = sum(count_comments(page) for page in pages)
+    size = sum(len(orjson.dumps(page)) for page in pages)
+    return statistics.median(times), returned, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, default=50_000, help="Comments on the article")
+    parser.add_argument("--top-level", type=float, default=0.1, help="Share of comments that start a thread")
+    parser.add_argument("--max-depth", type=int, default=settings.COMMENT_THREAD_DEPTH, help="Reply levels per thread")
+    parser.add_argument("--max-replies", type=int, default=settings.COMMENT_THREAD_REPLIES, help="Replies per comment")
+    parser.add_argument("--runs", type=int, default=5, help="Reads per path; medians are reported")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    limits = {
+        "max_depth": args.max_depth,
+        "max_replies": args.max_replies,
+        "max_comments": settings.COMMENT_PAGE_MAX_COMMENTS,
+    }
+
+    prefix, article_id = setup(args.comments, args.top_level, args.seed)
+    try:
+        results = [
+            ("legacy", run(legacy_read, args.runs, article_id)),
+            ("first page", run(paged_read, args.runs, article_id, False, limits)),
+            ("all pages", run(paged_read, args.runs, article_id, True, limits)),
+        ]
+        root_id = largest_thread(article_id)
+        whole = {"max_depth": args.comments, "max_replies": args.comments, "max_comments": args.comments}
+        results += [
+            ("thread walk", run(subtree_walk, args.runs, root_id, whole)),
+            ("thread path", run(subtree_path, args.runs, root_id, whole)),
+        ]
+    finally:
+        teardown(prefix, article_id)
+
+    print(f"{'read':<12} {'ms':>10} {'comments':>10} {'KB':>10}")
+    for name, (seconds, returned, size) in results:
+        print(f"{name:<12} {seconds * 1000:>10.1f} {returned:>10} {size / 1024:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Micro-benchmark for response serialization.
+
+Compares, per endpoint shape, the previous path (copy each row into a dict,
+call `.isoformat()`, validate through the response_model, encode with the
+stdlib json module) against the fast path (hand the RealDictRow rows straight
+to FastJSONResponse). No database is needed; rows are synthesized.
+
+Usage:
+    python -m benchmarks.bench_serialization [--items 100] [--rounds 200]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from psycopg2.extras import RealDictRow
+
+from app.api.endpoints.articles import ArticleListResponse, ArticleDetailResponse
+from app.api.endpoints.search import SearchResponse
+from app.api.pagination import encode_cursor
+from app.core.config import settings
+from app.core.responses import FastJSONResponse
+
+DESCRIPTION = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8
+
+def _row(**values):
+    row = RealDictRow()
+    row.update(values)
+    return row
+
+def article_rows(n):
+    now = datetime(2025, 1, 1, 12, 0, 0, 123456)
+    return [
+        _row(
+            article_id=i, title=f"Article {i}", description=DESCRIPTION,
+            url=f"https://example.com/{i}", category="Technology",
+            submitted_by=f"user{i % 50}", created_at=now - timedelta(minutes=i),
+            upvotes=i * 3, downvotes=i, views=i * 10, is_featured=False,
+            tags=["python", "news", "fastapi"],
+        )
+        for i in range(n)
+    ]
+
+def comment_rows(n):
+    now = datetime(2025, 1, 1, 12, 0, 0, 123456)
+    return [
+        _row(
+            comment_id=i, text=DESCRIPTION[:120],
+            user={"user_id": i % 50, "username": f"user{i % 50}"},
+            created_at=now - timedelta(seconds=i),
+        )
+        for i in range(n)
+    ]
+
+def search_rows(n):
+    rows = []
+    for row in article_rows(n):
+        row = _row(result_type="article", **row)
+        row["source_url"] = row.pop("url")
+        row["score"] = row["upvotes"] - row["downvotes"]
+        rows.append(row)
+    return rows
+
+def legacy_encode(payload, model):
+    """What the endpoints did before: dict copies, isoformat, model validation, stdlib json"""
+    def convert(row):
+        data = dict(row)
+        data["created_at"] = data["created_at"].isoformat()
+        return data
+
+    for key in ("articles", "results", "comments"):
+        if key in payload:
+            payload = dict(payload, **{key: [convert(row) for row in payload[key]]})
+    if "created_at" in payload:
+        payload = convert(payload)
+
+    validated = model.model_validate(payload)
+    return json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+def fast_encode(payload, model):
+    return FastJSONResponse(payload).body
+
+def endpoint_payloads(items):
+    detail = article_rows(1)[0]
+    detail.pop("views")
+    detail.pop("is_featured")
+    detail["score"] = detail["upvotes"] - detail["downvotes"]
+    # The comment preview: one page of top-level comments and the cursor of the next
+    detail["comments"] = comment_rows(settings.COMMENT_PAGE_SIZE)
+    last = detail["comments"][-1]
+    detail["comments_cursor"] = encode_cursor(last["created_at"], last["comment_id"])
+    return {
+        "GET /articles": ({"total": 10000, "page": 1, "limit": items, "articles": article_rows(items)}, ArticleListResponse),
+        "GET /articles/{id}": (detail, ArticleDetailResponse),
+        "GET /search": (
+            {"total": 10000, "page": 1, "limit": items, "results": search_rows(items), "next_cursor": None,
+             "timed_out": []},
+            SearchResponse
+        ),
+    }
+
+def timeit(fn, payload, model, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(payload, model)
+    return (time.perf_counter() - start) / rounds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100, help="Items per page")
+    parser.add_argument("--rounds", type=int, default=200, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<20} {'legacy (ms)':>12} {'fast (ms)':>10} {'speedup':>8}")
+    for name, (payload, model) in endpoint_payloads(args.items).items():
+        # Both paths must produce the same document
+        assert json.loads(legacy_encode(payload, model)) == json.loads(fast_encode(payload, model)), name
+
+        legacy = timeit(legacy_encode, payload, model, args.rounds)
+        fast = timeit(fast_encode, payload, model, args.rounds)
+        print(f"{name:<20} {legacy * 1000:>12.3f} {fast * 1000:>10.3f} {legacy / fast:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
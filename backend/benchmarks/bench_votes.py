@@ -0,0 +1,232 @@
+"""
+Benchmark for the vote write path on a single hot article.
+
+Compares the previous per-vote sequence (article check, existing-vote check,
+insert/update/delete, the two trigger UPDATEs, count re-read, activity insert,
+author lookup, notification insert) against the single VOTE_STATEMENT, run in
+autocommit mode as the endpoint does. Worker threads each own a voter and
+cycle upvote -> downvote -> none against the same article: the legacy path
+contends for the article row, the statement writes to counter shards. Upvote
+notifications are now buffered and written in batches off the request path,
+so the statement side does not include them.
+
+Needs a database with the current schema (settings.POSTGRES_*). Benchmark
+users and the article are created up front and deleted afterwards. Against a
+local socket a round trip costs tens of microseconds, which hides the cost of
+holding the article row lock across several statements; `--rtt-ms` adds a
+simulated network round trip to every statement and commit.
+
+Usage:
+    python -m benchmarks.bench_votes [--threads 8] [--seconds 5] [--rtt-ms 0.5]
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from psycopg2.extras import RealDictCursor
+
+from app.api.endpoints.votes import VOTE_STATEMENT
+from app.db.session import get_connection
+from app.services.counters import counter_shard
+
+VOTE_CYCLE = ["upvote", "downvote", "none"]
+
+class DelayedConnection:
+    """
+    Wrap a connection so each execute and commit pays a simulated round trip
+    """
+
+    def __init__(self, conn, rtt, autocommit):
+        self.conn = conn
+        self.conn.autocommit = autocommit
+        self.rtt = rtt
+        self.raw_cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    def execute(self, query, params=None):
+        if self.rtt:
+            time.sleep(self.rtt)
+        self.raw_cursor.execute(query, params)
+
+    def fetchone(self):
+        return self.raw_cursor.fetchone()
+
+    def commit(self):
+        if self.conn.autocommit:
+            return
+        if self.rtt:
+            time.sleep(self.rtt)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def legacy_vote(cursor, article_id, user_id, username, vote_type):
+    """The statements the endpoint and the votes triggers used to run per vote"""
+    cursor.execute(
+        "SELECT article_id, status, upvotes, downvotes FROM articles WHERE article_id = %s",
+        (article_id,)
+    )
+    cursor.fetchone()
+    cursor.execute(
+        "SELECT vote_id, vote_type FROM votes WHERE article_id = %s AND user_id = %s",
+        (article_id, user_id)
+    )
+    existing_vote = cursor.fetchone()
+
+    up = (vote_type == "upvote") - (existing_vote is not None and existing_vote["vote_type"] == "upvote")
+    down = (vote_type == "downvote") - (existing_vote is not None and existing_vote["vote_type"] == "downvote")
+
+    if existing_vote:
+        if vote_type == "none":
+            cursor.execute("DELETE FROM votes WHERE vote_id = %s", (existing_vote["vote_id"],))
+        elif vote_type != existing_vote["vote_type"]:
+            cursor.execute(
+                "UPDATE votes SET vote_type = %s, updated_at = NOW() WHERE vote_id = %s",
+                (vote_type, existing_vote["vote_id"])
+            )
+    elif vote_type != "none":
+        cursor.execute(
+            "INSERT INTO votes (article_id, user_id, vote_type) VALUES (%s, %s, %s)",
+            (article_id, user_id, vote_type)
+        )
+
+    if up or down:
+        # update_article_votes() and update_user_reputation() trigger bodies
+        cursor.execute(
+            "UPDATE articles SET upvotes = upvotes + %s, downvotes = downvotes + %s WHERE article_id = %s",
+            (up, down, article_id)
+        )
+        cursor.execute("SELECT submitted_by FROM articles WHERE article_id = %s", (article_id,))
+        author_id = cursor.fetchone()["submitted_by"]
+        cursor.execute(
+            "UPDATE users SET reputation = reputation + %s WHERE user_id = %s",
+            (up - down, author_id)
+        )
+
+    cursor.execute("SELECT upvotes, downvotes FROM articles WHERE article_id = %s", (article_id,))
+    cursor.fetchone()
+    cursor.execute(
+        "INSERT INTO user_activity (user_id, activity_type, entity_id) VALUES (%s, %s, %s)",
+        (user_id, f"article_{vote_type}", article_id)
+    )
+    if up > 0:
+        cursor.execute("SELECT submitted_by FROM articles WHERE article_id = %s", (article_id,))
+        author_id = cursor.fetchone()["submitted_by"]
+        if author_id != user_id:
+            cursor.execute(
+                """
+                INSERT INTO notifications (user_id, type, entity_id, message) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (user_id, type, entity_id) WHERE is_read = FALSE DO NOTHING
+                """,
+                (author_id, "vote", article_id, f"Your article received an upvote from {username}")
+            )
+
+def single_vote(cursor, article_id, user_id, username, vote_type):
+    cursor.execute(
+        VOTE_STATEMENT,
+        {
+            "article_id": article_id,
+            "user_id": user_id,
+            "vote_type": vote_type,
+            "shard": counter_shard(user_id),
+        }
+    )
+    cursor.fetchone()
+
+def setup(threads):
+    """Create an author, an approved article and one voter per thread"""
+    prefix = f"bench_{uuid.uuid4().hex[:8]}"
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute(
+        """
+        INSERT INTO users (username, email, password_hash)
+        SELECT %(prefix)s || '_' || i, %(prefix)s || '_' || i || '@example.com', 'x'
+        FROM generate_series(0, %(n)s) AS i
+        RETURNING user_id, username
+        """,
+        {"prefix": prefix, "n": threads}
+    )
+    users = sorted(cursor.fetchall(), key=lambda u: u["user_id"])
+    cursor.execute(
+        """
+        INSERT INTO articles (title, description, category_id, submitted_by, status)
+        VALUES ('Benchmark article', 'Hot article', (SELECT MIN(category_id) FROM categories), %s, 'approved')
+        RETURNING article_id
+        """,
+        (users[0]["user_id"],)
+    )
+    article_id = cursor.fetchone()["article_id"]
+    conn.commit()
+    conn.close()
+    return prefix, article_id, users[1:]
+
+def teardown(prefix, article_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles WHERE article_id = %s", (article_id,))
+    cursor.execute("DELETE FROM users WHERE username LIKE %s", (f"{prefix}\\_%",))
+    conn.commit()
+    conn.close()
+
+def run(vote_fn, autocommit, article_id, voters, seconds, rtt):
+    """Run one worker per voter for `seconds`; return committed votes per second"""
+    counts = [0] * len(voters)
+    start_barrier = threading.Barrier(len(voters) + 1)
+    deadline = [0.0]
+
+    errors = []
+
+    def worker(index, voter):
+        conn = cursor = DelayedConnection(get_connection(), rtt, autocommit)
+        start_barrier.wait()
+        i = 0
+        try:
+            while time.perf_counter() < deadline[0]:
+                vote_fn(cursor, article_id, voter["user_id"], voter["username"], VOTE_CYCLE[i % 3])
+                conn.commit()
+                i += 1
+            counts[index] = i
+            # Leave no vote behind for the next run
+            vote_fn(cursor, article_id, voter["user_id"], voter["username"], "none")
+            conn.commit()
+        except Exception as e:
+            errors.append(e)
+            conn.conn.rollback()
+        finally:
+            conn.close()
+
+    workers = [threading.Thread(target=worker, args=(i, v)) for i, v in enumerate(voters)]
+    for w in workers:
+        w.start()
+    deadline[0] = time.perf_counter() + seconds
+    start_barrier.wait()
+    for w in workers:
+        w.join()
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(voters)} workers failed: {errors[0]!r}") from errors[0]
+    return sum(counts) / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent voters")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="Simulated network round trip per statement")
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    prefix, article_id, voters = setup(args.threads)
+    try:
+        legacy = run(legacy_vote, False, article_id, voters, args.seconds, rtt)
+        single = run(single_vote, True, article_id, voters, args.seconds, rtt)
+    finally:
+        teardown(prefix, article_id)
+
+    print(f"{'path':<10} {'votes/s':>10}")
+    print(f"{'legacy':<10} {legacy:>10.0f}")
+    print(f"{'single':<10} {single:>10.0f}")
+    print(f"speedup: {single / legacy:.1f}x")
+
+if __name__ == "__main__":
+    main()
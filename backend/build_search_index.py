@@ -0,0 +1,48 @@
+import argparse
+import sys
+import time
+
+from app.core.config import settings
+from app.db.session import get_connection
+from app.services.bm25 import search_engine
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bring the embedded search index up to date, e.g. before switching SEARCH_BACKEND to bm25"
+    )
+    parser.add_argument("--dir", default=settings.SEARCH_INDEX_DIR, help="Index directory")
+    parser.add_argument(
+        "--rebuild", action="store_true",
+        help="Drop the index and index everything again, which also removes articles deleted elsewhere"
+    )
+    args = parser.parse_args()
+
+    started = time.time()
+    try:
+        search_engine.open(args.dir)
+    except RuntimeError as e:
+        # The running app keeps the index it holds up to date itself
+        print(e)
+        sys.exit(1)
+
+    try:
+        if args.rebuild:
+            search_engine.clear()
+        conn = get_connection()
+        try:
+            read = search_engine.sync(conn)
+        finally:
+            conn.close()
+        search_engine.flush()
+        search_engine.merge(max_segments=1)
+        stats = search_engine.stats()
+    finally:
+        search_engine.close()
+
+    print(
+        f"Read {read} changed rows in {time.time() - started:.1f}s; "
+        f"{stats['documents']} documents in {stats['segments']} segments"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 -- Echo News Database Schema
 
 -- Drop tables if they exist (for clean setup)
+DROP TABLE IF EXISTS moderation_log CASCADE;
+DROP TABLE IF EXISTS reputation_ledger CASCADE;
+DROP TABLE IF EXISTS reputation_weights CASCADE;
 DROP TABLE IF EXISTS user_badges CASCADE;
 DROP TABLE IF EXISTS badges CASCADE;
 DROP TABLE IF EXISTS user_activity CASCADE;
+DROP TABLE IF EXISTS notification_counts CASCADE;
 DROP TABLE IF EXISTS notifications CASCADE;
+DROP TABLE IF EXISTS user_reputation_shards CASCADE;
+DROP TABLE IF EXISTS article_vote_shards CASCADE;
+DROP TABLE IF EXISTS article_comment_shards CASCADE;
+DROP TABLE IF EXISTS comment_vote_shards CASCADE;
+DROP TABLE IF EXISTS comment_votes CASCADE;
 DROP TABLE IF EXISTS votes CASCADE;
 DROP TABLE IF EXISTS article_tags CASCADE;
 DROP TABLE IF EXISTS tags CASCADE;
@@ -14,6 +23,10 @@ DROP TABLE IF EXISTS categories CASCADE;
 DROP TABLE IF EXISTS user_preferences CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
 
+-- Drop vote trigger functions from older schema versions
+DROP FUNCTION IF EXISTS update_article_votes() CASCADE;
+DROP FUNCTION IF EXISTS update_user_reputation() CASCADE;
+
 -- Create users table
 CREATE TABLE users (
     user_id SERIAL PRIMARY KEY,
@@ -27,7 +40,12 @@ CREATE TABLE users (
     reputation INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP,
-    last_login TIMESTAMP
+    last_login TIMESTAMP,
+    -- Full-text search document, names weighted above the bio
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', username || ' ' || COALESCE(display_name, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(bio, '')), 'B')
+    ) STORED
 );
 
 -- Create user_preferences table
@@ -61,10 +79,22 @@ CREATE TABLE articles (
     upvotes INTEGER NOT NULL DEFAULT 0,
     downvotes INTEGER NOT NULL DEFAULT 0,
     views INTEGER NOT NULL DEFAULT 0,
+    -- Comments that are not deleted, excluding pending article_comment_shards deltas
+    comment_count INTEGER NOT NULL DEFAULT 0,
     is_featured BOOLEAN NOT NULL DEFAULT FALSE,
     status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    moderated_by INTEGER REFERENCES users(user_id) ON DELETE SET NULL,
+    moderated_at TIMESTAMP,
+    moderation_reason TEXT,
+    claimed_by INTEGER REFERENCES users(user_id) ON DELETE SET NULL,
+    claimed_at TIMESTAMP,
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP
+    updated_at TIMESTAMP,
+    -- Full-text search document, the title weighted above the description
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', title), 'A') ||
+        setweight(to_tsvector('english', description), 'B')
+    ) STORED
 );
 
 -- Create comments table
@@ -74,9 +104,14 @@ CREATE TABLE comments (
     user_id INTEGER REFERENCES users(user_id) ON DELETE SET NULL,
     text TEXT NOT NULL,
     parent_comment_id INTEGER REFERENCES comments(comment_id) ON DELETE CASCADE,
+    -- Ids from the thread's top-level comment down to this one, set on insert
+    path INTEGER[],
+    upvotes INTEGER NOT NULL DEFAULT 0,
+    downvotes INTEGER NOT NULL DEFAULT 0,
     is_deleted BOOLEAN NOT NULL DEFAULT FALSE,
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP
+    updated_at TIMESTAMP,
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', text)) STORED
 );
 
 -- Create tags table
@@ -105,6 +140,60 @@ CREATE TABLE votes (
     UNIQUE (article_id, user_id)
 );
 
+-- Create comment votes table
+CREATE TABLE comment_votes (
+    comment_vote_id SERIAL PRIMARY KEY,
+    comment_id INTEGER REFERENCES comments(comment_id) ON DELETE CASCADE,
+    user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+    vote_type VARCHAR(10) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP,
+    UNIQUE (comment_id, user_id)
+);
+
+-- Create article views table, the source of truth for articles.views
+CREATE TABLE article_views (
+    view_id BIGSERIAL PRIMARY KEY,
+    article_id INTEGER REFERENCES articles(article_id) ON DELETE CASCADE,
+    viewed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Pending vote counter deltas, spread over shards so concurrent votes on one
+-- article (or for one author) do not serialize on a single row. Folded into
+-- articles/comments upvotes/downvotes and users.reputation by
+-- fold_counter_shards().
+CREATE TABLE article_vote_shards (
+    article_id INTEGER REFERENCES articles(article_id) ON DELETE CASCADE,
+    shard SMALLINT NOT NULL,
+    upvotes INTEGER NOT NULL DEFAULT 0,
+    downvotes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (article_id, shard)
+);
+
+CREATE TABLE comment_vote_shards (
+    comment_id INTEGER REFERENCES comments(comment_id) ON DELETE CASCADE,
+    shard SMALLINT NOT NULL,
+    upvotes INTEGER NOT NULL DEFAULT 0,
+    downvotes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (comment_id, shard)
+);
+
+-- Pending comment count deltas, written by create_comment/delete_comment and
+-- folded into articles.comment_count the same way
+CREATE TABLE article_comment_shards (
+    article_id INTEGER REFERENCES articles(article_id) ON DELETE CASCADE,
+    shard SMALLINT NOT NULL,
+    comments INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (article_id, shard)
+);
+
+CREATE TABLE user_reputation_shards (
+    user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+    shard SMALLINT NOT NULL,
+    reputation INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, shard)
+);
+
 -- Create notifications table
 CREATE TABLE notifications (
     notification_id SERIAL PRIMARY KEY,
@@ -112,10 +201,18 @@ CREATE TABLE notifications (
     type VARCHAR(20) NOT NULL,
     entity_id INTEGER,
     message TEXT NOT NULL,
+    actor_id INTEGER REFERENCES users(user_id) ON DELETE SET NULL, -- latest actor
+    actor_count INTEGER NOT NULL DEFAULT 1, -- events coalesced into this row
     is_read BOOLEAN NOT NULL DEFAULT FALSE,
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Unread notifications per user, maintained by the notifications triggers below
+CREATE TABLE notification_counts (
+    user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    unread INTEGER NOT NULL DEFAULT 0
+);
+
 -- Create user_activity table
 CREATE TABLE user_activity (
     activity_id SERIAL PRIMARY KEY,
@@ -125,6 +222,36 @@ CREATE TABLE user_activity (
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Create moderation_log table
+CREATE TABLE moderation_log (
+    log_id SERIAL PRIMARY KEY,
+    moderator_id INTEGER REFERENCES users(user_id) ON DELETE SET NULL,
+    action VARCHAR(50) NOT NULL, -- approve_article, reject_article, etc.
+    entity_id INTEGER,
+    reason TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Points a user's reputation moves by per event on their content. Read by the
+-- vote statement and by the reputation recompute, so changing a weight takes
+-- effect for new votes at once and for history on the next recompute.
+CREATE TABLE reputation_weights (
+    event VARCHAR(50) PRIMARY KEY, -- article_upvote, article_downvote, etc.
+    points INTEGER NOT NULL
+);
+
+-- Append-only log of every reputation change. For each user the sum of
+-- points equals their reputation.
+CREATE TABLE reputation_ledger (
+    entry_id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+    points INTEGER NOT NULL,
+    reason VARCHAR(50) NOT NULL, -- article_vote, recompute
+    entity_id INTEGER,
+    actor_id INTEGER REFERENCES users(user_id) ON DELETE SET NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Create badges table
 CREATE TABLE badges (
     badge_id SERIAL PRIMARY KEY,
@@ -142,22 +269,148 @@ CREATE TABLE user_badges (
     PRIMARY KEY (user_id, badge_id)
 );
 
+-- Lower bound of the 95% Wilson score interval for the upvote ratio. Ranks
+-- comments by how confidently they are liked, so one upvote does not outrank
+-- a hundred upvotes and a few downvotes.
+CREATE OR REPLACE FUNCTION wilson_lower_bound(upvotes INTEGER, downvotes INTEGER)
+RETURNS DOUBLE PRECISION AS $$
+    SELECT CASE WHEN upvotes + downvotes = 0 THEN 0 ELSE (
+        p + 1.96 * 1.96 / (2 * n)
+        - 1.96 * sqrt((p * (1 - p) + 1.96 * 1.96 / (4 * n)) / n)
+    ) / (1 + 1.96 * 1.96 / n) END
+    FROM (SELECT upvotes::float8 / NULLIF(upvotes + downvotes, 0) AS p,
+                 (upvotes + downvotes)::float8 AS n) AS ratio
+$$ LANGUAGE SQL IMMUTABLE;
+
 -- Create indexes for performance
 CREATE INDEX idx_articles_category ON articles(category_id);
 CREATE INDEX idx_articles_submitted_by ON articles(submitted_by);
 CREATE INDEX idx_articles_status ON articles(status);
 CREATE INDEX idx_articles_created_at ON articles(created_at);
+-- Moderation queue: only pending rows, in claim order
+CREATE INDEX idx_articles_pending_queue ON articles(created_at, article_id) WHERE status = 'pending';
+-- "Most discussed" listing: ordered by the folded comment count
+CREATE INDEX idx_articles_discussed ON articles(status, comment_count DESC, created_at DESC);
+-- Full-text search (see app/services/search.py)
+CREATE INDEX idx_articles_search ON articles USING GIN (search_vector);
+CREATE INDEX idx_comments_search ON comments USING GIN (search_vector);
+CREATE INDEX idx_users_search ON users USING GIN (search_vector);
+-- Rows changed since the embedded search index last synced (see app/services/bm25.py)
+CREATE INDEX idx_articles_changed_at ON articles ((GREATEST(created_at, updated_at, moderated_at)));
+CREATE INDEX idx_comments_changed_at ON comments ((GREATEST(created_at, updated_at)));
 CREATE INDEX idx_comments_article_id ON comments(article_id);
 CREATE INDEX idx_comments_user_id ON comments(user_id);
-CREATE INDEX idx_comments_parent_id ON comments(parent_comment_id);
+CREATE INDEX idx_comments_parent_id ON comments(parent_comment_id, created_at, comment_id);
+CREATE INDEX idx_comments_path ON comments(article_id, path);
+CREATE INDEX idx_comments_threads ON comments(article_id, created_at DESC, comment_id DESC)
+    WHERE parent_comment_id IS NULL AND is_deleted = FALSE;
+CREATE INDEX idx_comments_best ON comments(article_id, wilson_lower_bound(upvotes, downvotes) DESC, comment_id DESC)
+    WHERE parent_comment_id IS NULL AND is_deleted = FALSE;
+CREATE INDEX idx_comment_votes_user_id ON comment_votes(user_id);
 CREATE INDEX idx_votes_article_id ON votes(article_id);
 CREATE INDEX idx_votes_user_id ON votes(user_id);
+CREATE INDEX idx_article_views_article_id ON article_views(article_id);
 CREATE INDEX idx_article_tags_article_id ON article_tags(article_id);
 CREATE INDEX idx_article_tags_tag_id ON article_tags(tag_id);
 CREATE INDEX idx_user_activity_user_id ON user_activity(user_id);
 CREATE INDEX idx_user_activity_type ON user_activity(activity_type);
-CREATE INDEX idx_notifications_user_id ON notifications(user_id);
+CREATE INDEX idx_notifications_user_created ON notifications(user_id, created_at DESC, notification_id DESC);
+CREATE INDEX idx_notifications_user_unread ON notifications(user_id, created_at DESC, notification_id DESC)
+    WHERE is_read = FALSE;
 CREATE INDEX idx_notifications_is_read ON notifications(is_read);
+-- At most one unread notification per recipient and entity; new events coalesce into it
+CREATE UNIQUE INDEX idx_notifications_unread_entity ON notifications(user_id, type, entity_id) WHERE is_read = FALSE;
+CREATE INDEX idx_moderation_log_entity_id ON moderation_log(entity_id);
+CREATE INDEX idx_reputation_ledger_user_id ON reputation_ledger(user_id);
+
+-- Keep notification_counts in step with notifications. Statement-level
+-- triggers see all changed rows at once through transition tables, so a batch
+-- insert or a mark-all-read updates each user's count once.
+CREATE OR REPLACE FUNCTION count_inserted_notifications() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO notification_counts (user_id, unread)
+    SELECT user_id, COUNT(*)
+    FROM new_rows
+    WHERE NOT is_read AND user_id IS NOT NULL
+    GROUP BY user_id
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET unread = notification_counts.unread + EXCLUDED.unread;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION count_updated_notifications() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO notification_counts (user_id, unread)
+    SELECT user_id, SUM(delta)
+    FROM (
+        SELECT user_id, 1 AS delta FROM new_rows WHERE NOT is_read
+        UNION ALL
+        SELECT user_id, -1 AS delta FROM old_rows WHERE NOT is_read
+    ) AS changes
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+    HAVING SUM(delta) <> 0
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET unread = notification_counts.unread + EXCLUDED.unread;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION count_deleted_notifications() RETURNS TRIGGER AS $$
+BEGIN
+    -- Only update existing rows: when a user is deleted, their count row is
+    -- removed by the same cascade
+    UPDATE notification_counts c
+    SET unread = c.unread - deleted.unread
+    FROM (
+        SELECT user_id, COUNT(*) AS unread
+        FROM old_rows
+        WHERE NOT is_read
+        GROUP BY user_id
+    ) AS deleted
+    WHERE c.user_id = deleted.user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notifications_count_insert
+AFTER INSERT ON notifications
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION count_inserted_notifications();
+
+CREATE TRIGGER notifications_count_update
+AFTER UPDATE ON notifications
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION count_updated_notifications();
+
+CREATE TRIGGER notifications_count_delete
+AFTER DELETE ON notifications
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION count_deleted_notifications();
+
+-- Materialized comment paths. A comment's path is its parent's path plus its
+-- own id, so ordering by path lists a thread depth-first with replies in
+-- posting order, a subtree is the range of paths starting with its root's,
+-- and depth is the path length. Comments never change parent. If the parent
+-- has no path yet (rows from before the column was added), the path is left
+-- NULL for backfill_comment_paths.py.
+CREATE OR REPLACE FUNCTION set_comment_path() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.parent_comment_id IS NULL THEN
+        NEW.path := ARRAY[NEW.comment_id];
+    ELSE
+        SELECT p.path || NEW.comment_id INTO NEW.path
+        FROM comments p
+        WHERE p.comment_id = NEW.parent_comment_id AND p.path IS NOT NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER comments_set_path
+BEFORE INSERT ON comments
+FOR EACH ROW EXECUTE FUNCTION set_comment_path();
 
 -- Create views for common queries
 CREATE OR REPLACE VIEW trending_articles AS
@@ -179,76 +432,9 @@ WHERE
 ORDER BY 
     a.is_featured DESC, trending_score DESC;
 
--- Create functions and triggers
--- Function to update article vote counts
-CREATE OR REPLACE FUNCTION update_article_votes()
-RETURNS TRIGGER AS $$
-BEGIN
-    IF TG_OP = 'INSERT' THEN
-        IF NEW.vote_type = 'upvote' THEN
-            UPDATE articles SET upvotes = upvotes + 1 WHERE article_id = NEW.article_id;
-        ELSIF NEW.vote_type = 'downvote' THEN
-            UPDATE articles SET downvotes = downvotes + 1 WHERE article_id = NEW.article_id;
-        END IF;
-    ELSIF TG_OP = 'UPDATE' THEN
-        IF OLD.vote_type = 'upvote' AND NEW.vote_type = 'downvote' THEN
-            UPDATE articles SET upvotes = upvotes - 1, downvotes = downvotes + 1 WHERE article_id = NEW.article_id;
-        ELSIF OLD.vote_type = 'downvote' AND NEW.vote_type = 'upvote' THEN
-            UPDATE articles SET upvotes = upvotes + 1, downvotes = downvotes - 1 WHERE article_id = NEW.article_id;
-        END IF;
-    ELSIF TG_OP = 'DELETE' THEN
-        IF OLD.vote_type = 'upvote' THEN
-            UPDATE articles SET upvotes = upvotes - 1 WHERE article_id = OLD.article_id;
-        ELSIF OLD.vote_type = 'downvote' THEN
-            UPDATE articles SET downvotes = downvotes - 1 WHERE article_id = OLD.article_id;
-        END IF;
-    END IF;
-    RETURN NULL;
-END;
-$$ LANGUAGE plpgsql;
-
--- Trigger for votes
-CREATE TRIGGER votes_trigger
-AFTER INSERT OR UPDATE OR DELETE ON votes
-FOR EACH ROW EXECUTE FUNCTION update_article_votes();
-
--- Function to update user reputation based on votes
-CREATE OR REPLACE FUNCTION update_user_reputation()
-RETURNS TRIGGER AS $$
-DECLARE
-    article_author_id INTEGER;
-BEGIN
-    -- Get the article author
-    SELECT submitted_by INTO article_author_id FROM articles WHERE article_id = NEW.article_id;
-    
-    -- Update reputation based on vote type
-    IF TG_OP = 'INSERT' THEN
-        IF NEW.vote_type = 'upvote' THEN
-            UPDATE users SET reputation = reputation + 1 WHERE user_id = article_author_id;
-        ELSIF NEW.vote_type = 'downvote' THEN
-            UPDATE users SET reputation = reputation - 1 WHERE user_id = article_author_id;
-        END IF;
-    ELSIF TG_OP = 'UPDATE' THEN
-        IF OLD.vote_type = 'upvote' AND NEW.vote_type = 'downvote' THEN
-            UPDATE users SET reputation = reputation - 2 WHERE user_id = article_author_id;
-        ELSIF OLD.vote_type = 'downvote' AND NEW.vote_type = 'upvote' THEN
-            UPDATE users SET reputation = reputation + 2 WHERE user_id = article_author_id;
-        END IF;
-    ELSIF TG_OP = 'DELETE' THEN
-        IF OLD.vote_type = 'upvote' THEN
-            UPDATE users SET reputation = reputation - 1 WHERE user_id = article_author_id;
-        ELSIF OLD.vote_type = 'downvote' THEN
-            UPDATE users SET reputation = reputation + 1 WHERE user_id = article_author_id;
-        END IF;
-    END IF;
-    RETURN NULL;
-END;
-$$ LANGUAGE plpgsql;
-
--- Trigger for user reputation
-CREATE TRIGGER user_reputation_trigger
-AFTER INSERT OR UPDATE OR DELETE ON votes
-FOR EACH ROW EXECUTE FUNCTION update_user_reputation();
+-- Article vote counters and author reputation are maintained by the vote
+-- statement itself (VOTE_STATEMENT in app/api/endpoints/votes.py), which writes
+-- to the counter shard tables, rather than by row triggers on votes.
 
 -- Insert initial data
 -- Insert default categories
@@ -270,4 +456,9 @@ INSERT INTO badges (name, description, icon) VALUES
 ('Popular Article', 'Awarded when one of your articles gets 10+ upvotes', 'fire'),
 ('Contributor', 'Awarded when you submit 5+ articles', 'pen'),
 ('Commenter', 'Awarded when you post 10+ comments', 'comments'),
-('Influencer', 'Awarded when you reach 100+ reputation', 'star'); 
\ No newline at end of file
+('Influencer', 'Awarded when you reach 100+ reputation', 'star');
+
+-- Insert default reputation weights
+INSERT INTO reputation_weights (event, points) VALUES
+('article_upvote', 1),
+('article_downvote', -1);
\ No newline at end of file
@@ -0,0 +1,107 @@
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+
+import orjson
+
+from app.db.session import get_connection
+from app.services.export import EXPORT_DATASETS, EXPORT_FORMATS, stream_export
+
+def resume_point(path, dataset, export_format):
+    """
+    Find where to continue an interrupted export: the id of the last complete
+    row in an existing export file, and the byte offset just after it. Anything
+    past that offset is a partly written row.
+    """
+    if export_format == "ndjson":
+        return ndjson_resume_point(path, EXPORT_DATASETS[dataset]["key"])
+    return csv_resume_point(path)
+
+def ndjson_resume_point(path, key):
+    # JSON escapes newlines in strings, so every complete record is one line
+    # and the last one can be found by reading the file backwards
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        block = 64 * 1024
+        while True:
+            start = max(0, size - block)
+            f.seek(start)
+            data = f.read()
+            end = data.rfind(b"\n")
+            begin = data.rfind(b"\n", 0, max(end, 0))
+            if start > 0 and begin < 0:
+                block *= 2  # The last complete line started before this block
+                continue
+            if end < 0:
+                return 0, 0
+            return orjson.loads(data[begin + 1:end])[key], start + end + 1
+
+def csv_resume_point(path):
+    # Quoted fields can hold newlines, so records are read from the start of
+    # the file: a record ends at a line break outside quotes, where it holds an
+    # even number of quote characters (quotes inside fields are doubled)
+    last_id, offset, position = 0, 0, 0
+    record, quotes = [], 0
+    with open(path, 'rb') as f:
+        for line in f:
+            position += len(line)
+            record.append(line)
+            quotes += line.count(b'"')
+            if quotes % 2 or not line.endswith(b"\n"):
+                continue
+            row = next(csv.reader(io.StringIO(b"".join(record).decode("utf-8"), newline="")), [])
+            if row and row[0].isdigit():
+                last_id = int(row[0])
+            offset = position
+            record, quotes = [], 0
+    return last_id, offset
+
+def main():
+    parser = argparse.ArgumentParser(description="Export approved articles, votes or comments")
+    parser.add_argument("dataset", choices=list(EXPORT_DATASETS))
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--output", "-o", help="Output file (default: stdout)")
+    parser.add_argument("--after", type=int, default=0, help="Only export rows with a greater id")
+    parser.add_argument("--limit", type=int, help="Maximum number of rows to export")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted export into --output")
+    args = parser.parse_args()
+
+    after = args.after
+    header = True
+    mode = 'wb'
+    if args.resume:
+        if not args.output:
+            parser.error("--resume requires --output")
+        if os.path.exists(args.output) and os.path.getsize(args.output) > 0:
+            after, complete = resume_point(args.output, args.dataset, args.format)
+            # Cut off a partly written last row before appending
+            with open(args.output, 'r+b') as f:
+                f.truncate(complete)
+            header = complete == 0
+            mode = 'ab'
+            print(f"Resuming {args.dataset} export after id {after}", file=sys.stderr)
+
+    out = open(args.output, mode) if args.output else sys.stdout.buffer
+    started = time.time()
+    written = 0
+    try:
+        chunks = stream_export(
+            get_connection, args.dataset, args.format, after=after, limit=args.limit, header=header
+        )
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+        else:
+            out.flush()
+
+    elapsed = time.time() - started
+    print(f"Exported {written / (1024 * 1024):.1f} MiB of {args.dataset} in {elapsed:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
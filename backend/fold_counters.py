@@ -0,0 +1,32 @@
+import argparse
+import time
+
+from app.db.session import get_connection
+from app.services.counters import fold_counter_shards
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fold pending counter shards into article vote and comment counts and user reputation"
+    )
+    parser.add_argument("--batch-size", type=int, help="Shard rows folded per transaction")
+    parser.add_argument("--interval", type=float, help="Keep running, folding every INTERVAL seconds")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        while True:
+            started = time.time()
+            folded = fold_counter_shards(conn, args.batch_size)
+            print(
+                f"Folded {folded['article_vote_shards']} article vote, "
+                f"{folded['article_comment_shards']} comment count, {folded['comment_vote_shards']} comment vote and "
+                f"{folded['user_reputation_shards']} reputation shard rows in {time.time() - started:.2f}s"
+            )
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
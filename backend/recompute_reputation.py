@@ -0,0 +1,39 @@
+import argparse
+import time
+
+from app.db.session import get_connection
+from app.services.reputation import recompute_reputation, set_reputation_weights
+
+def parse_weight(value):
+    event, _, points = value.partition("=")
+    try:
+        return event, int(points)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected EVENT=POINTS, got {value!r}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild users.reputation from votes and reputation weights")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel database connections")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Users per chunk")
+    parser.add_argument(
+        "--weight", type=parse_weight, action="append", default=[], metavar="EVENT=POINTS",
+        help="Change a weight before recomputing, e.g. --weight article_upvote=10"
+    )
+    args = parser.parse_args()
+
+    if args.weight:
+        conn = get_connection()
+        try:
+            set_reputation_weights(conn, dict(args.weight))
+        finally:
+            conn.close()
+
+    started = time.time()
+    result = recompute_reputation(get_connection, workers=args.workers, chunk_size=args.chunk_size)
+    print(
+        f"Recomputed reputation for {result['users']} users "
+        f"({result['corrected']} corrected) in {time.time() - started:.1f}s"
+    )
+
+if __name__ == "__main__":
+    main()
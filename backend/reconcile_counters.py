@@ -0,0 +1,42 @@
+import argparse
+import sys
+import time
+
+from app.db.session import get_connection
+from app.services.reconcile import COUNTERS, reconcile_counters
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check articles.upvotes/downvotes/views/comment_count against votes, article_views and comments"
+    )
+    parser.add_argument("--repair", action="store_true", help="Correct drifted counters")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel database connections")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Articles per chunk")
+    parser.add_argument(
+        "--throttle", type=float, default=0.0,
+        help="Seconds each worker sleeps between chunks"
+    )
+    args = parser.parse_args()
+
+    started = time.time()
+    report = reconcile_counters(
+        get_connection,
+        repair=args.repair,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        throttle=args.throttle,
+    )
+    print(
+        f"Scanned {report['articles']} articles in {time.time() - started:.1f}s: "
+        f"{report['drifted']} drifted, {report['repaired']} repaired"
+    )
+    for counter in COUNTERS:
+        print(f"  {counter}: total drift {report[counter]}")
+    print(f"  largest drift: {report['max_drift']}")
+
+    # Non-zero exit lets cron or CI alert on unrepaired drift
+    if report["drifted"] > report["repaired"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -95,4 +95,18 @@ def test_delete_article(test_client, test_article_id, auth_headers):
     
     # Verify article is deleted
     response = test_client.get(f"/api/v1/articles/{test_article_id}")
-    assert response.status_code == status.HTTP_404_NOT_FOUND 
\ No newline at end of file
+    assert response.status_code == status.HTTP_404_NOT_FOUND 
+
+def test_get_articles_sparse_fields(test_client, test_article_id):
+    """Test projecting list results with the fields parameter"""
+    response = test_client.get("/api/v1/articles?status=pending&fields=title,score,tags")
+    assert response.status_code == status.HTTP_200_OK
+    article = response.json()["articles"][0]
+    assert set(article) == {"article_id", "title", "score", "tags"}
+    assert article["article_id"] == test_article_id
+    assert sorted(article["tags"]) == ["pytest", "test"]
+
+def test_get_articles_unknown_field(test_client):
+    """Test that unknown fields are rejected"""
+    response = test_client.get("/api/v1/articles?fields=title,password_hash")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,146 @@
+from datetime import datetime
+
+import pytest
+from fastapi import status
+
+from app.core.config import settings
+from app.services.bm25 import SearchEngine, search_engine, tokenize
+
+def ids(hits):
+    return [hit.row_id for hit in hits]
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("The Quantum-computing race, in 2024!") == ["quantum", "computing", "race", "2024"]
+
+def test_index_survives_flush_merge_and_reopen(tmp_path):
+    created = datetime(2024, 1, 1)
+    engine = SearchEngine()
+    engine.open(str(tmp_path))
+    engine.add_article(1, "Quantum computers break a record", "Researchers report a milestone.", created)
+    engine.add_article(2, "A record year for chips", "Quantum computing startups raised more.", created)
+    engine.add_article(3, "Local elections", "Turnout was high.", created)
+    engine.add_comment(10, 3, "Turnout surprised the pollsters", created)
+
+    # Title words weigh more than description words
+    before_flush = engine.search("quantum", "articles")
+    assert ids(before_flush) == [1, 2]
+    engine.flush()
+    assert engine.search("quantum", "articles") == before_flush
+    assert ids(engine.search("quantum startup", "articles")) == [2]
+    assert ids(engine.search("quantum elections", "articles")) == []
+    assert ids(engine.search("turnout", "comments")) == [10]
+    assert engine.search("Local elections", "articles")[0].exact == 1
+
+    # Replacing and removing documents hides the older copies
+    engine.add_article(1, "Classical computers", "Nothing to see.", created)
+    engine.remove_article(3)
+    engine.flush()
+    assert ids(engine.search("quantum", "articles")) == [2]
+    assert ids(engine.search("turnout", "comments")) == []
+    assert engine.stats() == {"segments": 2, "documents": 2, "buffered": 0}
+
+    assert engine.merge(max_segments=1)
+    assert engine.stats() == {"segments": 1, "documents": 2, "buffered": 0}
+    assert len([name for name in tmp_path.iterdir() if name.name.startswith("segment-")]) == 1
+    engine.close()
+
+    # Another process cannot open it while it is open
+    engine.open(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        SearchEngine().open(str(tmp_path))
+    assert ids(engine.search("comp", "articles")) == [1, 2]
+    engine.close()
+
+@pytest.fixture
+def bm25_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_BACKEND", "bm25")
+    search_engine.open(str(tmp_path))
+    yield search_engine
+    search_engine.close()
+
+def search(test_client, **params):
+    response = test_client.get("/api/v1/search", params=params)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    return response.json()
+
+def test_search_endpoint_uses_the_index(test_client, db_connection, test_user, test_article, bm25_backend):
+    # The author moderates their own articles here
+    test_client.post("/api/v1/auth/register", json=test_user)
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE users SET role = 'moderator' WHERE username = %s", (test_user["username"],))
+    db_connection.commit()
+    login_data = {"username": test_user["username"], "password": test_user["password"], "grant_type": "password"}
+    token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    article_ids = []
+    for title, description in (
+        ("Quantum computers break a record", "Researchers report a new milestone."),
+        ("A record year for chips", "Quantum computing startups raised more than ever."),
+    ):
+        article = dict(test_article, title=title, description=description)
+        article_ids.append(test_client.post("/api/v1/articles", json=article, headers=headers).json()["article_id"])
+    # Pending articles are not searchable
+    assert search(test_client, q="quantum", type="articles")["total"] == 0
+
+    test_client.post(
+        "/api/v1/admin/moderation/decisions",
+        json={"decisions": [{"article_id": article_id, "action": "approve"} for article_id in article_ids]},
+        headers=headers
+    )
+    comment_id = test_client.post(
+        "/api/v1/comments", json={"article_id": article_ids[0], "text": "Quantum supremacy at last"}, headers=headers
+    ).json()["comment_id"]
+
+    data = search(test_client, q="quantum", type="articles")
+    assert data["total"] == 2
+    assert [r["article_id"] for r in data["results"]] == article_ids
+    assert "<mark>Quantum</mark>" in data["results"][0]["highlight"]
+    assert [r["article_id"] for r in search(test_client, q="quantum", type="articles", page=2, limit=1)["results"]] == [
+        article_ids[1]
+    ]
+
+    def key(result):
+        return result["result_type"], result[f"{result['result_type']}_id"]
+
+    everything = search(test_client, q="quantum")
+    assert sorted(map(key, everything["results"])) == [
+        ("article", article_ids[0]), ("article", article_ids[1]), ("comment", comment_id)
+    ]
+    mixed = search(test_client, q="quantum", limit=2)
+    assert mixed["total"] == 3
+    walked = mixed["results"] + search(test_client, q="quantum", limit=2, cursor=mixed["next_cursor"])["results"]
+    assert list(map(key, walked)) == list(map(key, everything["results"]))
+
+    # Filtered searches stay on Postgres
+    assert search(test_client, q="quantum", type="articles", tag="pytest")["total"] == 2
+
+    # Deletions leave the index as they commit
+    test_client.delete(f"/api/v1/comments/{comment_id}", headers=headers)
+    test_client.delete(f"/api/v1/articles/{article_ids[0]}", headers=headers)
+    assert search(test_client, q="quantum", type="all")["total"] == 1
+
+    # Writes made elsewhere are picked up by the sync
+    cursor.execute("UPDATE articles SET title = 'Solar chips', moderated_at = CURRENT_TIMESTAMP")
+    db_connection.commit()
+    cursor.close()
+    assert search(test_client, q="solar", type="articles")["total"] == 0
+    bm25_backend.sync(db_connection)
+    assert [r["article_id"] for r in search(test_client, q="solar chip", type="articles")["results"]] == [
+        article_ids[1]
+    ]
+
+def test_stale_hits_are_not_counted_and_removals_survive_a_restart(test_client, db_connection, bm25_backend, tmp_path):
+    # Indexed, but not in the database (deleted by another process)
+    missing = 2 ** 31 - 1
+    bm25_backend.add_article(missing, "Quantum gravity", "Nothing left.", datetime(2024, 1, 1))
+    bm25_backend.flush()
+    assert ids(bm25_backend.search("quantum", "articles")) == [missing]
+    data = search(test_client, q="quantum", type="articles")
+    assert data["total"] == 0
+    assert data["results"] == []
+
+    bm25_backend.refresh_articles(db_connection, [missing])
+    bm25_backend.close()
+    bm25_backend.open(str(tmp_path))
+    assert ids(bm25_backend.search("quantum", "articles")) == []
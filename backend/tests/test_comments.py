@@ -0,0 +1,395 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import status
+
+from app.api.endpoints.comments import COMMENT_VOTE_STATEMENT
+from app.api.pagination import decode_cursor
+from app.core.config import settings
+from app.services.bm25 import search_engine
+from app.services.comment_cache import CommentPageCache, comment_cache_requests
+from app.services.comment_paths import backfill_comment_paths
+from app.services.comments import build_comment_tree
+from app.services.counters import fold_counter_shards
+from app.services.reconcile import reconcile_counters
+
+@pytest.fixture
+def commenters(test_client, db_connection, test_user, test_article):
+    """An approved article and three users with auth headers"""
+    headers = []
+    for i in range(3):
+        user = dict(test_user, username=f"{test_user['username']}{i}", email=f"commenter{i}@example.com")
+        test_client.post("/api/v1/auth/register", json=user)
+        login_data = {"username": user["username"], "password": user["password"], "grant_type": "password"}
+        token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+        headers.append({"Authorization": f"Bearer {token}"})
+
+    article_id = test_client.post("/api/v1/articles", json=test_article, headers=headers[0]).json()["article_id"]
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved' WHERE article_id = %s", (article_id,))
+    db_connection.commit()
+    cursor.close()
+    return article_id, headers
+
+def post_comment(test_client, article_id, headers, text="A comment", parent_comment_id=None):
+    response = test_client.post(
+        "/api/v1/comments",
+        json={"article_id": article_id, "text": text, "parent_comment_id": parent_comment_id},
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.json()["comment_id"]
+
+def test_comment_vote_updates_counters(test_client, commenters):
+    """Votes, vote changes and removals keep comment counters in step"""
+    article_id, headers = commenters
+    comment_id = post_comment(test_client, article_id, headers[0])
+    url = f"/api/v1/comments/{comment_id}/vote"
+
+    data = test_client.post(url, json={"vote_type": "upvote"}, headers=headers[1]).json()
+    assert (data["upvotes"], data["downvotes"], data["user_vote"]) == (1, 0, "upvote")
+
+    # Repeating a vote changes nothing
+    data = test_client.post(url, json={"vote_type": "upvote"}, headers=headers[1]).json()
+    assert (data["upvotes"], data["previous_vote"]) == (1, "upvote")
+
+    data = test_client.post(url, json={"vote_type": "downvote"}, headers=headers[1]).json()
+    assert (data["upvotes"], data["downvotes"], data["score"]) == (0, 1, -1)
+
+    data = test_client.post(url, json={"vote_type": "none"}, headers=headers[1]).json()
+    assert (data["upvotes"], data["downvotes"], data["user_vote"]) == (0, 0, None)
+
+    response = test_client.post(url, json={"vote_type": "sideways"}, headers=headers[1])
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = test_client.post("/api/v1/comments/999999/vote", json={"vote_type": "upvote"}, headers=headers[1])
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_concurrent_first_comment_votes_count_once(test_client, db_connection, connect_test_db, commenters):
+    """The same first vote on a comment sent twice at once is counted once"""
+    article_id, headers = commenters
+    comment_id = post_comment(test_client, article_id, headers[0])
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT user_id FROM users WHERE username = 'testuser1'")
+    user_id = cursor.fetchone()["user_id"]
+    db_connection.commit()
+    params = {"comment_id": comment_id, "user_id": user_id, "vote_type": "upvote", "shard": 0}
+
+    def vote():
+        conn = connect_test_db()
+        conn.autocommit = True
+        try:
+            conn.cursor().execute(COMMENT_VOTE_STATEMENT, params)
+        finally:
+            conn.close()
+
+    # Hold the vote lock so both requests are waiting when it is released
+    blocker = connect_test_db()
+    blocker.cursor().execute("SELECT pg_advisory_xact_lock(%s, %s)", (user_id, -comment_id))
+    threads = [threading.Thread(target=vote) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+    blocker.rollback()
+    blocker.close()
+    for thread in threads:
+        thread.join()
+
+    cursor.execute("SELECT COALESCE(SUM(upvotes), 0) AS up FROM comment_vote_shards WHERE comment_id = %s", (comment_id,))
+    assert cursor.fetchone()["up"] == 1
+    db_connection.commit()
+    cursor.close()
+
+def test_best_sort_ranks_by_wilson_score(test_client, db_connection, commenters):
+    """`best` prefers confidently liked comments and includes folded counters"""
+    article_id, headers = commenters
+    unvoted = post_comment(test_client, article_id, headers[0], "No votes")
+    liked = post_comment(test_client, article_id, headers[0], "Liked")
+    disputed = post_comment(test_client, article_id, headers[0], "Disputed")
+
+    for voter, comment_id, vote_type in (
+        (1, liked, "upvote"), (2, liked, "upvote"),
+        (1, disputed, "upvote"), (2, disputed, "downvote"),
+    ):
+        response = test_client.post(
+            f"/api/v1/comments/{comment_id}/vote", json={"vote_type": vote_type}, headers=headers[voter]
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    fold_counter_shards(db_connection)
+
+    comments = test_client.get(f"/api/v1/comments/article/{article_id}?sort=best").json()["comments"]
+    assert [c["comment_id"] for c in comments] == [liked, disputed, unvoted]
+    assert [(c["upvotes"], c["downvotes"]) for c in comments] == [(2, 0), (1, 1), (0, 0)]
+
+    # The default order is still newest first
+    comments = test_client.get(f"/api/v1/comments/article/{article_id}").json()["comments"]
+    assert [c["comment_id"] for c in comments] == [disputed, liked, unvoted]
+
+    response = test_client.get(f"/api/v1/comments/article/{article_id}?sort=random")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_article_comment_counts(test_client, db_connection, connect_test_db, test_article, commenters):
+    """Creates and deletes keep comment_count in step; `discussed` sorts by it"""
+    article_id, headers = commenters
+    other_id = test_client.post("/api/v1/articles", json=test_article, headers=headers[1]).json()["article_id"]
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved' WHERE article_id = %s", (other_id,))
+    db_connection.commit()
+    cursor.close()
+
+    root = post_comment(test_client, article_id, headers[0])
+    post_comment(test_client, article_id, headers[1], "Reply", root)
+    deleted = post_comment(test_client, article_id, headers[2])
+    post_comment(test_client, other_id, headers[0])
+    assert test_client.delete(f"/api/v1/comments/{deleted}", headers=headers[2]).status_code == status.HTTP_200_OK
+    response = test_client.delete(f"/api/v1/comments/{deleted}", headers=headers[2])
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def listed(sort):
+        articles = test_client.get(f"/api/v1/articles?sort={sort}&fields=comment_count").json()["articles"]
+        return [(a["article_id"], a["comment_count"]) for a in articles]
+
+    # Pending counts are returned before they are folded
+    assert sorted(listed("new")) == sorted([(article_id, 2), (other_id, 1)])
+    fold_counter_shards(db_connection)
+    assert listed("discussed") == [(article_id, 2), (other_id, 1)]
+
+    results = test_client.get("/api/v1/search?q=&type=articles&fields=comment_count").json()["results"]
+    assert {r["article_id"]: r["comment_count"] for r in results} == {article_id: 2, other_id: 1}
+    assert reconcile_counters(connect_test_db, workers=2, chunk_size=1)["drifted"] == 0
+
+def test_wilson_lower_bound(db_connection):
+    """Many upvotes with a few downvotes outrank a single upvote"""
+    cursor = db_connection.cursor()
+    cursor.execute(
+        """
+        SELECT wilson_lower_bound(0, 0) AS none, wilson_lower_bound(1, 0) AS one,
+               wilson_lower_bound(100, 5) AS many, wilson_lower_bound(0, 10) AS disliked
+        """
+    )
+    scores = cursor.fetchone()
+    cursor.close()
+    assert scores["none"] == 0
+    assert scores["disliked"] == 0
+    assert 0 < scores["one"] < scores["many"] < 1
+
+def test_comment_tree_returns_every_level(test_client, commenters):
+    """Replies nest to any depth, with limits on depth and replies per comment"""
+    article_id, headers = commenters
+    root = post_comment(test_client, article_id, headers[0], "Root")
+    chain = [root]
+    for depth in range(1, 5):
+        chain.append(post_comment(test_client, article_id, headers[depth % 3], f"Depth {depth}", chain[-1]))
+    siblings = [post_comment(test_client, article_id, headers[1], f"Sibling {i}", root) for i in range(2)]
+
+    url = f"/api/v1/comments/article/{article_id}"
+    comments = test_client.get(f"{url}?max_depth=10&max_replies=10").json()["comments"]
+    assert [c["comment_id"] for c in comments] == [root]
+    node = comments[0]
+    assert [r["comment_id"] for r in node["replies"]] == [chain[1]] + siblings
+    assert (node["reply_count"], node["replies_cursor"]) == (3, None)
+    for depth, comment_id in enumerate(chain[1:], start=1):
+        node = node["replies"][0]
+        assert (node["comment_id"], node["depth"]) == (comment_id, depth)
+    assert (node["replies"], node["reply_count"]) == ([], 0)
+
+    # Cut-off replies are still counted on their parent
+    comments = test_client.get(f"{url}?max_depth=2&max_replies=1").json()["comments"]
+    first = comments[0]["replies"]
+    assert [r["comment_id"] for r in first] == [chain[1]]
+    assert comments[0]["reply_count"] == 3
+    assert first[0]["replies"][0]["replies"] == []
+    assert first[0]["replies"][0]["reply_count"] == 1
+
+    # The rest of the replies load from the comment's replies cursor
+    replies_cursor = comments[0]["replies_cursor"]
+    data = test_client.get(
+        f"/api/v1/comments/{root}/replies", params={"cursor": replies_cursor, "limit": 1, "max_depth": 0}
+    ).json()
+    assert [r["comment_id"] for r in data["comments"]] == [siblings[0]]
+    data = test_client.get(
+        f"/api/v1/comments/{root}/replies", params={"cursor": data["next_cursor"], "max_depth": 0}
+    ).json()
+    assert ([r["comment_id"] for r in data["comments"]], data["next_cursor"]) == ([siblings[1]], None)
+
+    response = test_client.get("/api/v1/comments/999999/replies")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    # Editing a reply returns its own subtree
+    response = test_client.put(f"/api/v1/comments/{chain[2]}", json={"text": "Edited"}, headers=headers[2])
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["text"] == "Edited"
+    assert data["replies"][0]["comment_id"] == chain[3]
+    assert data["replies"][0]["replies"][0]["comment_id"] == chain[4]
+
+@pytest.mark.parametrize("sort", ["newest", "oldest", "best"])
+def test_threads_are_keyset_paged(test_client, commenters, sort):
+    """Pages cover every top-level comment once, in sort order"""
+    article_id, headers = commenters
+    posted = [post_comment(test_client, article_id, headers[i % 3], f"Thread {i}") for i in range(5)]
+    for comment_id in posted[:2]:
+        test_client.post(f"/api/v1/comments/{comment_id}/vote", json={"vote_type": "upvote"}, headers=headers[1])
+
+    url = f"/api/v1/comments/article/{article_id}"
+    everything = test_client.get(url, params={"sort": sort}).json()
+    assert everything["next_cursor"] is None
+
+    seen = []
+    params = {"sort": sort, "limit": 2}
+    while True:
+        page = test_client.get(url, params=params).json()
+        seen += [c["comment_id"] for c in page["comments"]]
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+    assert seen == [c["comment_id"] for c in everything["comments"]]
+    assert sorted(seen) == posted
+
+    response = test_client.get(url, params={"sort": sort, "cursor": "garbage"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_article_embeds_first_comment_page(test_client, commenters, monkeypatch):
+    """get_article embeds one page of comments and a cursor for the rest"""
+    monkeypatch.setattr(settings, "COMMENT_PAGE_SIZE", 2)
+    article_id, headers = commenters
+    posted = [post_comment(test_client, article_id, headers[0], f"Thread {i}") for i in range(3)]
+
+    article = test_client.get(f"/api/v1/articles/{article_id}").json()
+    assert [c["comment_id"] for c in article["comments"]] == posted[:0:-1]
+
+    page = test_client.get(
+        f"/api/v1/comments/article/{article_id}", params={"cursor": article["comments_cursor"]}
+    ).json()
+    assert ([c["comment_id"] for c in page["comments"]], page["next_cursor"]) == ([posted[0]], None)
+
+def comment_paths(db_connection, article_id):
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT comment_id, path FROM comments WHERE article_id = %s ORDER BY comment_id", (article_id,))
+    paths = {row["comment_id"]: row["path"] for row in cursor.fetchall()}
+    db_connection.commit()
+    cursor.close()
+    return paths
+
+def test_comment_paths_are_set_and_backfilled(test_client, db_connection, connect_test_db, commenters):
+    """New comments get their path on insert; missing paths are backfilled"""
+    article_id, headers = commenters
+    root = post_comment(test_client, article_id, headers[0], "Root")
+    reply = post_comment(test_client, article_id, headers[1], "Reply", root)
+    nested = post_comment(test_client, article_id, headers[2], "Nested", reply)
+    other = post_comment(test_client, article_id, headers[1], "Other reply", root)
+    expected = {root: [root], reply: [root, reply], nested: [root, reply, nested], other: [root, other]}
+    assert comment_paths(db_connection, article_id) == expected
+
+    # Comments from before the path column, and a reply posted since
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE comments SET path = NULL WHERE article_id = %s", (article_id,))
+    db_connection.commit()
+    late = post_comment(test_client, article_id, headers[0], "Late", nested)
+    assert comment_paths(db_connection, article_id)[late] is None
+    cursor.close()
+
+    report = backfill_comment_paths(connect_test_db, workers=2, chunk_size=2)
+    assert report == {"filled": 5, "remaining": 0}
+    expected[late] = [root, reply, nested, late]
+    assert comment_paths(db_connection, article_id) == expected
+
+def test_comment_pages_are_cached_until_comments_change(test_client, commenters):
+    """Repeated reads hit the cache; creates, edits and deletes invalidate it"""
+    article_id, headers = commenters
+    url = f"/api/v1/comments/article/{article_id}"
+
+    def texts():
+        return [c["text"] for c in test_client.get(url).json()["comments"]]
+
+    first = post_comment(test_client, article_id, headers[0], "First")
+    assert texts() == ["First"]
+    hits = comment_cache_requests.value(result="hit")
+    assert texts() == ["First"]
+    assert comment_cache_requests.value(result="hit") == hits + 1
+
+    second = post_comment(test_client, article_id, headers[1], "Second")
+    assert texts() == ["Second", "First"]
+
+    response = test_client.put(f"/api/v1/comments/{first}", json={"text": "Edited"}, headers=headers[0])
+    assert response.status_code == status.HTTP_200_OK
+    assert texts() == ["Second", "Edited"]
+
+    assert test_client.delete(f"/api/v1/comments/{second}", headers=headers[1]).status_code == status.HTTP_200_OK
+    assert texts() == ["Edited"]
+
+    # Errors are not cached
+    assert test_client.get(f"{url}?cursor=bogus").status_code == status.HTTP_400_BAD_REQUEST
+    assert test_client.get(f"{url}?cursor=bogus").status_code == status.HTTP_400_BAD_REQUEST
+
+def test_comment_page_cache_builds_once_per_version():
+    """Concurrent misses share one build; a new version or a failure rebuilds"""
+    cache = CommentPageCache(max_bytes=10, ttl=60, max_articles=10)
+    builds = []
+
+    def build():
+        builds.append(threading.get_ident())
+        time.sleep(0.05)
+        return b"page"
+
+    def fail():
+        raise RuntimeError("database down")
+
+    async def scenario():
+        pages = await asyncio.gather(*(cache.get_or_build(1, "newest", build) for _ in range(50)))
+        assert pages == [b"page"] * 50
+        assert len(builds) == 1
+        assert await cache.get_or_build(1, "newest", build) == b"page"
+        assert len(builds) == 1
+
+        cache.invalidate(1)
+        assert await cache.get_or_build(1, "newest", build) == b"page"
+        assert len(builds) == 2
+
+        with pytest.raises(RuntimeError):
+            await asyncio.gather(cache.get_or_build(2, "newest", fail), cache.get_or_build(2, "newest", fail))
+        assert await cache.get_or_build(2, "newest", build) == b"page"
+
+        # Pages are bounded by total size: the two oldest were evicted
+        await cache.get_or_build(3, "newest", build)
+        assert cache.pages.size_bytes == 8
+
+    asyncio.run(scenario())
+
+def test_build_comment_tree_nests_in_one_pass():
+    rows = [
+        {"comment_id": 1, "parent_comment_id": None, "depth": 0, "reply_count": 3},
+        {"comment_id": 2, "parent_comment_id": None, "depth": 0, "reply_count": 0},
+        {"comment_id": 3, "parent_comment_id": 1, "depth": 1, "reply_count": 1},
+        {"comment_id": 4, "parent_comment_id": 1, "depth": 1, "reply_count": 1},
+        {"comment_id": 5, "parent_comment_id": 4, "depth": 2, "reply_count": 0},
+        {"comment_id": 6, "parent_comment_id": 9, "depth": 2, "reply_count": 0},
+    ]
+    for row in rows:
+        row["sort_key"] = float(row["comment_id"])
+    tree = build_comment_tree(rows)
+    assert [c["comment_id"] for c in tree] == [1, 2]
+    assert [c["comment_id"] for c in tree[0]["replies"]] == [3, 4]
+    assert tree[0]["replies"][1]["replies"][0]["comment_id"] == 5
+
+    # Comment 1 shows two of its three replies; 3 shows none of its one
+    assert decode_cursor(tree[0]["replies_cursor"], float) == (4.0, 4)
+    assert tree[0]["replies"][0]["replies_cursor"] is None
+    assert tree[1]["replies_cursor"] is None
+
+def test_failed_index_refresh_keeps_the_comment(test_client, db_connection, commenters, monkeypatch):
+    """The comment has committed, so a failed search index refresh does not fail the request"""
+    def failing_refresh(conn, comment_ids):
+        conn.cursor().execute("SELECT 1 / 0")
+    monkeypatch.setattr(search_engine, "refresh_comments", failing_refresh)
+
+    article_id, headers = commenters
+    comment_id = post_comment(test_client, article_id, headers[1])
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT COUNT(*) AS count FROM comments WHERE comment_id = %s", (comment_id,))
+    assert cursor.fetchone()["count"] == 1
+    db_connection.commit()
+    cursor.close()
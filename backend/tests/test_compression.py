@@ -0,0 +1,60 @@
+import gzip
+
+import pytest
+from fastapi import status
+
+from app.core.cache import response_cache
+from app.core.compression import cache_key, negotiate_encoding
+
+@pytest.fixture
+def approved_articles(test_client, db_connection, test_user, test_article):
+    """Submit and approve enough articles to pass the compression threshold"""
+    test_client.post("/api/v1/auth/register", json=test_user)
+    login_data = {
+        "username": test_user["username"],
+        "password": test_user["password"],
+        "grant_type": "password"
+    }
+    token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for i in range(10):
+        article = dict(test_article, title=f"Compressed Article {i}")
+        response = test_client.post("/api/v1/articles", json=article, headers=headers)
+        assert response.status_code == status.HTTP_201_CREATED
+
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved'")
+    db_connection.commit()
+    cursor.close()
+
+def test_negotiate_encoding():
+    """Accept-Encoding q-values choose between brotli, gzip and identity"""
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("identity") is None
+
+def test_small_responses_not_compressed(test_client):
+    """Bodies under the size threshold are sent uncompressed"""
+    response = test_client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert "content-encoding" not in response.headers
+
+def test_article_list_cached_precompressed(test_client, approved_articles):
+    """Anonymous list responses are compressed and served from the cache"""
+    response = test_client.get("/api/v1/articles?limit=10", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert len(response.json()["articles"]) == 10
+
+    entry = response_cache.get(cache_key("/api/v1/articles", "limit=10"))
+    assert entry is not None
+    assert gzip.decompress(entry.bodies["gzip"]) == entry.bodies[None]
+
+    # Served from the cache, in whichever encoding the client accepts
+    response = test_client.get("/api/v1/articles?limit=10", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.content == entry.bodies[None]
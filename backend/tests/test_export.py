@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi import status
+
+from app.db.session import get_connection_factory
+from app.main import app
+from export_data import resume_point
+
+@pytest.fixture
+def admin_headers(test_client, db_connection, test_user):
+    """Register a user, promote them to admin and return auth headers"""
+    response = test_client.post("/api/v1/auth/register", json=test_user)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE users SET role = 'admin' WHERE username = %s", (test_user["username"],))
+    db_connection.commit()
+    cursor.close()
+
+    login_data = {
+        "username": test_user["username"],
+        "password": test_user["password"],
+        "grant_type": "password"
+    }
+    response = test_client.post("/api/v1/auth/login", data=login_data)
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def export_client(test_client, connect_test_db):
+    """Point the export stream's own connections at the test database"""
+    app.dependency_overrides[get_connection_factory] = lambda: connect_test_db
+    return test_client
+
+@pytest.fixture
+def approved_article_ids(export_client, db_connection, test_article, admin_headers):
+    """Submit and approve three articles"""
+    article_ids = []
+    for i in range(3):
+        article = dict(test_article, title=f"Export Article {i}")
+        response = export_client.post("/api/v1/articles", json=article, headers=admin_headers)
+        assert response.status_code == status.HTTP_201_CREATED
+        article_ids.append(response.json()["article_id"])
+
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved' WHERE article_id = ANY(%s)", (article_ids,))
+    db_connection.commit()
+    cursor.close()
+    return article_ids
+
+def test_export_ndjson_resumes_after_id(export_client, admin_headers, approved_article_ids):
+    """NDJSON export streams one article per line and resumes from an id"""
+    response = export_client.get("/api/v1/admin/export/articles", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["article_id"] for row in rows] == approved_article_ids
+    assert sorted(rows[0]["tags"]) == ["pytest", "test"]
+
+    response = export_client.get(
+        f"/api/v1/admin/export/articles?after={approved_article_ids[0]}",
+        headers=admin_headers
+    )
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["article_id"] for row in rows] == approved_article_ids[1:]
+
+def test_export_csv(export_client, admin_headers, approved_article_ids):
+    """CSV export has a header row followed by one row per article"""
+    response = export_client.get("/api/v1/admin/export/articles?format=csv&limit=2", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][0] == "article_id"
+    assert [int(row[0]) for row in rows[1:]] == approved_article_ids[:2]
+
+def test_export_requires_admin(export_client, test_user):
+    """Non-admin users cannot export"""
+    response = export_client.post("/api/v1/auth/register", json=test_user)
+    login_data = {
+        "username": test_user["username"],
+        "password": test_user["password"],
+        "grant_type": "password"
+    }
+    token = export_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+    response = export_client.get(
+        "/api/v1/admin/export/articles",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+def test_resume_point_skips_partly_written_rows(tmp_path):
+    """Resuming finds the last complete row and where it ends"""
+    ndjson = tmp_path / "articles.ndjson"
+    complete = b'{"article_id": 1, "title": "a"}\n{"article_id": 2, "title": "b\\nc"}\n'
+    ndjson.write_bytes(complete + b'{"article_id": 3, "ti')
+    assert resume_point(str(ndjson), "articles", "ndjson") == (2, len(complete))
+    ndjson.write_bytes(b'{"article_id": 3, "ti')
+    assert resume_point(str(ndjson), "articles", "ndjson") == (0, 0)
+
+    # Quoted fields may span lines, and a line of one may look like a row
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["article_id", "description"])
+    writer.writerow([1, "one"])
+    writer.writerow([2, 'Two lines,\n7,"quoted"'])
+    complete = buffer.getvalue().encode()
+    path = tmp_path / "articles.csv"
+    path.write_bytes(complete + b'3,"Cut off\n99,')
+    assert resume_point(str(path), "articles", "csv") == (2, len(complete))
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from fastapi import status
+
+from app.services.live import ArticleEventBroadcaster, Subscription
+
+@pytest.fixture
+def live_article(test_client, db_connection, test_user, test_article):
+    """An approved article and auth headers for two users"""
+    headers = []
+    for i in range(2):
+        user = dict(test_user, username=f"{test_user['username']}{i}", email=f"live{i}@example.com")
+        test_client.post("/api/v1/auth/register", json=user)
+        login_data = {"username": user["username"], "password": user["password"], "grant_type": "password"}
+        token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+        headers.append({"Authorization": f"Bearer {token}"})
+
+    article_id = test_client.post("/api/v1/articles", json=test_article, headers=headers[0]).json()["article_id"]
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved' WHERE article_id = %s", (article_id,))
+    db_connection.commit()
+    cursor.close()
+    return article_id, headers
+
+def test_subscription_coalesces_events():
+    """Vote events keep the latest counts; comment events are merged"""
+    async def scenario():
+        subscription = Subscription([1], interval=0)
+        subscription.push({"type": "votes", "article_id": 1, "upvotes": 1, "downvotes": 0})
+        subscription.push({"type": "votes", "article_id": 1, "upvotes": 2, "downvotes": 1})
+        subscription.push({"type": "comments", "article_id": 1, "count": 1, "comment_ids": [7]})
+        subscription.push({"type": "comments", "article_id": 1, "count": 1, "comment_ids": [8]})
+        batch = await subscription.next_batch(timeout=1)
+        assert batch == [
+            {"type": "votes", "article_id": 1, "upvotes": 2, "downvotes": 1},
+            {"type": "comments", "article_id": 1, "count": 2, "comment_ids": [7, 8]},
+        ]
+        assert await subscription.next_batch(timeout=0.01) == []
+
+    asyncio.run(scenario())
+
+def test_votes_and_comments_reach_subscribers(test_client, connect_test_db, live_article):
+    """Writes publish events that the shared listener fans out to subscribers"""
+    article_id, headers = live_article
+
+    async def scenario():
+        broadcaster = ArticleEventBroadcaster(connect_test_db, interval=0.05, max_subscribers=2)
+        watching = await broadcaster.subscribe([article_id])
+        elsewhere = await broadcaster.subscribe([article_id + 1])
+        try:
+            for voter in headers:
+                response = test_client.post(
+                    f"/api/v1/votes/{article_id}/vote", json={"vote_type": "upvote"}, headers=voter
+                )
+                assert response.status_code == status.HTTP_200_OK
+            comment_id = test_client.post(
+                "/api/v1/comments", json={"article_id": article_id, "text": "Live"}, headers=headers[1]
+            ).json()["comment_id"]
+
+            events = []
+            while len(events) < 2:
+                batch = await watching.next_batch(timeout=5)
+                assert batch, "timed out waiting for events"
+                events += batch
+            by_type = {event["type"]: event for event in events}
+            assert by_type["votes"] == {"type": "votes", "article_id": article_id, "upvotes": 2, "downvotes": 0}
+            assert by_type["comments"]["comment_ids"] == [comment_id]
+
+            assert await elsewhere.next_batch(timeout=0.1) == []
+
+            with pytest.raises(RuntimeError):
+                await broadcaster.subscribe([article_id])
+        finally:
+            broadcaster.unsubscribe(watching)
+            broadcaster.unsubscribe(elsewhere)
+            await broadcaster.stop()
+        assert broadcaster.subscriber_count == 0
+
+    asyncio.run(scenario())
+
+def test_stream_rejects_invalid_article_ids(test_client):
+    response = test_client.get("/api/v1/live/articles?article_ids=1,x")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    ids = ",".join(str(i) for i in range(1, 102))
+    response = test_client.get(f"/api/v1/live/articles?article_ids={ids}")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,113 @@
+import pytest
+from fastapi import status
+
+def _login(test_client, username, password):
+    login_data = {
+        "username": username,
+        "password": password,
+        "grant_type": "password"
+    }
+    response = test_client.post("/api/v1/auth/login", data=login_data)
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def author_headers(test_client, test_user):
+    """Register the article author and return auth headers"""
+    response = test_client.post("/api/v1/auth/register", json=test_user)
+    assert response.status_code == status.HTTP_201_CREATED
+    return _login(test_client, test_user["username"], test_user["password"])
+
+@pytest.fixture
+def moderator_headers(test_client, db_connection):
+    """Register a user, promote them to moderator and return auth headers"""
+    moderator = {
+        "username": "moderator",
+        "email": "moderator@example.com",
+        "password": "moderatorpassword123"
+    }
+    response = test_client.post("/api/v1/auth/register", json=moderator)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE users SET role = 'moderator' WHERE username = %s", (moderator["username"],))
+    db_connection.commit()
+    cursor.close()
+
+    return _login(test_client, moderator["username"], moderator["password"])
+
+@pytest.fixture
+def pending_article_ids(test_client, test_article, author_headers):
+    """Submit three articles, which all start as pending"""
+    article_ids = []
+    for i in range(3):
+        article = dict(test_article, title=f"Pending Article {i}")
+        response = test_client.post("/api/v1/articles", json=article, headers=author_headers)
+        assert response.status_code == status.HTTP_201_CREATED
+        article_ids.append(response.json()["article_id"])
+    return article_ids
+
+def test_claim_requires_moderator(test_client, author_headers):
+    """Regular users cannot claim from the moderation queue"""
+    response = test_client.post("/api/v1/admin/moderation/claim", json={"limit": 5}, headers=author_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+def test_claim_returns_disjoint_batches(test_client, moderator_headers, pending_article_ids):
+    """A second claim does not hand out articles that are already claimed"""
+    response = test_client.post("/api/v1/admin/moderation/claim", json={"limit": 2}, headers=moderator_headers)
+    assert response.status_code == status.HTTP_200_OK
+    first = [a["article_id"] for a in response.json()["claimed"]]
+    assert first == pending_article_ids[:2]
+
+    response = test_client.post("/api/v1/admin/moderation/claim", json={"limit": 2}, headers=moderator_headers)
+    assert response.status_code == status.HTTP_200_OK
+    second = [a["article_id"] for a in response.json()["claimed"]]
+    assert second == pending_article_ids[2:]
+
+def test_bulk_decisions(test_client, db_connection, moderator_headers, pending_article_ids):
+    """Approve and reject several articles in one call and log each decision"""
+    decisions = [
+        {"article_id": pending_article_ids[0], "action": "approve"},
+        {"article_id": pending_article_ids[1], "action": "reject", "reason": "Duplicate"},
+    ]
+    response = test_client.post(
+        "/api/v1/admin/moderation/decisions",
+        json={"decisions": decisions},
+        headers=moderator_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert {a["article_id"]: a["status"] for a in data["processed"]} == {
+        pending_article_ids[0]: "approved",
+        pending_article_ids[1]: "rejected",
+    }
+    assert data["skipped"] == []
+
+    cursor = db_connection.cursor()
+    cursor.execute(
+        "SELECT action, entity_id FROM moderation_log WHERE entity_id = ANY(%s) ORDER BY entity_id",
+        (pending_article_ids,)
+    )
+    assert [(row["action"], row["entity_id"]) for row in cursor.fetchall()] == [
+        ("approve_article", pending_article_ids[0]),
+        ("reject_article", pending_article_ids[1]),
+    ]
+    cursor.close()
+
+    # Already-decided articles are skipped on a second pass
+    response = test_client.post(
+        "/api/v1/admin/moderation/decisions",
+        json={"decisions": decisions[:1]},
+        headers=moderator_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["skipped"] == [pending_article_ids[0]]
+
+def test_invalid_decision_action(test_client, moderator_headers, pending_article_ids):
+    """Unknown actions are rejected before touching the database"""
+    response = test_client.post(
+        "/api/v1/admin/moderation/decisions",
+        json={"decisions": [{"article_id": pending_article_ids[0], "action": "feature"}]},
+        headers=moderator_headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,186 @@
+import pytest
+from fastapi import status
+
+from app.services.notifications import NotificationBuffer, notification_buffer, render_message
+
+@pytest.fixture
+def voters(test_client, db_connection, test_user, test_article):
+    """An author with an approved article plus three voters"""
+    headers = []
+    for i in range(4):
+        user = dict(test_user, username=f"{test_user['username']}{i}", email=f"notify{i}@example.com")
+        test_client.post("/api/v1/auth/register", json=user)
+        login_data = {"username": user["username"], "password": user["password"], "grant_type": "password"}
+        token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+        headers.append({"Authorization": f"Bearer {token}"})
+
+    article_id = test_client.post("/api/v1/articles", json=test_article, headers=headers[0]).json()["article_id"]
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved' WHERE article_id = %s", (article_id,))
+    db_connection.commit()
+    cursor.close()
+    return article_id, headers
+
+def upvote(test_client, article_id, headers):
+    response = test_client.post(f"/api/v1/votes/{article_id}/vote", json={"vote_type": "upvote"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+def notifications(db_connection):
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT message, actor_count, is_read FROM notifications ORDER BY notification_id")
+    rows = [dict(row) for row in cursor.fetchall()]
+    db_connection.commit()
+    cursor.close()
+    return rows
+
+def test_render_message():
+    assert render_message("vote", "ann", 1) == "Your article received an upvote from ann"
+    assert render_message("vote", "ann", 2) == "ann and 1 other upvoted your article"
+    assert render_message("vote", "ann", 342) == "ann and 341 others upvoted your article"
+
+def test_upvotes_are_buffered_and_coalesced(test_client, db_connection, voters):
+    """Upvotes write nothing until a flush, which writes one row per article"""
+    article_id, headers = voters
+    upvote(test_client, article_id, headers[1])
+    upvote(test_client, article_id, headers[2])
+    # The author's own vote does not notify them
+    upvote(test_client, article_id, headers[0])
+    assert notifications(db_connection) == []
+
+    assert notification_buffer.flush(db_connection) == 1
+    assert notifications(db_connection) == [
+        {"message": "testuser2 and 1 other upvoted your article", "actor_count": 2, "is_read": False},
+    ]
+
+    # Later batches coalesce into the same unread row
+    upvote(test_client, article_id, headers[3])
+    notification_buffer.flush(db_connection)
+    assert notifications(db_connection) == [
+        {"message": "testuser3 and 2 others upvoted your article", "actor_count": 3, "is_read": False},
+    ]
+
+def test_read_notification_starts_a_new_row(db_connection, voters):
+    """Once the unread row is read, the next event gets a fresh notification"""
+    article_id, _ = voters
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT user_id FROM users ORDER BY user_id")
+    author_id, actor_id = [row["user_id"] for row in cursor.fetchall()][:2]
+    db_connection.commit()
+
+    buffer = NotificationBuffer()
+    buffer.add(author_id, "vote", article_id, actor_id, "ann")
+    buffer.flush(db_connection)
+    cursor.execute("UPDATE notifications SET is_read = TRUE")
+    db_connection.commit()
+    cursor.close()
+
+    buffer.add(author_id, "vote", article_id, actor_id, "bob")
+    buffer.flush(db_connection)
+    assert [(n["message"], n["is_read"]) for n in notifications(db_connection)] == [
+        ("Your article received an upvote from ann", True),
+        ("Your article received an upvote from bob", False),
+    ]
+
+def test_failed_flush_keeps_events(connect_test_db, voters):
+    """Events from a failed flush are written by the next one"""
+    article_id, _ = voters
+    buffer = NotificationBuffer()
+    buffer.add(999999, "vote", article_id, None, "ann")  # Unknown recipient
+
+    conn = connect_test_db()
+    try:
+        with pytest.raises(Exception):
+            buffer.flush(conn)
+        assert buffer._pending
+    finally:
+        conn.close()
+
+def test_buffer_drops_events_when_full():
+    buffer = NotificationBuffer(max_keys=1)
+    buffer.add(1, "vote", 1, 2, "ann")
+    buffer.add(1, "vote", 1, 3, "bob")  # Same key, coalesced
+    buffer.add(1, "vote", 2, 3, "bob")  # New key, dropped
+    assert buffer._pending == {(1, "vote", 1): [2, 3, "bob"]}
+
+@pytest.fixture
+def inbox(db_connection, voters):
+    """Five unread notifications for the author, on different articles"""
+    _, headers = voters
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT user_id FROM users ORDER BY user_id LIMIT 1")
+    author_id = cursor.fetchone()["user_id"]
+    cursor.execute(
+        """
+        INSERT INTO notifications (user_id, type, entity_id, message, created_at)
+        SELECT %s, 'vote', i, 'Notification ' || i, TIMESTAMP '2024-01-01' + i * INTERVAL '1 minute'
+        FROM generate_series(1, 5) AS i
+        """,
+        (author_id,)
+    )
+    db_connection.commit()
+    cursor.close()
+    return headers[0]
+
+def unread_counter(db_connection):
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT unread FROM notification_counts")
+    counts = [row["unread"] for row in cursor.fetchall()]
+    db_connection.commit()
+    cursor.close()
+    return counts
+
+def test_list_notifications_with_keyset_paging(test_client, inbox):
+    """Pages follow next_cursor, newest first, without gaps or repeats"""
+    response = test_client.get("/api/v1/notifications?limit=2", headers=inbox)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [n["entity_id"] for n in data["notifications"]] == [5, 4]
+    assert data["unread_count"] == 5
+
+    seen = [n["entity_id"] for n in data["notifications"]]
+    while data["next_cursor"]:
+        data = test_client.get(
+            f"/api/v1/notifications?limit=2&cursor={data['next_cursor']}", headers=inbox
+        ).json()
+        seen += [n["entity_id"] for n in data["notifications"]]
+    assert seen == [5, 4, 3, 2, 1]
+
+    response = test_client.get("/api/v1/notifications?cursor=not-a-cursor", headers=inbox)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_mark_read_updates_counts(test_client, db_connection, inbox):
+    """Mark-read and mark-all-read keep the unread counter and cache in step"""
+    assert unread_counter(db_connection) == [5]
+    notifications = test_client.get("/api/v1/notifications", headers=inbox).json()["notifications"]
+
+    response = test_client.post(f"/api/v1/notifications/{notifications[0]['notification_id']}/read", headers=inbox)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["is_read"] is True
+    assert test_client.get("/api/v1/notifications/unread-count", headers=inbox).json() == {"unread_count": 4}
+
+    data = test_client.get("/api/v1/notifications?unread_only=true", headers=inbox).json()
+    assert len(data["notifications"]) == 4
+
+    response = test_client.post("/api/v1/notifications/read-all", headers=inbox)
+    assert response.json() == {"updated": 4, "unread_count": 0}
+    assert unread_counter(db_connection) == [0]
+    assert test_client.get("/api/v1/notifications/unread-count", headers=inbox).json() == {"unread_count": 0}
+
+    response = test_client.post("/api/v1/notifications/999999/read", headers=inbox)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_unread_counter_follows_batch_writes(test_client, db_connection, voters):
+    """Coalesced upserts and deletes adjust the counter through the triggers"""
+    article_id, headers = voters
+    upvote(test_client, article_id, headers[1])
+    notification_buffer.flush(db_connection)
+    upvote(test_client, article_id, headers[2])
+    notification_buffer.flush(db_connection)
+    # Two events, one unread row
+    assert unread_counter(db_connection) == [1]
+
+    cursor = db_connection.cursor()
+    cursor.execute("DELETE FROM notifications")
+    db_connection.commit()
+    cursor.close()
+    assert unread_counter(db_connection) == [0]
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from fastapi import status
+
+from app.core.ratelimit import InMemoryBackend, Limit, rate_limiter, rate_limit_rejections
+
+def test_limit_parse():
+    """Limits are parsed from count/period strings"""
+    limit = Limit.parse("30/minute")
+    assert limit.capacity == 30
+    assert limit.rate == 0.5
+    with pytest.raises(ValueError):
+        Limit.parse("30/fortnight")
+
+def test_token_bucket_allows_burst_then_rejects():
+    """A bucket allows `capacity` requests, then reports when the next is allowed"""
+    backend = InMemoryBackend()
+    limit = Limit(3, 60)
+
+    async def take_all():
+        return [await backend.take("k", limit) for _ in range(4)]
+
+    results = asyncio.run(take_all())
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert 0 < results[-1][1] <= 20
+
+def test_route_groups():
+    """Requests are matched to the first route group that applies"""
+    assert rate_limiter.match("POST", "/api/v1/votes/12/vote") == "votes"
+    assert rate_limiter.match("POST", "/api/v1/comments") == "comments"
+    assert rate_limiter.match("POST", "/api/v1/auth/login") == "auth"
+    assert rate_limiter.match("PUT", "/api/v1/articles/3") == "writes"
+    assert rate_limiter.match("GET", "/api/v1/articles") is None
+
+def test_rate_limited_requests_rejected(test_client, test_user):
+    """Over-limit requests get a 429 with Retry-After and are counted"""
+    original = rate_limiter.limits["auth"]
+    rate_limiter.limits["auth"] = {"ip": Limit(2, 60)}
+    try:
+        before = rate_limit_rejections.value(group="auth", scope="ip")
+        for _ in range(2):
+            response = test_client.post("/api/v1/auth/login", data={"username": "x", "password": "y"})
+            assert response.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+
+        response = test_client.post("/api/v1/auth/login", data={"username": "x", "password": "y"})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers["retry-after"]) >= 1
+        assert rate_limit_rejections.value(group="auth", scope="ip") == before + 1
+
+        metrics = test_client.get("/metrics").text
+        assert 'echo_rate_limit_rejections_total{group="auth",scope="ip"}' in metrics
+    finally:
+        rate_limiter.limits["auth"] = original
@@ -0,0 +1,75 @@
+import pytest
+from fastapi import status
+
+from app.services.counters import ARTICLE_DOWNVOTES, ARTICLE_UPVOTES
+from app.services.reconcile import reconcile_counters
+
+@pytest.fixture
+def viewed_article(test_client, db_connection, test_user, test_article):
+    """An approved article with one upvote, one downvote and two views"""
+    headers = []
+    for i in range(2):
+        user = dict(test_user, username=f"{test_user['username']}{i}", email=f"rec{i}@example.com")
+        test_client.post("/api/v1/auth/register", json=user)
+        login_data = {"username": user["username"], "password": user["password"], "grant_type": "password"}
+        token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+        headers.append({"Authorization": f"Bearer {token}"})
+
+    article_id = test_client.post("/api/v1/articles", json=test_article, headers=headers[0]).json()["article_id"]
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved' WHERE article_id = %s", (article_id,))
+    db_connection.commit()
+    cursor.close()
+
+    for voter, vote_type in ((0, "upvote"), (1, "downvote")):
+        response = test_client.post(
+            f"/api/v1/votes/{article_id}/vote", json={"vote_type": vote_type}, headers=headers[voter]
+        )
+        assert response.status_code == status.HTTP_200_OK
+    for _ in range(2):
+        assert test_client.get(f"/api/v1/articles/{article_id}").status_code == status.HTTP_200_OK
+    return article_id
+
+def counters(db_connection, article_id):
+    cursor = db_connection.cursor()
+    cursor.execute(
+        f"""
+        SELECT {ARTICLE_UPVOTES} AS upvotes, {ARTICLE_DOWNVOTES} AS downvotes, a.views
+        FROM articles a WHERE a.article_id = %s
+        """,
+        (article_id,)
+    )
+    row = dict(cursor.fetchone())
+    db_connection.commit()
+    cursor.close()
+    return row
+
+def test_consistent_counters_report_no_drift(connect_test_db, viewed_article):
+    """Counters maintained by the API match votes and article_views"""
+    report = reconcile_counters(connect_test_db, workers=2, chunk_size=1)
+    assert report["articles"] == 1
+    assert report["drifted"] == 0
+
+def test_reconcile_reports_and_repairs_drift(db_connection, connect_test_db, viewed_article):
+    """Drift is reported without changes, then corrected with repair"""
+    cursor = db_connection.cursor()
+    cursor.execute(
+        "UPDATE articles SET upvotes = upvotes + 5, views = views - 2 WHERE article_id = %s",
+        (viewed_article,)
+    )
+    db_connection.commit()
+    cursor.close()
+
+    report = reconcile_counters(connect_test_db, workers=2, chunk_size=1)
+    assert report["drifted"] == 1
+    assert report["repaired"] == 0
+    assert (report["upvotes"], report["downvotes"], report["views"]) == (5, 0, 2)
+    assert report["max_drift"] == 5
+    assert counters(db_connection, viewed_article)["upvotes"] == 6
+
+    report = reconcile_counters(connect_test_db, repair=True, workers=2, chunk_size=1)
+    assert report["repaired"] == 1
+    assert counters(db_connection, viewed_article) == {"upvotes": 1, "downvotes": 1, "views": 2}
+
+    # A second pass finds nothing left to fix
+    assert reconcile_counters(connect_test_db, workers=2, chunk_size=1)["drifted"] == 0
@@ -0,0 +1,98 @@
+import pytest
+from fastapi import status
+
+from app.services.counters import USER_REPUTATION
+from app.services.reputation import recompute_reputation, set_reputation_weights
+
+@pytest.fixture
+def voted_article(test_client, db_connection, test_user, test_article):
+    """An approved article by user 0 with an upvote and a downvote from users 1 and 2"""
+    headers = []
+    for i in range(3):
+        user = dict(test_user, username=f"{test_user['username']}{i}", email=f"rep{i}@example.com")
+        test_client.post("/api/v1/auth/register", json=user)
+        login_data = {"username": user["username"], "password": user["password"], "grant_type": "password"}
+        token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+        headers.append({"Authorization": f"Bearer {token}"})
+
+    article_id = test_client.post("/api/v1/articles", json=test_article, headers=headers[0]).json()["article_id"]
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved' WHERE article_id = %s", (article_id,))
+    db_connection.commit()
+
+    for voter, vote_type in ((1, "upvote"), (2, "upvote"), (2, "downvote")):
+        response = test_client.post(
+            f"/api/v1/votes/{article_id}/vote", json={"vote_type": vote_type}, headers=headers[voter]
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    cursor.execute("SELECT submitted_by FROM articles WHERE article_id = %s", (article_id,))
+    author_id = cursor.fetchone()["submitted_by"]
+    db_connection.commit()
+    cursor.close()
+    return author_id
+
+def reputation(db_connection, user_id):
+    cursor = db_connection.cursor()
+    cursor.execute(f"SELECT {USER_REPUTATION} AS reputation FROM users u WHERE u.user_id = %s", (user_id,))
+    value = cursor.fetchone()["reputation"]
+    db_connection.commit()
+    cursor.close()
+    return value
+
+def ledger_entries(db_connection, user_id):
+    cursor = db_connection.cursor()
+    cursor.execute(
+        "SELECT points, reason FROM reputation_ledger WHERE user_id = %s ORDER BY entry_id",
+        (user_id,)
+    )
+    entries = [(row["points"], row["reason"]) for row in cursor.fetchall()]
+    db_connection.commit()
+    cursor.close()
+    return entries
+
+@pytest.fixture
+def restore_weights(db_connection):
+    yield
+    set_reputation_weights(db_connection, {"article_upvote": 1, "article_downvote": -1})
+
+def test_votes_append_to_ledger(db_connection, voted_article):
+    """Each vote's reputation change is recorded in the ledger"""
+    assert reputation(db_connection, voted_article) == 0
+    assert ledger_entries(db_connection, voted_article) == [
+        (1, "article_vote"), (1, "article_vote"), (-2, "article_vote"),
+    ]
+
+def test_recompute_repairs_drift(db_connection, connect_test_db, voted_article):
+    """Recompute rebuilds drifted reputation from votes"""
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE users SET reputation = reputation + 42 WHERE user_id = %s", (voted_article,))
+    db_connection.commit()
+    cursor.close()
+
+    result = recompute_reputation(connect_test_db, workers=2, chunk_size=1)
+    assert result["corrected"] == 1
+    assert reputation(db_connection, voted_article) == 0
+    assert ledger_entries(db_connection, voted_article)[-1] == (-42, "recompute")
+
+    # A second run finds nothing to fix
+    assert recompute_reputation(connect_test_db, workers=2, chunk_size=1)["corrected"] == 0
+
+def test_recompute_applies_new_weights(db_connection, connect_test_db, voted_article, restore_weights):
+    """Changing weights and recomputing rewrites reputation under the new formula"""
+    set_reputation_weights(db_connection, {"article_upvote": 10, "article_downvote": -2})
+    recompute_reputation(connect_test_db, workers=2, chunk_size=2)
+    assert reputation(db_connection, voted_article) == 10 - 2
+    # The ledger still sums to the reputation
+    assert sum(points for points, _ in ledger_entries(db_connection, voted_article)) == 10 - 2
+
+def test_recompute_ignores_votes_on_unapproved_articles(db_connection, connect_test_db, voted_article, restore_weights):
+    """As when voting, only votes on approved articles count"""
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'pending' WHERE submitted_by = %s", (voted_article,))
+    db_connection.commit()
+    cursor.close()
+
+    set_reputation_weights(db_connection, {"article_upvote": 10, "article_downvote": -2})
+    recompute_reputation(connect_test_db, workers=2, chunk_size=2)
+    assert reputation(db_connection, voted_article) == 0
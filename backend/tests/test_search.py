@@ -0,0 +1,309 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+from fastapi import status
+
+from app.core.config import settings
+from app.db.session import ConnectionPool
+from app.services import suggestions
+from app.services.search import build_tsquery, run_legs
+from app.services.suggestions import PrefixIndex, suggestion_index
+
+@pytest.fixture
+def searchable(test_client, db_connection, test_user, test_article):
+    """Approved articles, a commenter with a bio and a comment to search for"""
+    user = dict(test_user, username="quantumfan", email="search@example.com")
+    test_client.post("/api/v1/auth/register", json=user)
+    login_data = {"username": user["username"], "password": user["password"], "grant_type": "password"}
+    token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    article_ids = {}
+    for key, title, description in (
+        ("title", "Quantum computers break a record", "Researchers report a new milestone."),
+        ("description", "A record year for chips", "Quantum computing startups raised more than ever."),
+        ("other", "Local elections", "Turnout was high across the region."),
+    ):
+        article = dict(test_article, title=title, description=description)
+        article_ids[key] = test_client.post("/api/v1/articles", json=article, headers=headers).json()["article_id"]
+
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved'")
+    cursor.execute("UPDATE users SET bio = 'Writes about superconducting qubits' WHERE username = 'quantumfan'")
+    db_connection.commit()
+    cursor.close()
+
+    comment_id = test_client.post(
+        "/api/v1/comments",
+        json={"article_id": article_ids["other"], "text": "Turnout surprised the pollsters"},
+        headers=headers
+    ).json()["comment_id"]
+    return article_ids, comment_id
+
+def search(test_client, **params):
+    response = test_client.get("/api/v1/search", params=params)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    return response.json()
+
+def test_build_tsquery():
+    assert build_tsquery("Quantum comp") == "quantum & comp:*"
+    assert build_tsquery("  ") is None
+    # Operators in the input are dropped rather than interpreted
+    assert build_tsquery("a & (b | !c):*") == "a & b & c:*"
+
+def test_articles_are_ranked_with_title_above_description(test_client, searchable):
+    article_ids, _ = searchable
+    data = search(test_client, q="quantum", type="articles")
+    assert data["total"] == 2
+    assert [r["article_id"] for r in data["results"]] == [article_ids["title"], article_ids["description"]]
+    assert "<mark>Quantum</mark>" in data["results"][0]["highlight"]
+    assert "search_rank" not in data["results"][0]
+
+    # Stemmed and prefix matches; every word is required
+    assert search(test_client, q="comput", type="articles")["total"] == 2
+    assert [r["article_id"] for r in search(test_client, q="quantum startup", type="articles")["results"]] == [
+        article_ids["description"]
+    ]
+    assert search(test_client, q="quantum elections", type="articles")["total"] == 0
+
+    # Snippets are only computed when requested
+    result = search(test_client, q="quantum", type="articles", fields="title")["results"][0]
+    assert set(result) == {"result_type", "article_id", "title"}
+
+def test_users_and_comments_are_searched(test_client, searchable):
+    _, comment_id = searchable
+    users = search(test_client, q="qubit", type="users")["results"]
+    assert [u["username"] for u in users] == ["quantumfan"]
+    assert "<mark>qubits</mark>" in users[0]["highlight"]
+
+    comments = search(test_client, q="pollster", type="comments")["results"]
+    assert [c["comment_id"] for c in comments] == [comment_id]
+
+    mixed = search(test_client, q="turnout")
+    assert {r["result_type"] for r in mixed["results"]} == {"article", "comment"}
+    assert mixed["total"] == 2
+
+    # Queries without words list everything, without snippets
+    data = search(test_client, q="!!", type="articles")
+    assert data["total"] == 3
+    assert "highlight" not in data["results"][0]
+
+def test_search_uses_gin_index(db_connection):
+    cursor = db_connection.cursor()
+    cursor.execute("SET enable_seqscan = off")
+    cursor.execute(
+        "EXPLAIN SELECT article_id FROM articles WHERE search_vector @@ to_tsquery('english', 'quantum:*')"
+    )
+    plan = "\n".join(row["QUERY PLAN"] for row in cursor.fetchall())
+    db_connection.rollback()
+    cursor.close()
+    assert "idx_articles_search" in plan
+
+def test_mixed_results_are_merged_and_paged(test_client, db_connection, test_user, test_article):
+    headers = None
+    for i in range(4):
+        user = dict(test_user, username=f"solar{i}" if i else "solar", email=f"solar{i}@example.com")
+        test_client.post("/api/v1/auth/register", json=user)
+        login_data = {"username": user["username"], "password": user["password"], "grant_type": "password"}
+        token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+        headers = headers or {"Authorization": f"Bearer {token}"}
+
+    article_ids = []
+    for i in range(6):
+        article = dict(test_article, title=f"Solar panels, part {i}", description="Solar power " * i)
+        article_ids.append(test_client.post("/api/v1/articles", json=article, headers=headers).json()["article_id"])
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved'")
+    db_connection.commit()
+    cursor.close()
+    for i in range(5):
+        test_client.post("/api/v1/comments", json={"article_id": article_ids[i], "text": f"Solar {i}"}, headers=headers)
+
+    everything = search(test_client, q="solar", limit=100)
+    assert everything["total"] == len(everything["results"]) == 15
+    assert everything["next_cursor"] is None
+    # The exact username match leads, then results by rank across types
+    assert everything["results"][0] == {**everything["results"][0], "result_type": "user", "username": "solar"}
+    assert {r["result_type"] for r in everything["results"][1:4]} == {"article"}
+
+    def key(result):
+        return result["result_type"], result.get(f"{result['result_type']}_id")
+
+    # Cursor pages walk the same merged list without gaps or repeats
+    walked = []
+    data = search(test_client, q="solar", limit=4)
+    while True:
+        walked += data["results"]
+        if not data["next_cursor"]:
+            break
+        data = search(test_client, q="solar", limit=4, cursor=data["next_cursor"])
+    assert [key(r) for r in walked] == [key(r) for r in everything["results"]]
+
+    # Page numbers give the same pages
+    page_3 = search(test_client, q="solar", limit=4, page=3)["results"]
+    assert [key(r) for r in page_3] == [key(r) for r in everything["results"][8:12]]
+
+    response = test_client.get("/api/v1/search", params={"q": "solar", "type": "users", "cursor": data["next_cursor"] or "x"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = test_client.get("/api/v1/search", params={"q": "solar", "cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_run_legs_returns_what_finished_by_the_deadline(test_pool):
+    def query(sql):
+        def leg(cursor):
+            cursor.execute(sql)
+            return cursor.fetchone()["value"]
+        return leg
+
+    legs = {f"fast{i}": query(f"SELECT pg_sleep(0.3), {i} AS value") for i in range(3)}
+    legs["slow"] = query("SELECT pg_sleep(30), -1 AS value")
+    start = time.perf_counter()
+    done, timed_out = asyncio.run(run_legs(test_pool, legs, timeout=1.0))
+    # The legs ran at the same time and the slow one was cut off
+    assert time.perf_counter() - start < 1.5
+    assert done == {"fast0": 0, "fast1": 1, "fast2": 2}
+    assert timed_out == ["slow"]
+
+    # Cancelled legs give their connection back
+    done, timed_out = asyncio.run(run_legs(test_pool, {"again": query("SELECT 1 AS value")}, timeout=1.0))
+    assert done == {"again": 1} and not timed_out
+
+class LateStartPool(ConnectionPool):
+    """Every borrower after the first starts late, as if its thread had"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.borrowers = itertools.count()
+
+    def connection(self, timeout=None):
+        if next(self.borrowers):
+            time.sleep(0.2)
+        return super().connection(timeout)
+
+def test_legs_waiting_for_a_connection_never_start():
+    pool = LateStartPool(
+        1, dbname="echo_test", user=settings.POSTGRES_USER, password=settings.POSTGRES_PASSWORD,
+        host=settings.POSTGRES_HOST, port=settings.POSTGRES_PORT,
+    )
+    started = []
+
+    def leg(name, sql):
+        def run(cursor):
+            started.append(name)
+            cursor.execute(sql)
+        return run
+
+    # The slow leg holds the only connection past the deadline
+    legs = {"slow": leg("slow", "SELECT pg_sleep(30)"), "queued": leg("queued", "SELECT 1")}
+    try:
+        done, timed_out = asyncio.run(run_legs(pool, legs, timeout=0.5))
+        assert sorted(timed_out) == ["queued", "slow"]
+        # Once the slow query is cancelled, the queued leg must not take its
+        # connection and run after the response
+        time.sleep(0.5)
+        assert started == ["slow"]
+        with pool.connection(timeout=1):
+            pass
+    finally:
+        pool.close()
+
+def test_slow_result_types_are_left_out(test_client, connect_test_db, searchable, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_DEADLINE_SECONDS", 0.5)
+
+    # Hold a lock that only the user page query waits for
+    blocker = connect_test_db()
+    cursor = blocker.cursor()
+    cursor.execute("LOCK TABLE user_badges IN ACCESS EXCLUSIVE MODE")
+    try:
+        response = test_client.get("/api/v1/search", params={"q": "quantum"})
+        data = response.json()
+        assert data["timed_out"] == ["users"]
+        assert data["total"] == 2
+        assert {r["result_type"] for r in data["results"]} == {"article"}
+        assert response.headers["cache-control"] == "no-store"
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    # The partial response was not cached
+    data = search(test_client, q="quantum")
+    assert data["timed_out"] == []
+    assert data["total"] == 3
+
+def suggest(test_client, q):
+    response = test_client.get("/api/v1/search/suggestions", params={"q": q})
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+def test_prefix_index_keeps_cached_tops_current(monkeypatch):
+    monkeypatch.setattr(suggestions, "SCAN_LIMIT", 2)
+    index = PrefixIndex([("alpha", 1), ("alps", 5), ("altitude", 3), ("beta", 9)], k=2)
+    assert index.top("al") == ["alps", "altitude"]
+    assert index.top("AL", limit=1) == ["alps"]
+
+    # Cached lists follow additions, weight changes and removals
+    index.add("alto", 4)
+    assert index.top("al") == ["alps", "alto"]
+    index.add("alps", 0)
+    assert index.top("al") == ["alto", "altitude"]
+    index.remove("alto")
+    assert index.top("al") == ["altitude", "alpha"]
+    assert index.top("x") == []
+
+    titles = PrefixIndex([("New quantum chips", 1)], word_starts=True)
+    assert titles.top("quant") == titles.top("new q") == ["New quantum chips"]
+    assert titles.top("chips ") == ["New quantum chips"]
+    assert titles.top("w quantum") == []
+
+def test_suggestions_are_loaded_and_ranked(test_client, db_connection, searchable):
+    suggestion_index.load(db_connection)
+
+    # Titles and usernames starting with q, then titles with a later word
+    # starting with it; equal weights are ordered by text
+    assert suggest(test_client, "quantum") == ["Quantum computers break a record", "quantumfan"]
+    assert suggest(test_client, "Record") == ["A record year for chips", "Quantum computers break a record"]
+    assert suggest(test_client, "tech") == ["Technology"]
+    # Only prefixes of tags match, not inner substrings
+    assert suggest(test_client, "test") == ["test"]
+
+    # Popularity orders matches of the same kind
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET upvotes = 5 WHERE title = 'Quantum computers break a record'")
+    db_connection.commit()
+    cursor.close()
+    suggestion_index.load(db_connection)
+    assert suggestion_index.suggest("record") == ["Quantum computers break a record", "A record year for chips"]
+
+def test_suggestions_follow_writes(test_client, db_connection, test_user, test_article):
+    test_client.post("/api/v1/auth/register", json=test_user)
+    assert suggestion_index.suggest("testu") == ["testuser"]
+
+    # The author moderates their own article here
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE users SET role = 'moderator' WHERE username = %s", (test_user["username"],))
+    db_connection.commit()
+    cursor.close()
+    login_data = {"username": test_user["username"], "password": test_user["password"], "grant_type": "password"}
+    token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    article = dict(test_article, title="Solar storms ahead", category="Space", tags=["sun", "space weather"])
+    article_id = test_client.post("/api/v1/articles", json=article, headers=headers).json()["article_id"]
+
+    # New tags and categories show up right away, titles once approved
+    assert suggestion_index.suggest("s") == ["space weather", "Space", "sun"]
+    # Exact matches come first
+    assert suggestion_index.suggest("space") == ["Space", "space weather"]
+
+    response = test_client.post(
+        "/api/v1/admin/moderation/decisions",
+        json={"decisions": [{"article_id": article_id, "action": "approve"}]},
+        headers=headers
+    )
+    assert response.json()["processed"][0]["status"] == "approved"
+    assert suggestion_index.suggest("sto") == ["Solar storms ahead"]
+
+    # Edits send the article back to moderation
+    test_client.put(f"/api/v1/articles/{article_id}", json={"title": "Solar storms now"}, headers=headers)
+    assert suggestion_index.suggest("sto") == []
@@ -0,0 +1,206 @@
+import threading
+import time
+
+import pytest
+from fastapi import status
+
+from app.api.endpoints.votes import VOTE_STATEMENT
+from app.services.counters import ARTICLE_DOWNVOTES, ARTICLE_UPVOTES, USER_REPUTATION, fold_counter_shards
+from app.services.notifications import notification_buffer
+
+@pytest.fixture
+def voters(test_client, db_connection, test_user, test_article):
+    """Register an author with an approved article plus two voters"""
+    headers = []
+    for i in range(3):
+        user = dict(test_user, username=f"{test_user['username']}{i}", email=f"voter{i}@example.com")
+        response = test_client.post("/api/v1/auth/register", json=user)
+        assert response.status_code == status.HTTP_201_CREATED
+        login_data = {
+            "username": user["username"],
+            "password": user["password"],
+            "grant_type": "password"
+        }
+        token = test_client.post("/api/v1/auth/login", data=login_data).json()["access_token"]
+        headers.append({"Authorization": f"Bearer {token}"})
+
+    response = test_client.post("/api/v1/articles", json=test_article, headers=headers[0])
+    article_id = response.json()["article_id"]
+
+    cursor = db_connection.cursor()
+    cursor.execute("UPDATE articles SET status = 'approved' WHERE article_id = %s", (article_id,))
+    db_connection.commit()
+    cursor.close()
+    return article_id, headers
+
+def author_state(db_connection, article_id):
+    """Article counters and author reputation, including pending shard deltas"""
+    cursor = db_connection.cursor()
+    cursor.execute(
+        f"""
+        SELECT {ARTICLE_UPVOTES} AS upvotes, {ARTICLE_DOWNVOTES} AS downvotes, {USER_REPUTATION} AS reputation,
+               (SELECT COUNT(*) FROM notifications n WHERE n.user_id = u.user_id AND n.type = 'vote') AS notifications
+        FROM articles a JOIN users u ON a.submitted_by = u.user_id
+        WHERE a.article_id = %s
+        """,
+        (article_id,)
+    )
+    state = cursor.fetchone()
+    cursor.close()
+    return state
+
+def test_vote_updates_counters_and_reputation(test_client, db_connection, voters):
+    """Votes, vote changes and removals keep counters and reputation in step"""
+    article_id, headers = voters
+    url = f"/api/v1/votes/{article_id}/vote"
+
+    response = test_client.post(url, json={"vote_type": "upvote"}, headers=headers[1])
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["upvotes"] == 1
+    assert data["user_vote"] == "upvote"
+    assert data["previous_vote"] is None
+
+    response = test_client.post(url, json={"vote_type": "upvote"}, headers=headers[2])
+    assert response.json()["upvotes"] == 2
+
+    # Changing a vote moves it between counters
+    response = test_client.post(url, json={"vote_type": "downvote"}, headers=headers[2])
+    data = response.json()
+    assert (data["upvotes"], data["downvotes"], data["score"]) == (1, 1, 0)
+    assert data["previous_vote"] == "upvote"
+
+    # Repeating a vote is a no-op
+    response = test_client.post(url, json={"vote_type": "downvote"}, headers=headers[2])
+    assert (response.json()["upvotes"], response.json()["downvotes"]) == (1, 1)
+
+    # Both upvotes coalesce into one notification for the author
+    notification_buffer.flush(db_connection)
+    state = author_state(db_connection, article_id)
+    assert (state["upvotes"], state["downvotes"], state["reputation"]) == (1, 1, 0)
+    assert state["notifications"] == 1
+
+    # Removing a vote
+    response = test_client.post(url, json={"vote_type": "none"}, headers=headers[1])
+    data = response.json()
+    assert (data["upvotes"], data["downvotes"]) == (0, 1)
+    assert data["user_vote"] is None
+    assert data["previous_vote"] == "upvote"
+
+    state = author_state(db_connection, article_id)
+    assert state["reputation"] == -1
+
+def test_vote_on_missing_or_pending_article(test_client, db_connection, voters, test_article):
+    """Votes on unknown or unapproved articles are rejected without side effects"""
+    article_id, headers = voters
+
+    response = test_client.post("/api/v1/votes/999999/vote", json={"vote_type": "upvote"}, headers=headers[1])
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = test_client.post("/api/v1/articles", json=test_article, headers=headers[0])
+    pending_id = response.json()["article_id"]
+    response = test_client.post(f"/api/v1/votes/{pending_id}/vote", json={"vote_type": "upvote"}, headers=headers[1])
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT COUNT(*) AS count FROM votes")
+    assert cursor.fetchone()["count"] == 0
+    cursor.close()
+
+def test_concurrent_first_votes_count_once(db_connection, connect_test_db, voters):
+    """The same first vote sent twice at once is recorded and counted once"""
+    article_id, _ = voters
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT user_id FROM users WHERE username = 'testuser1'")
+    user_id = cursor.fetchone()["user_id"]
+    db_connection.commit()
+    cursor.close()
+    params = {"article_id": article_id, "user_id": user_id, "vote_type": "upvote", "shard": 0}
+
+    def vote():
+        conn = connect_test_db()
+        conn.autocommit = True
+        try:
+            conn.cursor().execute(VOTE_STATEMENT, params)
+        finally:
+            conn.close()
+
+    # Hold the vote lock so both requests are waiting when it is released
+    blocker = connect_test_db()
+    blocker.cursor().execute("SELECT pg_advisory_xact_lock(%s, %s)", (user_id, article_id))
+    threads = [threading.Thread(target=vote) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+    blocker.rollback()
+    blocker.close()
+    for thread in threads:
+        thread.join()
+
+    state = author_state(db_connection, article_id)
+    assert (state["upvotes"], state["downvotes"], state["reputation"]) == (1, 0, 1)
+
+def test_fold_counter_shards(test_client, db_connection, voters):
+    """Folding moves pending shard deltas into the counter columns"""
+    article_id, headers = voters
+    url = f"/api/v1/votes/{article_id}/vote"
+    test_client.post(url, json={"vote_type": "upvote"}, headers=headers[1])
+    test_client.post(url, json={"vote_type": "downvote"}, headers=headers[2])
+
+    cursor = db_connection.cursor()
+    cursor.execute("SELECT upvotes, downvotes FROM articles WHERE article_id = %s", (article_id,))
+    assert dict(cursor.fetchone()) == {"upvotes": 0, "downvotes": 0}
+    db_connection.commit()
+
+    folded = fold_counter_shards(db_connection)
+    assert folded["article_vote_shards"] == 2
+    assert folded["user_reputation_shards"] == 2
+
+    cursor.execute("SELECT COUNT(*) AS count FROM article_vote_shards")
+    assert cursor.fetchone()["count"] == 0
+    cursor.execute(
+        """
+        SELECT a.upvotes, a.downvotes, u.reputation
+        FROM articles a JOIN users u ON a.submitted_by = u.user_id
+        WHERE a.article_id = %s
+        """,
+        (article_id,)
+    )
+    assert dict(cursor.fetchone()) == {"upvotes": 1, "downvotes": 1, "reputation": 0}
+    cursor.close()
+
+    # Reads are unchanged by the fold
+    response = test_client.get(f"/api/v1/votes/{article_id}/votes", headers=headers[1])
+    assert (response.json()["upvotes"], response.json()["downvotes"]) == (1, 1)
+
+def test_get_my_votes(test_client, voters):
+    """One request returns the caller's vote on each requested article"""
+    article_id, headers = voters
+    test_client.post(f"/api/v1/votes/{article_id}/vote", json={"vote_type": "downvote"}, headers=headers[1])
+
+    response = test_client.get(f"/api/v1/votes/me?article_ids={article_id},999999", headers=headers[1])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["votes"] == {str(article_id): "downvote", "999999": None}
+
+    response = test_client.get("/api/v1/votes/me?article_ids=1,abc", headers=headers[1])
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_get_articles_embeds_user_vote(test_client, voters):
+    """Authenticated article lists carry the caller's vote on each article"""
+    article_id, headers = voters
+    test_client.post(f"/api/v1/votes/{article_id}/vote", json={"vote_type": "upvote"}, headers=headers[1])
+
+    articles = test_client.get("/api/v1/articles", headers=headers[1]).json()["articles"]
+    assert [(a["article_id"], a["user_vote"]) for a in articles] == [(article_id, "upvote")]
+
+    articles = test_client.get("/api/v1/articles", headers=headers[2]).json()["articles"]
+    assert articles[0]["user_vote"] is None
+
+    articles = test_client.get("/api/v1/articles").json()["articles"]
+    assert "user_vote" not in articles[0]
+
+def test_get_articles_ignores_an_invalid_token(test_client, voters):
+    """A stale or malformed token lists articles as for an anonymous caller"""
+    response = test_client.get("/api/v1/articles", headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == status.HTTP_200_OK
+    assert "user_vote" not in response.json()["articles"][0]